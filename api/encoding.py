@@ -0,0 +1,198 @@
+import asyncio
+import inspect
+import json
+
+from fastapi import HTTPException, Request
+from fastapi.responses import Response
+from starlette.concurrency import run_in_threadpool
+
+from core.metrics import timed
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+JSON = "application/json"
+COLUMNAR = "application/vnd.toc.columnar+json"
+MSGPACK = "application/msgpack"
+MSGPACK_TYPES = (MSGPACK, "application/x-msgpack")
+
+# Columnar traces: a "steps" list of dicts becomes one array per key. String
+# values, lists of strings (active states, stacks) and lists of transition
+# dicts are replaced by IDs into one table shared by the whole response:
+#   trace_table = {"strings": [...], "shapes": [[key, ...]], "edges": [[shape, value id, ...]]}
+#   steps = {"length": n, "columns": {key: [...]}, "kinds": {key: kind}, "missing": {key: [index]}}
+# with kind "str" (string ID), "strs" (list of string IDs), "edges" (list of
+# edge IDs) or "raw" (value as is).
+
+
+def dumps_json(payload):
+    if orjson is not None:
+        return orjson.dumps(payload, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def choose_format(accept):
+    # None when only msgpack is acceptable and it is not installed.
+    media = [part.split(";")[0].strip() for part in (accept or "").split(",")]
+    wants_msgpack = any(m in MSGPACK_TYPES for m in media)
+    if msgpack is not None and wants_msgpack:
+        return MSGPACK
+    if COLUMNAR in media:
+        return COLUMNAR
+    if wants_msgpack and not any(m in (JSON, "application/*", "*/*") for m in media):
+        return None
+    return JSON
+
+
+def check_acceptable(request):
+    if choose_format(request.headers.get("accept")) is None:
+        raise HTTPException(status_code=406, detail="application/msgpack is not available (msgpack is not installed)")
+
+
+class TraceTable:
+    def __init__(self):
+        self.strings = []
+        self.string_ids = {}
+        self.shapes = []
+        self.shape_ids = {}
+        self.edges = []
+        self.edge_ids = {}
+
+    def string(self, value):
+        i = self.string_ids.get(value)
+        if i is None:
+            i = self.string_ids[value] = len(self.strings)
+            self.strings.append(value)
+        return i
+
+    def edge(self, transition):
+        keys = tuple(transition)
+        shape = self.shape_ids.get(keys)
+        if shape is None:
+            shape = self.shape_ids[keys] = len(self.shapes)
+            self.shapes.append(list(keys))
+        row = (shape,) + tuple(self.string(transition[k]) for k in keys)
+        i = self.edge_ids.get(row)
+        if i is None:
+            i = self.edge_ids[row] = len(self.edges)
+            self.edges.append(list(row))
+        return i
+
+    def to_dict(self):
+        return {"strings": self.strings, "shapes": self.shapes, "edges": self.edges}
+
+
+def _kind(values):
+    present = [v for v in values if v is not None]
+    if all(isinstance(v, str) for v in present):
+        return "str"
+    if not all(isinstance(v, list) for v in present):
+        return "raw"
+    items = [x for v in present for x in v]
+    if all(isinstance(x, str) for x in items):
+        return "strs"
+    if all(isinstance(x, dict) and all(isinstance(y, str) for y in x.values()) for x in items):
+        return "edges"
+    return "raw"
+
+
+def columnar_trace(steps, table):
+    keys = []
+    for step in steps:
+        for key in step:
+            if key not in keys:
+                keys.append(key)
+    columns, kinds, missing = {}, {}, {}
+    for key in keys:
+        values = [step.get(key) for step in steps]
+        holes = [i for i, step in enumerate(steps) if key not in step]
+        if holes:
+            missing[key] = holes
+        kind = _kind(values)
+        if kind == "str":
+            values = [None if v is None else table.string(v) for v in values]
+        elif kind == "strs":
+            values = [None if v is None else [table.string(x) for x in v] for v in values]
+        elif kind == "edges":
+            values = [None if v is None else [table.edge(x) for x in v] for v in values]
+        columns[key] = values
+        kinds[key] = kind
+    result = {"length": len(steps), "columns": columns, "kinds": kinds}
+    if missing:
+        result["missing"] = missing
+    return result
+
+
+def _columnarize(payload, table):
+    result = {}
+    for key, value in payload.items():
+        if key == "steps" and isinstance(value, list) and all(isinstance(s, dict) for s in value):
+            value = columnar_trace(value, table)
+        elif isinstance(value, dict):
+            value = _columnarize(value, table)
+        result[key] = value
+    return result
+
+
+def columnarize(payload):
+    table = TraceTable()
+    result = _columnarize(payload, table)
+    result["trace_table"] = table.to_dict()
+    return result
+
+
+@timed("serialize")
+def encode(payload, accept):
+    media = choose_format(accept)
+    if media == JSON or not isinstance(payload, dict):
+        return dumps_json(payload), JSON
+    payload = columnarize(payload)
+    if media == MSGPACK:
+        return msgpack.packb(payload, use_bin_type=True), MSGPACK
+    return dumps_json(payload), COLUMNAR
+
+
+def encode_response(payload, accept):
+    body, media = encode(payload, accept)
+    return Response(content=body, media_type=media, headers={"Vary": "Accept"})
+
+
+def respond(result, request):
+    if isinstance(result, Response):
+        return result
+    return encode_response(result, request.headers.get("accept"))
+
+
+def negotiated(endpoint):
+    # Encodes the endpoint's result according to the Accept header instead
+    # of FastAPI's jsonable_encoder path.
+    signature = inspect.signature(endpoint)
+    takes_request = "request" in signature.parameters
+    params = list(signature.parameters.values())
+    if not takes_request:
+        params.append(inspect.Parameter("request", inspect.Parameter.KEYWORD_ONLY, annotation=Request))
+
+    if asyncio.iscoroutinefunction(endpoint):
+        async def wrapper(request, **kwargs):
+            check_acceptable(request)
+            if takes_request:
+                kwargs["request"] = request
+            result = await endpoint(**kwargs)
+            return await run_in_threadpool(respond, result, request)
+    else:
+        def wrapper(request, **kwargs):
+            check_acceptable(request)
+            if takes_request:
+                kwargs["request"] = request
+            return respond(endpoint(**kwargs), request)
+
+    wrapper.__signature__ = inspect.Signature(params)
+    wrapper.__name__ = endpoint.__name__
+    return wrapper
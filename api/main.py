@@ -1,14 +1,26 @@
 import sys
 import os
+import json
+import asyncio
+import inspect
+import threading
+import time
+import secrets
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.routing import APIRoute
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, StreamingResponse, PlainTextResponse
+from functools import partial, wraps
+from contextlib import contextmanager, nullcontext
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel
+from typing import List, Optional, Union
+from collections import OrderedDict
 
 from regex.regex_parser import insert_concatenation
 from regex.postfix import to_postfix
@@ -22,21 +34,102 @@ from conversions.nfa_to_pda import nfa_to_pda
 from conversions.cfg_to_pda import cfg_to_pda
 
 from simulation.nfa_simulator import simulate_nfa
-from simulation.tm_simulator import simulate_tm
-from cfg.parser import parse_with_tree
+from simulation.bitparallel_nfa import compile_nfa, simulate_nfa_bitparallel
+from simulation.pda_simulator import simulate_pda, simulate_general_pda
+from simulation.cursor import nfa_cursor, dfa_cursor, pda_cursor, general_pda_cursor
+from simulation.tm_simulator import simulate_tm, simulate_multitape_tm, step_bound
+from simulation.tm_accelerated import run_tm_accelerated
+from simulation.dfa_simulator import compile_dfa, simulate_dfa
+from simulation.executor import get_pool, measured, WorkerError
+from api.encoding import negotiated
+from api.store import MachineStore
+from core.limits import LimitExceeded, Cancelled, resolve_limits, get_limit
+from core.metrics import registry, observe, count, recording, stage_breakdown
+from core.profiling import PROFILING, profiling, profiled_block, save_profile, profile_path, load_summary
+from automata.tm import compile_tm, tm_as_dfa, BLANK
+from automata.subset_construction import nfa_to_dfa as subset_nfa_to_dfa
+from automata.dfa_file import cached_regex_dfa, dfa_dict
+from automata.equivalence import check_equivalent, check_includes
+from automata.operations import combine
+from automata.language import count_strings, enumerate_strings
+from automata.dfa_to_tm import dfa_to_tm as build_tm_from_dfa
 from cfg.grammar import Grammar
+from cfg.compiler import compile_grammar
+from cfg.table_parser import generate_parser, GrammarConflictError
+from cfg.cyk import get_cyk_parser
+from cfg.engines import parse as parse_grammar
+from cfg.forest import parse_forest
+from cfg.derivation import leftmost_derivation, iter_leftmost_steps
 from regex.validation import validate_regex
+from regex.compile import normalize_nfa, build_regex_nfa
+from automata.nfa import serialize_nfa
+from automata.pda import serialize_pda
+
+
+def profiled_endpoint(endpoint):
+    # Sync handlers run in a threadpool thread, which is profiled when the
+    # request asked for it; async handlers hand their work to workers.
+    if inspect.iscoroutinefunction(endpoint):
+        return endpoint
+
+    @wraps(endpoint)
+    def wrapper(*args, **kwargs):
+        with profiled_block():
+            return endpoint(*args, **kwargs)
+    return wrapper
+
+
+class ProfiledRoute(APIRoute):
+    def __init__(self, path, endpoint, **kwargs):
+        super().__init__(path, profiled_endpoint(endpoint), **kwargs)
 
 
 app = FastAPI()
+app.router.route_class = ProfiledRoute
 
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Timing", "X-Profile-Id"],
 )
 
+TIMING_HEADER = os.environ.get("TOC_TIMING_HEADER") == "1"
+
+
+@app.middleware("http")
+async def instrument(request: Request, call_next):
+    # Stage timings of the request (including its worker jobs) are
+    # aggregated into the registry; clients sending X-Timing (or all, with
+    # TOC_TIMING_HEADER=1) get the breakdown back in milliseconds. With
+    # TOC_PROFILING=1, X-Profile or ?profile=1 also profiles the request.
+    profile = PROFILING and ("x-profile" in request.headers or request.query_params.get("profile") == "1")
+    start = time.perf_counter()
+    with recording() as records, (profiling() if profile else nullcontext([])) as profiles:
+        response = await call_next(request)
+    elapsed = time.perf_counter() - start
+    route = request.scope.get("route")
+    path = getattr(route, "path", "unmatched")
+    registry.apply(records)
+    observe("toc_request_seconds", elapsed, route=path)
+    count("toc_requests_total", route=path, status=str(response.status_code))
+    if TIMING_HEADER or "x-timing" in request.headers:
+        stages = stage_breakdown(records)
+        stages["total"] = elapsed * 1000
+        response.headers["X-Timing"] = ", ".join(f"{name};dur={ms:.3f}" for name, ms in stages.items())
+    if profile:
+        profile_id = await run_in_threadpool(save_profile, profiles, {
+            "method": request.method,
+            "route": path,
+            "status": response.status_code,
+            "total_ms": round(elapsed * 1000, 3),
+            "stages": {name: round(ms, 3) for name, ms in stage_breakdown(records).items()}
+        })
+        if profile_id:
+            response.headers["X-Profile-Id"] = profile_id
+    return response
+
 
 #------------------------------------------
 class regexInput(BaseModel):
@@ -46,63 +139,230 @@ class SimulateInput(BaseModel):
     regex: str
     string: str
 
+class RegexPairInput(BaseModel):
+    left: str
+    right: str
+
+class RegexOperationInput(BaseModel):
+    left: str
+    right: Optional[str] = None
+    operation: str = "difference"
+    alphabet: str = ""
+    minimize: bool = False
+    build: bool = True
+
+class CountInput(BaseModel):
+    regex: str
+    length: int
+
+ENUMERATE_PAGE_LIMIT = 1000
+
+class EnumerateInput(BaseModel):
+    regex: str
+    limit: int = 100
+    cursor: Optional[str] = None
+
 class SimulateTMInput(BaseModel):
     tm: dict
     string: str
+    detect_loops: bool = False
+    mode: str = "trace"
+    max_steps: int = 10 ** 9
+    keyframes: int = 200
+    trace: bool = True
 
-class CFGInput(BaseModel):
+class GrammarInput(BaseModel):
     grammar: dict
     start: str
+
+class CFGInput(GrammarInput):
     string: str
+    engine: str = "auto"
+    derivation: str = "full"
+
+FOREST_PAGE_LIMIT = 1000
+
+class CFGForestInput(CFGInput):
+    offset: int = 0
+    limit: int = 10
+
+class CFGBatchInput(GrammarInput):
+    strings: List[str]
+
+class SimulateBatchInput(BaseModel):
+    regex: str
+    strings: List[str]
+
+class MachineInput(BaseModel):
+    kind: str
+    definition: Union[str, dict]
+
+class MachineSimulateInput(BaseModel):
+    string: Optional[str] = None
+    strings: Optional[List[str]] = None
+    model: Optional[str] = None
+    trace: bool = True
+    engine: str = "auto"
+    mode: str = "trace"
+    detect_loops: bool = False
+    max_steps: int = 10 ** 9
+    keyframes: int = 200
+
+class CursorInput(BaseModel):
+    machine_id: str
+    model: Optional[str] = None
+
+class CursorAppendInput(BaseModel):
+    chars: str
+
+class CursorBackspaceInput(BaseModel):
+    count: int = 1
+
+COMPARE_TIME_BUDGET = 10.0
 
 class CompareInput(BaseModel):
     regex: str
     string: str
+    trace: bool = True
+    time_budget: float = COMPARE_TIME_BUDGET
+    memory: bool = False
+    other: Optional[str] = None
+    operation: str = "difference"
 
 #------------------------------------------
+def build_grammar(data):
+    return compile_grammar(Grammar.from_dict(data.start, data.grammar))
 
-def serialize_nfa(nfa):
-    return {
-        "states": [s.name for s in nfa.states],
-        "start": nfa.start_state.name,
-        "accept": [s.name for s in nfa.accept_states],
-        "transitions": [
-            {"from": s.name, "symbol": sym or "ε", "to": t.name}
-            for (s, sym), targets in nfa.transitions.items()
-            for t in targets
-        ]
+#------------------------------------------
+# WORKER OFFLOADING
+#------------------------------------------
+# CPU-bound handlers run in the worker pool so one pathological request
+# cannot stall the others. Limits come from X-Limit-* headers (lower only).
+
+LIMIT_HEADERS = {
+    "timeout": "x-limit-timeout",
+    "max_states": "x-limit-max-states",
+    "max_steps": "x-limit-max-steps",
+    "max_memory_mb": "x-limit-max-memory-mb"
+}
+DISCONNECT_POLL = 0.1
+
+_offloaded = {}
+
+
+class OffloadedHTTPError(Exception):
+    # HTTPException does not pickle; this carries it back from a worker.
+    def __init__(self, status_code, detail):
+        super().__init__(status_code, detail)
+
+
+def request_limits(request):
+    requested = {
+        name: request.headers[header]
+        for name, header in LIMIT_HEADERS.items()
+        if header in request.headers
     }
+    try:
+        return resolve_limits(requested)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-#------------------------------------------
-def normalize_nfa(nfa):
-
-    queue = [nfa.start_state]
-    mapping = {nfa.start_state: "q0"}
-    nfa.start_state.name = "q0"
-    visited = {nfa.start_state}
-    count = 1
-
-    while queue:
-        current = queue.pop(0)
-        outgoing = []
-        for key, targets in nfa.transitions.items():
-            if key[0] == current:
-                 symbol = key[1] if key[1] else "ε"
-                 sorted_targets = sorted(list(targets), key=lambda x: int(x.name[1:]) if x.name.startswith("q") and x.name[1:].isdigit() else x.name) 
-                 outgoing.append((symbol, sorted_targets))
-        
-        outgoing.sort(key=lambda x: x[0])
-        for _, targets in outgoing:
-            for next_state in targets:
-                if next_state not in visited:
-                    visited.add(next_state)
-                    name = f"q{count}"
-                    count += 1
-                    mapping[next_state] = name
-                    next_state.name = name
-                    queue.append(next_state)
-    nfa.states = visited
-    return nfa
+
+@contextmanager
+def job_errors():
+    # Maps pool failures onto HTTP status codes.
+    try:
+        yield
+    except LimitExceeded as e:
+        raise HTTPException(status_code=504 if e.limit == "timeout" else 422, detail=e.detail())
+    except Cancelled:
+        raise HTTPException(status_code=499, detail="Client closed request")
+    except OffloadedHTTPError as e:
+        raise HTTPException(status_code=e.args[0], detail=e.args[1])
+    except WorkerError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def watch_disconnect(request, cancelled):
+    async def watch():
+        while not cancelled.is_set():
+            if await request.is_disconnected():
+                cancelled.set()
+            await asyncio.sleep(DISCONNECT_POLL)
+
+    return asyncio.create_task(watch())
+
+
+async def run_job(request, fn, *args, limits=None):
+    # Runs fn(*args) in the pool; the job is killed if the client
+    # disconnects or the deadline passes.
+    cancelled = threading.Event()
+    watcher = watch_disconnect(request, cancelled)
+    try:
+        with job_errors():
+            return await run_in_threadpool(get_pool().run, fn, args, limits, cancelled.is_set)
+    finally:
+        cancelled.set()
+        watcher.cancel()
+
+
+async def stream_job(request, fn, *args, limits=None):
+    # Runs the generator fn(*args) in the pool and waits for its first
+    # chunk, so failures before any output still get their status code.
+    # Returns a sync iterator over the items; a failure after that ends the
+    # stream with an {"error", ...} item instead.
+    cancelled = threading.Event()
+    watcher = watch_disconnect(request, cancelled)
+    chunks = get_pool().stream(fn, args, limits, cancelled.is_set)
+    try:
+        with job_errors():
+            first = await run_in_threadpool(next, chunks, [])
+    except BaseException:
+        # A failed job has already ended the stream; a cancelled wait leaves
+        # it to notice the flag in its thread.
+        cancelled.set()
+        raise
+    finally:
+        watcher.cancel()
+
+    def items():
+        try:
+            yield from first
+            for chunk in chunks:
+                yield from chunk
+        except LimitExceeded as e:
+            yield e.detail()
+        except (OffloadedHTTPError, WorkerError) as e:
+            yield {"error": "failed", "message": str(e)}
+        finally:
+            cancelled.set()
+            chunks.close()
+
+    return items()
+
+
+def run_offloaded(name, kwargs):
+    try:
+        return _offloaded[name](**kwargs)
+    except HTTPException as e:
+        raise OffloadedHTTPError(e.status_code, e.detail)
+
+
+def offload(handler):
+    # Turns a sync handler into an async endpoint that runs it in a worker.
+    # Workers import this module too, so the registry resolves there.
+    _offloaded[handler.__name__] = handler
+
+    async def endpoint(request, **kwargs):
+        return await run_job(request, run_offloaded, handler.__name__, kwargs, limits=request_limits(request))
+
+    params = [inspect.Parameter("request", inspect.Parameter.POSITIONAL_OR_KEYWORD, annotation=Request)]
+    params += inspect.signature(handler).parameters.values()
+    endpoint.__signature__ = inspect.Signature(params)
+    endpoint.__name__ = handler.__name__
+    return endpoint
 
 #------------------------------------------
 
@@ -111,6 +371,24 @@ app.mount("/static", StaticFiles(directory="ui"), name="static")
 def home():
     return FileResponse("ui/index.html")
 
+@app.get("/metrics")
+def metrics():
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/profiles/{profile_id}")
+def get_profile(profile_id: str, format: str = "json"):
+    if format == "pstats":
+        path = profile_path(profile_id, ".prof")
+        if path is not None:
+            return FileResponse(path, media_type="application/octet-stream", filename=f"{profile_id}.prof")
+    elif format == "json":
+        summary = load_summary(profile_id)
+        if summary is not None:
+            return summary
+    else:
+        raise HTTPException(status_code=400, detail=f"Unknown profile format '{format}'")
+    raise HTTPException(status_code=404, detail=f"Unknown profile '{profile_id}'")
+
 @app.post("/nfa")
 def build_nfa(data: regexInput):
     try:
@@ -134,6 +412,7 @@ def build_nfa(data: regexInput):
     return result
 
 @app.post("/simulate/nfa")
+@negotiated
 def simulate_nfa_api(data: SimulateInput):
     try:
         validate_regex(data.regex.strip())
@@ -151,19 +430,29 @@ def simulate_nfa_api(data: SimulateInput):
         "metrics": { "execution_steps": len(history) }
     }
 
+@app.post("/simulate/nfa/batch")
+@offload
+def simulate_nfa_batch(data: SimulateBatchInput):
+    # Acceptance only, on the bit-parallel engine.
+    try:
+        nfa = compile_nfa(build_regex_nfa(data.regex))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    results = [{"string": s, "accepted": nfa.accepts(s)} for s in data.strings]
+    return {
+        "engine": "bitparallel",
+        "results": results,
+        "accepted_count": sum(1 for r in results if r["accepted"])
+    }
+
 @app.post("/dfa")
+@offload
 def build_dfa(data: regexInput):
     try:
         validate_regex(data.regex.strip())
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
-    regex = insert_concatenation(data.regex.strip())
-    postfix = to_postfix(regex)    
-    State._id = 0
-    nfa = regex_to_nfa(postfix)
-    normalize_nfa(nfa) 
-    from automata.subset_construction import nfa_to_dfa
-    dfa = nfa_to_dfa(nfa)
+    dfa = dfa_dict(cached_regex_dfa(data.regex, lambda: subset_nfa_to_dfa(build_regex_nfa(data.regex))))
     dfa["metrics"] = {
         "states": len(dfa["states"]),
         "transitions": len(dfa["transitions"])
@@ -171,19 +460,14 @@ def build_dfa(data: regexInput):
     return dfa
 
 @app.post("/simulate/dfa")
+@negotiated
+@offload
 def simulate_dfa_api(data: SimulateInput):
     try:
         validate_regex(data.regex.strip())
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
-    regex = insert_concatenation(data.regex.strip())
-    postfix = to_postfix(regex)
-    State._id = 0
-    nfa = regex_to_nfa(postfix)
-    normalize_nfa(nfa)
-    from automata.subset_construction import nfa_to_dfa
-    dfa = nfa_to_dfa(nfa)
-    from simulation.dfa_simulator import simulate_dfa
+    dfa = cached_regex_dfa(data.regex, lambda: subset_nfa_to_dfa(build_regex_nfa(data.regex)))
     accepted, history = simulate_dfa(dfa, data.string)
     return {
         "accepted": accepted,
@@ -191,8 +475,69 @@ def simulate_dfa_api(data: SimulateInput):
         "metrics": { "execution_steps": len(history) }
     }
 
+def build_regex_pair(data):
+    nfas = []
+    for side in ("left", "right"):
+        if getattr(data, side) is None:
+            nfas.append(None)
+            continue
+        try:
+            nfas.append(build_regex_nfa(getattr(data, side)))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"{side}: {e}")
+    return nfas
+
+@app.post("/regex/equivalent")
+@offload
+def regex_equivalent(data: RegexPairInput):
+    # Same language? Otherwise the shortest string only one side accepts.
+    return check_equivalent(*build_regex_pair(data))
+
+@app.post("/regex/includes")
+@offload
+def regex_includes(data: RegexPairInput):
+    # Is L(right) a subset of L(left)? Otherwise the shortest string in
+    # right's language but not left's.
+    return check_includes(*build_regex_pair(data))
+
+@app.post("/regex/product")
+@offload
+def regex_product(data: RegexOperationInput):
+    # left ∩ right, left ∪ right, left − right, left △ right or the
+    # complement of left, built lazily from the reachable state pairs.
+    if data.operation != "complement" and data.right is None:
+        raise HTTPException(status_code=400, detail=f"'{data.operation}' needs a right regex")
+    left, right = build_regex_pair(data)
+    return combine(left, right, data.operation, data.alphabet, data.minimize, data.build)
+
+def build_language_dfa(regex_text):
+    try:
+        validate_regex(regex_text.strip())
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return dfa_dict(cached_regex_dfa(regex_text, lambda: subset_nfa_to_dfa(build_regex_nfa(regex_text))))
+
+@app.post("/regex/count")
+@offload
+def regex_count(data: CountInput):
+    # Accepted strings of exactly `length` symbols ("count" is a decimal
+    # string: it outgrows JSON numbers quickly).
+    if data.length < 0:
+        raise HTTPException(status_code=400, detail="length must be non-negative")
+    return count_strings(build_language_dfa(data.regex), data.length)
+
+@app.post("/regex/enumerate")
+@offload
+def regex_enumerate(data: EnumerateInput):
+    # Accepted strings in shortlex order, a page at a time: pass the
+    # returned cursor back to continue.
+    if not 1 <= data.limit <= ENUMERATE_PAGE_LIMIT:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {ENUMERATE_PAGE_LIMIT}")
+    return enumerate_strings(build_language_dfa(data.regex), data.limit, data.cursor)
+
 
 @app.post("/build_tm")
+@offload
 def build_tm(data: regexInput):
     try:
         validate_regex(data.regex.strip())
@@ -213,51 +558,131 @@ def build_tm(data: regexInput):
     }
     return tm
 
+def run_tm_untraced(tm, string, detect_loops=False, max_steps=None):
+    # DFA-shaped machines (right-moving, non-writing, deciding on blank) run
+    # on the compiled DFA engine; the step count matches the traced run, so
+    # runs that could hit the step bound take the traced path instead.
+    dfa = tm_as_dfa(tm)
+    max_steps = step_bound(max_steps)
+    if dfa is not None and BLANK not in string and len(string) + 2 <= max_steps:
+        accepted, consumed = compile_dfa(dfa).run(string)
+        return {
+            "accepted": accepted,
+            "verdict": "accept" if accepted else "reject",
+            "engine": "dfa",
+            "steps": [],
+            "metrics": { "execution_steps": consumed + 2 }
+        }
+    accepted, history = simulate_tm(tm, string, detect_loops=detect_loops, max_steps=max_steps)
+    return {
+        "accepted": accepted,
+        "verdict": history[-1].get("verdict") or ("accept" if accepted else "reject"),
+        "engine": "tm",
+        "steps": [],
+        "metrics": { "execution_steps": len(history) }
+    }
+
+def run_multitape_tm(tm, string, max_steps, trace):
+    accepted, history = simulate_multitape_tm(tm, string, max_steps=max_steps, trace=trace)
+    return {
+        "accepted": accepted,
+        "verdict": history[-1].get("verdict") or ("accept" if accepted else "reject"),
+        "engine": "multitape",
+        "steps": history,
+        "metrics": { "execution_steps": history[-1]["step"] }
+    }
+
 @app.post("/simulate/tm")
+@negotiated
+@offload
 def simulate_tm_api(data: SimulateTMInput):
-    accepted, history = simulate_tm(data.tm, data.string)
-    return {
+    return run_tm_request(data.tm, data.string, data)
+
+def run_tm_request(tm, string, options):
+    try:
+        tm = compile_tm(tm)
+    except (KeyError, TypeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid TM definition: {e}")
+    string = tm.translate(string)
+    max_steps = min(options.max_steps, get_limit("max_steps"))
+    if tm.tapes != 1:
+        if options.mode != "trace":
+            raise HTTPException(status_code=400, detail="Only trace mode supports multi-tape machines")
+        return run_multitape_tm(tm, string, max_steps, options.trace)
+    if options.mode == "accelerated":
+        return run_tm_accelerated(tm, string, max_steps=max_steps, keyframes=options.keyframes)
+    if options.mode != "trace":
+        raise HTTPException(status_code=400, detail=f"Unknown TM mode '{options.mode}'")
+    if not options.trace:
+        return run_tm_untraced(tm, string, detect_loops=options.detect_loops, max_steps=max_steps)
+    accepted, history = simulate_tm(tm, string, detect_loops=options.detect_loops, max_steps=max_steps)
+    result = {
         "accepted": accepted,
+        "verdict": history[-1].get("verdict") or ("accept" if accepted else "reject"),
         "steps": history,
         "metrics": { "execution_steps": len(history) }
     }
+    if result["verdict"] == "loop_detected":
+        result["cycle_length"] = history[-1]["cycle_length"]
+    return result
+
+def run_cfg_parser(g, string, engine):
+    try:
+        engine, accepted, tree = parse_grammar(g, string, engine)
+    except GrammarConflictError as e:
+        raise HTTPException(status_code=400, detail={"message": str(e), "conflicts": e.conflicts})
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return engine, accepted, tree
 
 @app.post("/cfg/parse")
+@offload
 def parse_cfg(data: CFGInput):
-    g = Grammar(data.start)
-    for lhs, rhss in data.grammar.items():
-        for rhs in rhss:
-            g.add_production(lhs, rhs)
-    accepted, tree = parse_with_tree(g, data.string)    
-    derivations = get_leftmost_derivation(tree) if tree else []
-    return {
+    g = build_grammar(data)
+    engine, accepted, tree = run_cfg_parser(g, data.string, data.engine)
+    result = {
         "accepted": accepted,
+        "engine": engine,
         "tree": serialize_tree(tree) if tree else None,
-        "derivations": derivations
+        "derivations": []
     }
+    if data.derivation == "steps":
+        result["derivation_steps"] = list(iter_leftmost_steps(tree))
+    elif data.derivation == "full" and tree:
+        result["derivations"] = get_leftmost_derivation(tree)
+    return result
 
-def get_leftmost_derivation(root):
-    if not root:
-        return []
-    current_form = [root]
-    history = [ [root.symbol] ]
-    new_form = []
-    expand_index = -1
-    for i, node in enumerate(current_form):
-        if node.children:
-            expand_index = i
-            break
-    if expand_index == -1:
-     return history
+def derivation_lines(data):
+    # Parses in a worker and yields the header, then the steps one by one,
+    # so only flat steps cross to the API process, never the (possibly deep)
+    # tree.
+    try:
+        g = build_grammar(data)
+        engine, accepted, tree = run_cfg_parser(g, data.string, data.engine)
+    except HTTPException as e:
+        raise OffloadedHTTPError(e.status_code, e.detail)
+    yield {"accepted": accepted, "engine": engine, "start": g.start}
+    yield from iter_leftmost_steps(tree)
 
+@app.post("/cfg/derivation/stream")
+async def stream_cfg_derivation(request: Request, data: CFGInput):
+    items = await stream_job(request, derivation_lines, data, limits=request_limits(request))
+    lines = (json.dumps(item, ensure_ascii=False) + "\n" for item in items)
+    return StreamingResponse(lines, media_type="application/x-ndjson")
 
-    new_form.extend(current_form[expand_index+1:])    
-    current_form = new_form
-    step_str = [n.symbol for n in current_form if n.symbol != "ε"]
-    if not step_str: 
-        step_str = ["ε"]
-    history.append(step_str)
-    return [" ".join(h) for h in history]
+@app.post("/cfg/parse/batch")
+@offload
+def parse_cfg_batch(data: CFGBatchInput):
+    parser = get_cyk_parser(build_grammar(data))
+    results = [{"string": s, "accepted": parser.accepts(s)} for s in data.strings]
+    return {
+        "engine": "cyk",
+        "results": results,
+        "accepted_count": sum(1 for r in results if r["accepted"])
+    }
+
+def get_leftmost_derivation(root):
+    return leftmost_derivation(root)
 
 def serialize_tree(node):
     if not node:
@@ -267,34 +692,56 @@ def serialize_tree(node):
         "children": [serialize_tree(child) for child in node.children]
     }
 
+def serialize_forest(forest):
+    if not forest.accepted:
+        return None
+    root, nodes = forest.dag()
+    count = forest.count()
+    return {
+        "root": root,
+        # Counts beyond 2^53 would lose precision as JSON numbers.
+        "count": count if count < 2 ** 53 else str(count),
+        "nodes": nodes
+    }
+
+@app.post("/cfg/forest")
+@offload
+def parse_cfg_forest(data: CFGForestInput):
+    if data.limit < 1:
+        raise HTTPException(status_code=400, detail="limit must be positive")
+    limit = min(data.limit, FOREST_PAGE_LIMIT)
+    offset = max(data.offset, 0)
+    forest = parse_forest(build_grammar(data), data.string)
+    trees = []
+    for tree in forest.iter_trees(offset):
+        if len(trees) >= limit:
+            break
+        trees.append(serialize_tree(tree))
+    count = forest.count()
+    next_offset = offset + len(trees)
+    return {
+        "accepted": forest.accepted,
+        "ambiguous": count > 1,
+        "forest": serialize_forest(forest),
+        "trees": trees,
+        "next_offset": next_offset if next_offset < count else None
+    }
+
+@app.post("/cfg/analyze")
+def analyze_cfg(data: GrammarInput):
+    return build_grammar(data).summary()
+
+@app.post("/cfg/tables")
+@offload
+def cfg_tables(data: GrammarInput):
+    return generate_parser(build_grammar(data)).diagnostics()
+
 @app.post("/cfg/pda")
 def build_cfg_pda(data: CFGInput):
-    g = Grammar(data.start)
-    for lhs, rhss in data.grammar.items():
-        for rhs in rhss:
-            g.add_production(lhs, rhs)
+    g = build_grammar(data)
     pda = cfg_to_pda(g)
     return serialize_pda(pda)
 
-#------------------------------------------
-def serialize_pda(pda):
-    return {
-        "states": [s.name for s in pda.states],
-        "start": pda.start_state.name,
-        "accept": [s.name for s in pda.accept_states],
-        "transitions": [
-            {
-                "from": s.name,
-                "symbol": sym or "ε",
-                "pop": pop_sym,
-                "to": t.name,
-                "push": "".join(push) if isinstance(push, (list, tuple)) else str(push)
-            }
-            for (s, sym, pop_sym), targets in pda.transitions.items()
-            for (t, push) in targets
-        ]
-    }
-
 @app.post("/pda")
 def build_pda(data: regexInput):
     try:
@@ -315,6 +762,8 @@ def build_pda(data: regexInput):
     return result
 
 @app.post("/simulate/pda")
+@negotiated
+@offload
 def simulate_pda_api(data: SimulateInput):
     try:
         validate_regex(data.regex.strip())
@@ -336,11 +785,10 @@ def simulate_pda_api(data: SimulateInput):
 
 
 @app.post("/simulate/cfg/pda")
+@negotiated
+@offload
 def simulate_cfg_pda(data: CFGInput):
-    g = Grammar(data.start)
-    for lhs, rhss in data.grammar.items():
-        for rhs in rhss:
-            g.add_production(lhs, rhs)
+    g = build_grammar(data)
     pda = cfg_to_pda(g)
     from simulation.pda_simulator import simulate_general_pda
     accepted, history = simulate_general_pda(pda, data.string, accept_by_empty_stack=True)
@@ -355,66 +803,369 @@ def simulate_cfg_pda(data: CFGInput):
 # COMPARISON MODE
 #------------------------------------------
 
+def run_nfa_column(nfa, string, trace):
+    if not trace:
+        accepted, steps = simulate_nfa_bitparallel(nfa, string)
+        return accepted, [], steps
+    accepted, history = simulate_nfa(nfa, string)
+    return accepted, history, len(history)
+
+def run_dfa_column(dfa, string):
+    accepted, history = simulate_dfa(dfa, string)
+    return accepted, history, len(history)
+
+def run_tm_column(tm, string, trace):
+    tm = compile_tm(tm)
+    string = tm.translate(string)
+    if trace:
+        accepted, history = simulate_tm(tm, string)
+        return accepted, history, len(history)
+    run = run_tm_untraced(tm, string)
+    return run["accepted"], [], run["metrics"]["execution_steps"]
+
+def build_compare_pipeline(regex_text):
+    # Build each artifact once: NFA -> DFA -> TM.
+    nfa = build_regex_nfa(regex_text)
+    nfa_data = serialize_nfa(nfa)
+    dfa_data = dfa_dict(cached_regex_dfa(regex_text, lambda: subset_nfa_to_dfa(nfa)))
+    tm_data = build_tm_from_dfa(dfa_data)
+    return nfa, nfa_data, dfa_data, tm_data
+
+def build_compare_product(regex_text, other, operation):
+    # The minimized DFA of regex <operation> other, for the product column.
+    result = combine(build_regex_nfa(regex_text), build_regex_nfa(other), operation, minimize=True)
+    return result["dfa"], result["example"]
+
+async def run_column(request, fn, args, limits, memory):
+    try:
+        return await run_job(request, partial(measured, memory=memory), fn, *args, limits=limits)
+    except HTTPException as e:
+        if not isinstance(e.detail, dict):
+            raise
+        # Over budget: report it in the column instead of failing the request.
+        return None, {
+            "wall_time_ms": round(limits["timeout"] * 1000, 3) if e.detail["limit"] == "timeout" else None,
+            "peak_memory_kb": None,
+            "timed_out": e.detail["limit"] == "timeout",
+            "limit_exceeded": e.detail["limit"]
+        }
+
 @app.post("/compare")
-def compare_models(data: CompareInput):
+@negotiated
+async def compare_models(data: CompareInput, request: Request):
+    limits = request_limits(request)
+    nfa, nfa_data, dfa_data, tm_data = await run_job(request, build_compare_pipeline, data.regex, limits=limits)
+
+    # The three simulations are independent: run them side by side, each
+    # with its own time budget.
+    budget = min(max(data.time_budget, 0.1), COMPARE_TIME_BUDGET)
+    column_limits = dict(limits, timeout=min(budget, limits["timeout"]))
+    columns = [
+        ("nfa", nfa_data, run_nfa_column, (nfa, data.string, data.trace)),
+        ("dfa", dfa_data, run_dfa_column, (dfa_data, data.string)),
+        ("tm", tm_data, run_tm_column, (tm_data, data.string, data.trace))
+    ]
+    if data.other is not None:
+        # Optional fourth column: the product automaton of regex and other.
+        product_data, example = await run_job(request, build_compare_product, data.regex, data.other, data.operation, limits=limits)
+        columns.append(("product", product_data, run_dfa_column, (product_data, data.string)))
+    outcomes = await asyncio.gather(*(run_column(request, fn, args, column_limits, data.memory) for _, _, fn, args in columns))
+
+    result = {}
+    for (name, graph, _, _), (outcome, measures) in zip(columns, outcomes):
+        accepted, history, steps = outcome if outcome is not None else (None, [], None)
+        result[name] = {
+            "graph": graph,
+            "accepted": accepted,
+            "steps": history,
+            "metrics": {
+                "states": len(graph["states"]),
+                "transitions": len(graph["transitions"]),
+                "execution_steps": steps,
+                **measures
+            }
+        }
+    if data.other is not None:
+        result["product"].update(operation=data.operation, example=example)
+    return result
+
+
+#------------------------------------------
+# STORED MACHINES
+#------------------------------------------
+# Definitions live in the store of the API process; each worker keeps its
+# own LRU of compiled machines keyed by the same content hash, so repeated
+# simulations skip parsing and construction.
+
+MACHINE_CACHE_SIZE = 64
+
+machine_store = MachineStore()
+_machines = OrderedDict()
+_machines_lock = threading.Lock()
+
+
+class StoredMachine:
+    DEFAULT_MODEL = {"regex": "dfa", "dfa": "dfa", "tm": "tm", "pda": "pda", "grammar": "parse"}
+    MODELS = {
+        "regex": ("nfa", "dfa", "pda", "tm"),
+        "dfa": ("dfa",),
+        "tm": ("tm",),
+        "pda": ("pda",),
+        "grammar": ("parse", "pda")
+    }
+
+    def __init__(self, kind, definition):
+        self.kind = kind
+        self.definition = definition
+        self._artifacts = {}
+        try:
+            if kind == "regex":
+                self.artifact("nfa")
+            elif kind == "dfa":
+                self._artifacts["dfa"] = definition
+                self.artifact("compiled_dfa")
+            elif kind == "tm":
+                self._artifacts["tm"] = compile_tm(definition)
+            elif kind in ("pda", "grammar"):
+                self.artifact("pda" if kind == "pda" else "grammar")
+        except (KeyError, TypeError, AttributeError) as e:
+            raise ValueError(f"Invalid {kind} definition: {e}")
+
+    def _grammar(self):
+        if not isinstance(self.definition, dict):
+            raise ValueError("A grammar definition needs 'start' and 'grammar'")
+        return build_grammar(GrammarInput(**self.definition))
+
+    def artifact(self, name):
+        if name not in self._artifacts:
+            if name == "nfa":
+                value = build_regex_nfa(self.definition)
+            elif name == "dfa":
+                # A MappedDFA when the DFA cache is on, else the DFA dict.
+                value = cached_regex_dfa(self.definition, lambda: subset_nfa_to_dfa(self.artifact("nfa")))
+            elif name == "compiled_dfa":
+                value = compile_dfa(self.artifact("dfa"))
+            elif name == "tm":
+                value = compile_tm(build_tm_from_dfa(dfa_dict(self.artifact("dfa"))))
+            elif name == "bit_nfa":
+                value = compile_nfa(self.artifact("nfa"))
+            elif name == "grammar":
+                value = self._grammar()
+            elif name == "pda":
+                if self.kind == "grammar" or isinstance(self.definition, dict):
+                    value = cfg_to_pda(self.artifact("grammar"))
+                else:
+                    value = nfa_to_pda(self.artifact("nfa"))
+            self._artifacts[name] = value
+        return self._artifacts[name]
+
+    def describe(self):
+        return {
+            "kind": self.kind,
+            "models": list(self.MODELS[self.kind]),
+            "default_model": self.DEFAULT_MODEL[self.kind]
+        }
+
+    def _model(self, model):
+        model = model or self.DEFAULT_MODEL[self.kind]
+        if model not in self.MODELS[self.kind]:
+            raise ValueError(f"A {self.kind} machine cannot run as '{model}'")
+        return model
+
+    def cursor(self, model):
+        model = self._model(model)
+        if model == "nfa":
+            return nfa_cursor(self.artifact("nfa"))
+        if model == "dfa":
+            return dfa_cursor(self.artifact("dfa"), self.artifact("compiled_dfa"))
+        if model == "pda":
+            if self.kind == "regex" or not isinstance(self.definition, dict):
+                return pda_cursor(self.artifact("pda"))
+            return general_pda_cursor(self.artifact("pda"), accept_by_empty_stack=True)
+        raise ValueError(f"Incremental simulation does not support '{model}'")
+
+    def simulate(self, model, string, options):
+        model = self._model(model)
+        if model == "tm":
+            return run_tm_request(self.artifact("tm"), string, options)
+        if model == "parse":
+            engine, accepted, tree = run_cfg_parser(self.artifact("grammar"), string, options.engine)
+            result = {"accepted": accepted, "engine": engine, "tree": None}
+            if options.trace and tree:
+                result["tree"] = serialize_tree(tree)
+            return result
+        if model == "dfa" and not options.trace:
+            accepted, consumed = self.artifact("compiled_dfa").run(string)
+            steps = consumed + 1 + (consumed < len(string))
+            return {"accepted": accepted, "steps": [], "metrics": { "execution_steps": steps }}
+        if model == "nfa" and not options.trace:
+            accepted, steps = simulate_nfa_bitparallel(None, string, self.artifact("bit_nfa"))
+            return {"accepted": accepted, "steps": [], "metrics": { "execution_steps": steps }}
+        if model == "nfa":
+            accepted, history = simulate_nfa(self.artifact("nfa"), string)
+        elif model == "dfa":
+            accepted, history = simulate_dfa(self.artifact("dfa"), string, self.artifact("compiled_dfa"))
+        elif self.kind == "regex" or not isinstance(self.definition, dict):
+            accepted, history = simulate_pda(self.artifact("pda"), string)
+        else:
+            accepted, history = simulate_general_pda(self.artifact("pda"), string, accept_by_empty_stack=True)
+        return {
+            "accepted": accepted,
+            "steps": history if options.trace else [],
+            "metrics": { "execution_steps": len(history) }
+        }
+
+
+def get_machine(record):
+    # Handlers run in threads (cursors in the API process), so the LRU is
+    # locked; construction happens outside the lock.
+    with _machines_lock:
+        machine = _machines.get(record["id"])
+        if machine is not None:
+            _machines.move_to_end(record["id"])
+            return machine
+    machine = StoredMachine(record["kind"], record["definition"])
+    with _machines_lock:
+        machine = _machines.setdefault(record["id"], machine)
+        _machines.move_to_end(record["id"])
+        while len(_machines) > MACHINE_CACHE_SIZE:
+            _machines.popitem(last=False)
+    return machine
+
+
+def describe_machine(record):
     try:
-        validate_regex(data.regex.strip())
+        return get_machine(record).describe()
+    except HTTPException as e:
+        raise OffloadedHTTPError(e.status_code, e.detail)
+
+
+def simulate_machine(record, options):
+    try:
+        machine = get_machine(record)
+        if options.strings is None:
+            return machine.simulate(options.model, options.string or "", options)
+        options.trace = False
+        results = []
+        for string in options.strings:
+            run = machine.simulate(options.model, string, options)
+            results.append({"string": string, "accepted": run["accepted"]})
+        return {
+            "results": results,
+            "accepted_count": sum(1 for r in results if r["accepted"])
+        }
+    except HTTPException as e:
+        raise OffloadedHTTPError(e.status_code, e.detail)
+
+
+def stored_record(machine_id):
+    record = machine_store.get(machine_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail=f"Unknown machine '{machine_id}'")
+    return record
+
+@app.post("/machines")
+async def create_machine(data: MachineInput, request: Request):
+    try:
+        record, created = machine_store.put(data.kind, data.definition)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
+    try:
+        description = await run_job(request, describe_machine, record, limits=request_limits(request))
+    except HTTPException:
+        if created:
+            machine_store.delete(record["id"])
+        raise
+    return {"id": record["id"], "created": created, **description}
 
-    regex = insert_concatenation(data.regex.strip())
-    postfix = to_postfix(regex)
+@app.get("/machines/{machine_id}")
+def get_stored_machine(machine_id: str):
+    return stored_record(machine_id)
 
-    # --- Build & Simulate NFA ---
-    State._id = 0
-    nfa = regex_to_nfa(postfix)
-    normalize_nfa(nfa)
-    nfa_data = serialize_nfa(nfa)
-    nfa_accepted, nfa_history = simulate_nfa(nfa, data.string)
+@app.delete("/machines/{machine_id}")
+def delete_machine(machine_id: str):
+    if not machine_store.delete(machine_id):
+        raise HTTPException(status_code=404, detail=f"Unknown machine '{machine_id}'")
+    return {"id": machine_id, "deleted": True}
 
-    # --- Build & Simulate DFA ---
-    State._id = 0
-    nfa2 = regex_to_nfa(postfix)
-    normalize_nfa(nfa2)
-    from automata.subset_construction import nfa_to_dfa as subset_nfa_to_dfa
-    dfa_data = subset_nfa_to_dfa(nfa2)
-    from simulation.dfa_simulator import simulate_dfa
-    dfa_accepted, dfa_history = simulate_dfa(dfa_data, data.string)
-
-    # --- Build & Simulate TM ---
-    from automata.dfa_to_tm import dfa_to_tm as build_tm_from_dfa
-    tm_data = build_tm_from_dfa(dfa_data)
-    tm_accepted, tm_history = simulate_tm(tm_data, data.string)
+@app.post("/machines/{machine_id}/simulate")
+@negotiated
+async def simulate_stored_machine(machine_id: str, data: MachineSimulateInput, request: Request):
+    record = stored_record(machine_id)
+    return await run_job(request, simulate_machine, record, data, limits=request_limits(request))
+
+
+#------------------------------------------
+# SIMULATION CURSORS
+#------------------------------------------
+# Live-typing sessions on stored machines. Each cursor keeps one
+# configuration per input position in the API process, so an edit costs
+# O(edit size). Cursors expire after CURSOR_TTL idle seconds. They are not
+# run in the worker pool: the configurations would have to be shipped to a
+# worker and back on every keystroke, which costs more than the step itself,
+# and the machine is built once per stored record (get_machine's cache).
 
+CURSOR_LIMIT = 1024
+CURSOR_TTL = 1800.0
+
+_cursors = OrderedDict()
+_cursor_lock = threading.Lock()
+
+
+def cursor_state(cursor_id, cursor, entries):
     return {
-        "nfa": {
-            "graph": nfa_data,
-            "accepted": nfa_accepted,
-            "steps": nfa_history,
-            "metrics": {
-                "states": len(nfa_data["states"]),
-                "transitions": len(nfa_data["transitions"]),
-                "execution_steps": len(nfa_history)
-            }
-        },
-        "dfa": {
-            "graph": dfa_data,
-            "accepted": dfa_accepted,
-            "steps": dfa_history,
-            "metrics": {
-                "states": len(dfa_data["states"]),
-                "transitions": len(dfa_data["transitions"]),
-                "execution_steps": len(dfa_history)
-            }
-        },
-        "tm": {
-            "graph": tm_data,
-            "accepted": tm_accepted,
-            "steps": tm_history,
-            "metrics": {
-                "states": len(tm_data["states"]),
-                "transitions": len(tm_data["transitions"]),
-                "execution_steps": len(tm_history)
-            }
-        }
+        "cursor": cursor_id,
+        "position": cursor.position,
+        "text": "".join(cursor.text),
+        "accepted": cursor.accepted(),
+        "active": cursor.active(),
+        "steps": entries
     }
+
+
+def _get_cursor(cursor_id):
+    # The global lock covers the table only; each cursor has its own lock
+    # for stepping, so edits to different cursors run in parallel.
+    with _cursor_lock:
+        entry = _cursors.get(cursor_id)
+        if entry is None or time.monotonic() - entry[2] > CURSOR_TTL:
+            _cursors.pop(cursor_id, None)
+            raise HTTPException(status_code=404, detail=f"Unknown cursor '{cursor_id}'")
+        _cursors[cursor_id] = (entry[0], entry[1], time.monotonic())
+        _cursors.move_to_end(cursor_id)
+    return entry[0], entry[1]
+
+@app.post("/cursors")
+def create_cursor(data: CursorInput):
+    record = stored_record(data.machine_id)
+    try:
+        cursor = get_machine(record).cursor(data.model)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    cursor_id = secrets.token_hex(12)
+    with _cursor_lock:
+        _cursors[cursor_id] = (cursor, threading.Lock(), time.monotonic())
+        while len(_cursors) > CURSOR_LIMIT:
+            _cursors.popitem(last=False)
+    return cursor_state(cursor_id, cursor, cursor.initial)
+
+@app.post("/cursors/{cursor_id}/append")
+def append_cursor(cursor_id: str, data: CursorAppendInput):
+    cursor, lock = _get_cursor(cursor_id)
+    with lock:
+        entries = cursor.append(data.chars)
+        return cursor_state(cursor_id, cursor, entries)
+
+@app.post("/cursors/{cursor_id}/backspace")
+def backspace_cursor(cursor_id: str, data: CursorBackspaceInput):
+    cursor, lock = _get_cursor(cursor_id)
+    with lock:
+        cursor.backspace(data.count)
+        return cursor_state(cursor_id, cursor, [])
+
+@app.delete("/cursors/{cursor_id}")
+def delete_cursor(cursor_id: str):
+    with _cursor_lock:
+        if _cursors.pop(cursor_id, None) is None:
+            raise HTTPException(status_code=404, detail=f"Unknown cursor '{cursor_id}'")
+    return {"cursor": cursor_id, "deleted": True}
@@ -0,0 +1,129 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+MACHINE_KINDS = ("regex", "dfa", "tm", "pda", "grammar")
+STORE_SIZE = int(os.environ.get("TOC_STORE_SIZE", 256))
+STORE_TTL = float(os.environ.get("TOC_STORE_TTL", 3600))
+STORE_DIR = os.environ.get("TOC_STORE_DIR")
+SWEEP_INTERVAL = 60.0
+
+
+def machine_id(kind, definition):
+    canonical = json.dumps({"kind": kind, "definition": definition}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:24]
+
+
+class MachineStore:
+    # Uploaded machine definitions keyed by content hash, bounded by size
+    # (LRU) and idle time (TTL). With a directory, definitions are also
+    # written to disk and reloaded on a miss, e.g. after a restart; files
+    # idle past the TTL are removed by sweep(), which put() runs at most
+    # every SWEEP_INTERVAL seconds.
+    def __init__(self, size=STORE_SIZE, ttl=STORE_TTL, directory=STORE_DIR):
+        self.size = size
+        self.ttl = ttl
+        self.directory = directory
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._swept = time.monotonic()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def put(self, kind, definition):
+        if kind not in MACHINE_KINDS:
+            raise ValueError(f"Unknown machine kind '{kind}'")
+        key = machine_id(kind, definition)
+        record = {"id": key, "kind": kind, "definition": definition}
+        with self._lock:
+            created = key not in self._entries
+            self._entries[key] = (record, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+        if self.directory and not os.path.exists(self._path(key)):
+            tmp = self._path(key) + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(record, f, ensure_ascii=False)
+            os.replace(tmp, self._path(key))
+        self._maybe_sweep()
+        return record, created
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                record, touched = entry
+                if now - touched <= self.ttl:
+                    self._entries[key] = (record, now)
+                    self._entries.move_to_end(key)
+                    return record
+                del self._entries[key]
+        return self._load(key)
+
+    def _load(self, key):
+        if not self.directory or not key.isalnum():
+            return None
+        path = self._path(key)
+        try:
+            if time.time() - os.path.getmtime(path) > self.ttl:
+                os.remove(path)
+                return None
+            with open(path, encoding="utf-8") as f:
+                record = json.load(f)
+        except (OSError, ValueError):
+            return None
+        os.utime(path)
+        with self._lock:
+            self._entries[key] = (record, time.monotonic())
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+        return record
+
+    def _maybe_sweep(self):
+        now = time.monotonic()
+        with self._lock:
+            if now - self._swept < SWEEP_INTERVAL:
+                return
+            self._swept = now
+        self.sweep()
+
+    def sweep(self):
+        # Drops entries idle past the TTL from memory, and their files from
+        # disk unless the entry is still live in memory.
+        now = time.monotonic()
+        with self._lock:
+            expired = [key for key, (_, touched) in self._entries.items() if now - touched > self.ttl]
+            for key in expired:
+                del self._entries[key]
+            live = set(self._entries)
+        removed = len(expired)
+        if not self.directory:
+            return removed
+        cutoff = time.time() - self.ttl
+        for name in os.listdir(self.directory):
+            key, ext = os.path.splitext(name)
+            if ext != ".json" or key in live:
+                continue
+            try:
+                if os.path.getmtime(os.path.join(self.directory, name)) < cutoff:
+                    os.remove(os.path.join(self.directory, name))
+                    removed += 1
+            except OSError:
+                pass
+        return removed
+
+    def delete(self, key):
+        with self._lock:
+            found = self._entries.pop(key, None) is not None
+        if self.directory and key.isalnum() and os.path.exists(self._path(key)):
+            os.remove(self._path(key))
+            found = True
+        return found
@@ -0,0 +1,145 @@
+from bisect import bisect_right
+
+from regex.charclass import MAX_CODEPOINT, class_label, label_ranges, merge_ranges
+
+# Symbol equivalence classes. Edge labels may be single characters or
+# character classes; the code points are split into the classes no label
+# tells apart, and each class is named by its smallest member (its
+# representative). Automata built on a SymbolClasses carry representatives
+# as their edge symbols, so tables are as wide as the number of classes
+# rather than the number of characters, and input is mapped onto
+# representatives with classify: a 256-entry table for bytes, a binary
+# search over class boundaries beyond that. Characters no label mentions
+# map to themselves and match nothing.
+
+
+class SymbolClasses:
+    def __init__(self, labels):
+        # labels: lists of (lo, hi) code point ranges.
+        labels = [list(ranges) for ranges in labels]
+        bounds = {0}
+        for ranges in labels:
+            for lo, hi in ranges:
+                bounds.add(lo)
+                if hi < MAX_CODEPOINT:
+                    bounds.add(hi + 1)
+        self._starts = sorted(bounds)
+
+        # An elementary interval's signature is the set of labels holding it;
+        # intervals with the same signature form one class.
+        signatures = [[] for _ in self._starts]
+        for n, ranges in enumerate(labels):
+            for lo, hi in ranges:
+                for i in range(bisect_right(self._starts, lo) - 1, bisect_right(self._starts, hi)):
+                    signatures[i].append(n)
+        members = {}
+        for i, signature in enumerate(signatures):
+            if signature:
+                members.setdefault(tuple(signature), []).append(i)
+
+        self._names = [None] * len(self._starts)
+        self.members = {}
+        for intervals in members.values():
+            name = chr(self._starts[intervals[0]])
+            ranges = []
+            for i in intervals:
+                self._names[i] = name
+                end = self._starts[i + 1] - 1 if i + 1 < len(self._starts) else MAX_CODEPOINT
+                ranges.append((self._starts[i], end))
+            self.members[name] = merge_ranges(ranges)
+        self._bytes = [self._lookup(chr(code)) for code in range(256)]
+
+    def _lookup(self, char):
+        name = self._names[bisect_right(self._starts, ord(char)) - 1]
+        return char if name is None else name
+
+    def classify(self, char):
+        code = ord(char)
+        return self._bytes[code] if code < 256 else self._lookup(char)
+
+    def translate(self, string):
+        return "".join(map(self.classify, string))
+
+    def __len__(self):
+        return len(self.members)
+
+    def size(self, name):
+        return sum(hi - lo + 1 for lo, hi in self.members[name])
+
+    def label(self, name):
+        ranges = self.members[name]
+        return name if ranges == [(ord(name), ord(name))] else class_label(ranges)
+
+    def names_in(self, ranges):
+        # The classes making up a label (its ranges as given to __init__).
+        names = []
+        for lo, hi in ranges:
+            for i in range(bisect_right(self._starts, lo) - 1, bisect_right(self._starts, hi)):
+                if self._names[i] not in names:
+                    names.append(self._names[i])
+        return names
+
+    def to_dict(self):
+        return {name: self.label(name) for name in sorted(self.members)}
+
+    @classmethod
+    def from_dict(cls, classes):
+        return cls(label_ranges(label) for label in classes.values())
+
+
+def load_classes(data):
+    # The SymbolClasses of a serialized automaton, or None without classes.
+    classes = data.get("classes") if isinstance(data, dict) else None
+    return SymbolClasses.from_dict(classes) if classes else None
+
+
+def translate_input(data, string):
+    # Input for a machine built on classes (a dict carrying "classes"), with
+    # each character replaced by its class representative.
+    classes = load_classes(data)
+    return classes.translate(string) if classes is not None else string
+
+
+def relabel(nfa, classes):
+    # Rewrite every labelled edge as one edge per class of `classes` it
+    # covers. Labels are read through the NFA's current classes, if any.
+    current = nfa.classes
+    transitions = {}
+    for (state, symbol), targets in nfa.transitions.items():
+        if symbol is None:
+            names = [None]
+        else:
+            names = classes.names_in(current.members[symbol] if current else label_ranges(symbol))
+        for name in names:
+            transitions.setdefault((state, name), set()).update(targets)
+    nfa.transitions = transitions
+    nfa.classes = classes
+
+
+def assign_symbol_classes(nfa):
+    # Thompson NFAs label edges with characters and class texts ("[a-z]").
+    # If every label is one character, they are their own classes and the
+    # NFA is left as is (classes None).
+    labels = {symbol for _, symbol in nfa.transitions if symbol is not None}
+    nfa.classes = None
+    if any(len(label) > 1 for label in labels):
+        relabel(nfa, SymbolClasses(label_ranges(label) for label in sorted(labels)))
+    return nfa
+
+
+def align_classes(nfas, extra=()):
+    # Put NFAs (and extra characters) on one common partition, so products
+    # can pair up their symbols. Does nothing unless one of them has classes.
+    nfas = [nfa for nfa in nfas if nfa is not None]
+    if all(nfa.classes is None for nfa in nfas):
+        return None
+    labels = [[(ord(c), ord(c))] for c in extra]
+    for nfa in nfas:
+        if nfa.classes is None:
+            labels.extend(label_ranges(symbol) for _, symbol in nfa.transitions if symbol is not None)
+        else:
+            labels.extend(nfa.classes.members.values())
+    classes = SymbolClasses(labels)
+    for nfa in nfas:
+        relabel(nfa, classes)
+    return classes
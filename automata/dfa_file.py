@@ -0,0 +1,330 @@
+import hashlib
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+from automata.alphabet import load_classes
+
+# Binary DFA file (little-endian), version 2:
+#
+#   header     magic "TDFA", version u16, flags u16, states u32, symbols u32,
+#              start u32, reserved u32, then u64 offsets of the sections
+#              below (state map, classes: 0 when absent)
+#   symbols    string list, sorted; column i of the table is symbols[i]
+#   names      string list, state names by index
+#   table      uint32[states * symbols], row-major, DEAD for no transition
+#   accept     bitmap, bit i of byte i // 8 set when state i accepts
+#   state map  optional, per state a string list (the NFA states of a
+#              subset-construction state)
+#   classes    optional, a string list: the class label of each symbol, for
+#              DFAs over symbol classes (symbols are class representatives)
+#
+# A string list is a u32 count followed by (u32 byte length, UTF-8 bytes)
+# items. The table starts on a 4-byte boundary so it can be used straight
+# from the mapping.
+
+MAGIC = b"TDFA"
+VERSION = 2
+FLAG_STATE_MAP = 1
+FLAG_CLASSES = 2
+DEAD = 0xFFFFFFFF
+HEADER = struct.Struct("<4sHHIIII6Q")
+CACHE_DIR = os.environ.get("TOC_DFA_CACHE_DIR")
+
+
+def _pack_strings(strings):
+    parts = [struct.pack("<I", len(strings))]
+    for s in strings:
+        data = s.encode("utf-8")
+        parts.append(struct.pack("<I", len(data)))
+        parts.append(data)
+    return b"".join(parts)
+
+
+def _unpack_strings(buffer, offset):
+    (count,) = struct.unpack_from("<I", buffer, offset)
+    offset += 4
+    strings = []
+    for _ in range(count):
+        (length,) = struct.unpack_from("<I", buffer, offset)
+        offset += 4
+        strings.append(bytes(buffer[offset:offset + length]).decode("utf-8"))
+        offset += length
+    return strings, offset
+
+
+def dump_dfa(dfa_data):
+    # Serializes a DFA dict (the nfa_to_dfa format) to bytes.
+    names = list(dfa_data["states"])
+    index = {name: i for i, name in enumerate(names)}
+    symbols = sorted({t["symbol"] for t in dfa_data["transitions"]})
+    column = {symbol: i for i, symbol in enumerate(symbols)}
+    n, k = len(names), len(symbols)
+
+    table = array("I", [DEAD]) * (n * k)
+    for t in dfa_data["transitions"]:
+        cell = index[t["from"]] * k + column[t["symbol"]]
+        if table[cell] == DEAD:
+            table[cell] = index[t["to"]]
+    if sys.byteorder == "big":
+        table.byteswap()
+
+    accept = bytearray((n + 7) // 8)
+    for name in dfa_data["accept"]:
+        i = index[name]
+        accept[i >> 3] |= 1 << (i & 7)
+
+    state_map = dfa_data.get("state_map")
+    classes = dfa_data.get("classes")
+    sections = [_pack_strings(symbols), _pack_strings(names)]
+    offsets = []
+    position = HEADER.size
+    body = []
+    for section in sections:
+        offsets.append(position)
+        body.append(section)
+        position += len(section)
+    padding = -position % 4
+    body.append(b"\0" * padding)
+    position += padding
+    offsets.append(position)
+    body.append(table.tobytes())
+    position += n * k * 4
+    offsets.append(position)
+    body.append(bytes(accept))
+    position += len(accept)
+    if state_map is not None:
+        offsets.append(position)
+        section = b"".join(_pack_strings(list(state_map.get(name, []))) for name in names)
+        body.append(section)
+        position += len(section)
+    else:
+        offsets.append(0)
+    if classes:
+        offsets.append(position)
+        body.append(_pack_strings([classes[symbol] for symbol in symbols]))
+    else:
+        offsets.append(0)
+
+    flags = (FLAG_STATE_MAP if state_map is not None else 0) | (FLAG_CLASSES if classes else 0)
+    header = HEADER.pack(MAGIC, VERSION, flags, n, k, index[dfa_data["start"]], 0, *offsets)
+    return header + b"".join(body)
+
+
+def save_dfa(dfa_data, path):
+    # Written to a temporary file first, so readers never see a partial file.
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(dump_dfa(dfa_data))
+    os.replace(tmp, path)
+
+
+class _MappedTable:
+    # {(state name, symbol): state name} lookups read through the mapping;
+    # only the state names are decoded.
+    def __init__(self, dfa):
+        self.dfa = dfa
+        self.index = {name: i for i, name in enumerate(dfa.names)}
+
+    def get(self, key, default=None):
+        i = self.index.get(key[0])
+        target = None if i is None else self.dfa.next_index(i, key[1])
+        return default if target is None else self.dfa.names[target]
+
+
+class MappedDFA:
+    # A DFA file used in place: the transition table and accept bitmap are
+    # views into the mapping. Offers the CompiledDFA interface (run, match,
+    # start, accept, table) so simulators and scanners take it as is; names
+    # are decoded only when a trace or to_dict needs them.
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        buffer = memoryview(self._mmap)
+        if len(buffer) < HEADER.size:
+            raise ValueError(f"{path}: not a DFA file")
+        (magic, version, flags, n, k, start, _,
+         symbols_at, names_at, table_at, accept_at, state_map_at, classes_at) = HEADER.unpack_from(buffer, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path}: not a DFA file")
+        if version != VERSION:
+            raise ValueError(f"{path}: unsupported DFA file version {version}")
+        if accept_at + (n + 7) // 8 > len(buffer) or table_at + n * k * 4 > accept_at:
+            raise ValueError(f"{path}: truncated DFA file")
+        self.path = path
+        self.size = n
+        self.start_index = start
+        self.symbols, _ = _unpack_strings(buffer, symbols_at)
+        self.columns = {symbol: i for i, symbol in enumerate(self.symbols)}
+        self._names_at = names_at
+        self._state_map_at = state_map_at if flags & FLAG_STATE_MAP else 0
+        self.classes = None
+        if flags & FLAG_CLASSES:
+            labels, _ = _unpack_strings(buffer, classes_at)
+            self.classes = load_classes({"classes": dict(zip(self.symbols, labels))})
+        cells = buffer[table_at:table_at + n * k * 4]
+        if sys.byteorder == "little":
+            self.cells = cells.cast("I")
+        else:
+            self.cells = array("I", cells)
+            self.cells.byteswap()
+        self.bitmap = buffer[accept_at:accept_at + (n + 7) // 8]
+        self._names = None
+        self._table = None
+
+    def close(self):
+        self.cells = self.bitmap = None
+        self._mmap.close()
+
+    def accepting(self, i):
+        return self.bitmap[i >> 3] >> (i & 7) & 1 == 1
+
+    def next_index(self, i, symbol):
+        column = self.columns.get(symbol)
+        if column is None:
+            return None
+        target = self.cells[i * len(self.symbols) + column]
+        return None if target == DEAD else target
+
+    def translate(self, text):
+        return text if self.classes is None else self.classes.translate(text)
+
+    def run(self, input_string):
+        cells, columns, k = self.cells, self.columns, len(self.symbols)
+        state = self.start_index
+        for i, char in enumerate(self.translate(input_string)):
+            column = columns.get(char)
+            if column is None:
+                return False, i
+            state = cells[state * k + column]
+            if state == DEAD:
+                return False, i
+        return self.accepting(state), len(input_string)
+
+    def match(self, text, pos=0):
+        cells, columns, k = self.cells, self.columns, len(self.symbols)
+        state = self.start_index
+        end = pos if self.accepting(state) else -1
+        classify = self.classes.classify if self.classes is not None else None
+        for i in range(pos, len(text)):
+            column = columns.get(text[i] if classify is None else classify(text[i]))
+            if column is None:
+                break
+            state = cells[state * k + column]
+            if state == DEAD:
+                break
+            if self.accepting(state):
+                end = i + 1
+        return end
+
+    @property
+    def names(self):
+        if self._names is None:
+            self._names, _ = _unpack_strings(memoryview(self._mmap), self._names_at)
+        return self._names
+
+    @property
+    def start(self):
+        return self.names[self.start_index]
+
+    @property
+    def accept(self):
+        return {name for i, name in enumerate(self.names) if self.accepting(i)}
+
+    @property
+    def table(self):
+        # Lookups by state name, for the traced simulator and cursors.
+        if self._table is None:
+            self._table = _MappedTable(self)
+        return self._table
+
+    def to_dict(self):
+        names, k = self.names, len(self.symbols)
+        dfa = {
+            "states": list(names),
+            "transitions": [
+                {"from": names[i], "to": names[target], "symbol": symbol}
+                for i in range(self.size)
+                for column, symbol in enumerate(self.symbols)
+                for target in (self.cells[i * k + column],)
+                if target != DEAD
+            ],
+            "start": names[self.start_index],
+            "accept": [name for i, name in enumerate(names) if self.accepting(i)]
+        }
+        if self._state_map_at:
+            buffer = memoryview(self._mmap)
+            offset = self._state_map_at
+            state_map = {}
+            for name in names:
+                state_map[name], offset = _unpack_strings(buffer, offset)
+            dfa["state_map"] = state_map
+        if self.classes is not None:
+            dfa["classes"] = self.classes.to_dict()
+        return dfa
+
+
+def load_dfa(path):
+    return MappedDFA(path)
+
+
+class DFACache:
+    # Warm-start cache of regex DFAs: one file per regex, named by a hash of
+    # the regex and the format version.
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, regex):
+        key = hashlib.sha256(f"{VERSION}:{regex}".encode("utf-8")).hexdigest()[:32]
+        return os.path.join(self.directory, f"{key}.tdfa")
+
+    def get(self, regex):
+        path = self.path(regex)
+        try:
+            return MappedDFA(path)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, struct.error):
+            # Corrupt or from another version: rebuild it.
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+
+    def put(self, regex, dfa_data):
+        path = self.path(regex)
+        save_dfa(dfa_data, path)
+        return MappedDFA(path)
+
+
+_default_cache = None
+
+
+def default_cache():
+    global _default_cache
+    if _default_cache is None and CACHE_DIR:
+        _default_cache = DFACache(CACHE_DIR)
+    return _default_cache
+
+
+def cached_regex_dfa(regex, build, cache=None):
+    # The MappedDFA of a regex, built with build() only on a cache miss;
+    # build()'s DFA dict when no cache directory is configured. Both run
+    # through compile_dfa and the simulators; use dfa_dict for the dict.
+    cache = cache or default_cache()
+    if cache is None:
+        return build()
+    regex = regex.strip()
+    mapped = cache.get(regex)
+    if mapped is not None:
+        return mapped
+    return cache.put(regex, build())
+
+
+def dfa_dict(dfa):
+    # The DFA dict of a DFA dict or a MappedDFA (decoding the whole table).
+    return dfa if isinstance(dfa, dict) else dfa.to_dict()
@@ -30,7 +30,7 @@ def dfa_to_tm(dfa):
     # 3. Construct Final TM Structure
     all_states = dfa["states"] + ["q_accept", "q_reject"]
     
-    return {
+    tm = {
         "states": all_states,
         "start": dfa["start"],
         "accept": ["q_accept"], # Only explicit q_accept is the halting accept state
@@ -38,3 +38,6 @@ def dfa_to_tm(dfa):
         "transitions": tm_transitions,
         "tape_alphabet": ["_"] # Implicitly includes input alphabet
     }
+    if "classes" in dfa:
+        tm["classes"] = dfa["classes"]
+    return tm
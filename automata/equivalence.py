@@ -0,0 +1,140 @@
+from collections import deque
+
+from simulation.nfa_simulator import epsilon_closure, move
+from automata.subset_construction import get_alphabet
+from automata.alphabet import align_classes
+from core.limits import LimitExceeded, get_limit
+from core.metrics import timed
+
+
+class LazyDFA:
+    # The subset construction run on demand: a state is the ε-closed
+    # frozenset of NFA states (empty for the dead state), and successors are
+    # computed the first time they are asked for.
+    def __init__(self, nfa):
+        self.nfa = nfa
+        self.alphabet = get_alphabet(nfa)
+        self.start = frozenset(epsilon_closure(nfa, {nfa.start_state})[0])
+        self._next = {}
+
+    def next(self, state, symbol):
+        key = (state, symbol)
+        if key not in self._next:
+            self._next[key] = frozenset(epsilon_closure(self.nfa, move(self.nfa, state, symbol)[0])[0])
+        return self._next[key]
+
+    def accepting(self, state):
+        return not state.isdisjoint(self.nfa.accept_states)
+
+    def dead(self, state):
+        return not state
+
+    def describe(self, state):
+        return sorted(s.name for s in state)
+
+    @property
+    def size(self):
+        # DFA states discovered so far.
+        return len({self.start} | set(self._next.values()))
+
+
+class ProductDFA:
+    # Runs two lazy DFAs side by side; a state is a pair of their states and
+    # accepts when accept(left accepts, right accepts) does.
+    def __init__(self, left, right, accept):
+        self.left = left
+        self.right = right
+        self.accept = accept
+        self.alphabet = sorted(set(left.alphabet) | set(right.alphabet))
+        self.start = (left.start, right.start)
+
+    def next(self, state, symbol):
+        return self.left.next(state[0], symbol), self.right.next(state[1], symbol)
+
+    def accepting(self, state):
+        return self.accept(self.left.accepting(state[0]), self.right.accepting(state[1]))
+
+    def dead(self, state):
+        # No word can be accepted from here if accept() is false for every
+        # outcome the two sides can still produce.
+        left = (False,) if self.left.dead(state[0]) else (False, True)
+        right = (False,) if self.right.dead(state[1]) else (False, True)
+        return not any(self.accept(a, b) for a in left for b in right)
+
+    def describe(self, state):
+        return ([f"left:{name}" for name in self.left.describe(state[0])] +
+                [f"right:{name}" for name in self.right.describe(state[1])])
+
+
+def find_difference(left, right):
+    # Hopcroft-Karp: walks pairs of states reachable by the same word,
+    # breadth first, merging the two sides of each pair in a union-find so
+    # a pair already implied by earlier ones is never expanded. Returns
+    # (shortest word accepted by exactly one side or None, pairs expanded).
+    parent = {}
+
+    def find(node):
+        parent.setdefault(node, node)
+        while parent[node] != node:
+            parent[node] = parent[parent[node]]
+            node = parent[node]
+        return node
+
+    alphabet = sorted(set(left.alphabet) | set(right.alphabet))
+    max_states = get_limit("max_states")
+    parent[(0, left.start)] = (1, right.start)
+    queue = deque([(left.start, right.start, "")])
+    expanded = 0
+    while queue:
+        p, q, word = queue.popleft()
+        if left.accepting(p) != right.accepting(q):
+            return word, expanded
+        expanded += 1
+        if expanded > max_states:
+            raise LimitExceeded("max_states", max_states, f"Equivalence check exceeded {max_states} state pairs")
+        for symbol in alphabet:
+            p2, q2 = left.next(p, symbol), right.next(q, symbol)
+            a, b = find((0, p2)), find((1, q2))
+            if a != b:
+                parent[a] = b
+                queue.append((p2, q2, word + symbol))
+    return None, expanded
+
+
+@timed("equivalence")
+def check_equivalent(left_nfa, right_nfa):
+    align_classes([left_nfa, right_nfa])
+    left, right = LazyDFA(left_nfa), LazyDFA(right_nfa)
+    word, expanded = find_difference(left, right)
+    result = {"equivalent": word is None, "counterexample": word, "accepted_by": None}
+    if word is not None:
+        result["accepted_by"] = "left" if _accepts(left, word) else "right"
+    result["metrics"] = _metrics(left, right, expanded)
+    return result
+
+
+@timed("inclusion")
+def check_includes(left_nfa, right_nfa):
+    # L(right) ⊆ L(left) exactly when L(left) ∪ L(right) = L(left); a word
+    # telling those apart is in L(right) but not in L(left).
+    align_classes([left_nfa, right_nfa])
+    left, right = LazyDFA(left_nfa), LazyDFA(right_nfa)
+    word, expanded = find_difference(left, ProductDFA(left, right, lambda a, b: a or b))
+    result = {"includes": word is None, "counterexample": word}
+    result["metrics"] = _metrics(left, right, expanded)
+    return result
+
+
+def _accepts(dfa, word):
+    state = dfa.start
+    for symbol in word:
+        state = dfa.next(state, symbol)
+    return dfa.accepting(state)
+
+
+def _metrics(left, right, expanded):
+    return {
+        "pairs_explored": expanded,
+        "left_states": left.size,
+        "right_states": right.size
+    }
@@ -0,0 +1,276 @@
+import math
+import sys
+from collections import deque
+
+from automata.alphabet import load_classes
+from core.limits import LimitExceeded, get_limit
+from core.metrics import timed
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class Language:
+    # The language of a DFA dict (the nfa_to_dfa format). One breadth-first
+    # pass from the start, expanding symbols in order, finds the reachable
+    # states with the shortlex-least word to each: the first accepting one
+    # gives the shortest accepted string. The automaton is then trimmed to
+    # useful states (reachable and able to reach an accept state), so
+    # counting and enumeration never walk into dead ends. Over symbol
+    # classes an edge stands for every member of its class: it counts as
+    # the class size, and enumeration walks the members' code point ranges.
+    def __init__(self, dfa_data):
+        table = {}
+        for t in dfa_data["transitions"]:
+            table.setdefault(t["from"], {}).setdefault(t["symbol"], t["to"])
+        self.alphabet = sorted({t["symbol"] for t in dfa_data["transitions"]})
+        accept = set(dfa_data["accept"])
+
+        start = dfa_data["start"]
+        parents = {start: None}
+        order = [start]
+        for state in order:
+            for symbol in self.alphabet:
+                target = table.get(state, {}).get(symbol)
+                if target is not None and target not in parents:
+                    parents[target] = (state, symbol)
+                    order.append(target)
+        self.shortest = None
+        first = next((s for s in order if s in accept), None)
+        if first is not None:
+            word = []
+            while parents[first] is not None:
+                first, symbol = parents[first]
+                word.append(symbol)
+            self.shortest = "".join(reversed(word))
+
+        predecessors = {}
+        for state in order:
+            for target in table.get(state, {}).values():
+                predecessors.setdefault(target, []).append(state)
+        useful = {s for s in order if s in accept}
+        queue = deque(useful)
+        while queue:
+            for source in predecessors.get(queue.popleft(), ()):
+                if source not in useful:
+                    useful.add(source)
+                    queue.append(source)
+
+        self.states = [s for s in order if s in useful]
+        index = {s: i for i, s in enumerate(self.states)}
+        self.start = index.get(start)
+        self.accept = {index[s] for s in self.states if s in accept}
+        self.edges = [
+            [(symbol, index[table[s][symbol]]) for symbol in self.alphabet if table.get(s, {}).get(symbol) in index]
+            for s in self.states
+        ]
+        classes = load_classes(dfa_data)
+        if classes is None:
+            self.weights = dict.fromkeys(self.alphabet, 1)
+            members = {symbol: [(ord(symbol), ord(symbol))] for symbol in self.alphabet}
+        else:
+            self.weights = {symbol: classes.size(symbol) for symbol in self.alphabet}
+            members = classes.members
+        # ranges[i]: (lo, hi, target) code point ranges out of state i, sorted.
+        self.ranges = [
+            sorted((lo, hi, target) for symbol, target in edges for lo, hi in members[symbol])
+            for edges in self.edges
+        ]
+        self.finite = not self._has_cycle()
+        self._live = [self.accept]
+
+    @property
+    def empty(self):
+        return self.start is None
+
+    def _has_cycle(self):
+        # Iterative three-colour DFS over the useful states.
+        colour = [0] * len(self.states)
+        for root in range(len(self.states)):
+            if colour[root]:
+                continue
+            colour[root] = 1
+            stack = [(root, iter(self.edges[root]))]
+            while stack:
+                state, edges = stack[-1]
+                for _, target in edges:
+                    if colour[target] == 1:
+                        return True
+                    if colour[target] == 0:
+                        colour[target] = 1
+                        stack.append((target, iter(self.edges[target])))
+                        break
+                else:
+                    colour[state] = 2
+                    stack.pop()
+        return False
+
+    def live(self, remaining):
+        # States with an accepted continuation of exactly `remaining` symbols.
+        while len(self._live) <= remaining:
+            previous = self._live[-1]
+            self._live.append({i for i, edges in enumerate(self.edges) if any(t in previous for _, t in edges)})
+        return self._live[remaining]
+
+    def count(self, length):
+        # Number of accepted strings of exactly this length.
+        if self.empty:
+            return 0
+        max_steps = get_limit("max_steps")
+        if length > max_steps:
+            raise LimitExceeded("max_steps", max_steps, f"Length {length} exceeds {max_steps}")
+        size = len(self.states)
+        transitions = sum(len(edges) for edges in self.edges)
+        # Dynamic programming costs length * transitions; repeated squaring
+        # of the transition-count matrix log(length) * size^3.
+        if length * transitions <= length.bit_length() * size ** 3:
+            return self._count_dp(length)
+        return self._count_matrix(length)
+
+    def _count_dp(self, length):
+        counts = [0] * len(self.states)
+        counts[self.start] = 1
+        for _ in range(length):
+            following = [0] * len(counts)
+            for state, n in enumerate(counts):
+                if n:
+                    for symbol, target in self.edges[state]:
+                        following[target] += n * self.weights[symbol]
+            counts = following
+        return sum(counts[i] for i in self.accept)
+
+    def _count_matrix(self, length):
+        size = len(self.states)
+        if numpy is not None:
+            # int64 while every entry (at most width^length, width being
+            # the most characters leaving one state) fits, Python ints in
+            # object arrays beyond that.
+            width = max(sum(self.weights[symbol] for symbol, _ in edges) for edges in self.edges)
+            exact = length * math.log2(max(width, 1)) < 62
+            matrix = numpy.zeros((size, size), dtype=numpy.int64 if exact else object)
+            for state, edges in enumerate(self.edges):
+                for symbol, target in edges:
+                    matrix[state, target] += self.weights[symbol]
+            vector = numpy.zeros(size, dtype=matrix.dtype)
+            vector[self.start] = 1
+            while length:
+                if length & 1:
+                    vector = vector @ matrix
+                length >>= 1
+                if length:
+                    matrix = matrix @ matrix
+            return int(sum(vector[i] for i in self.accept))
+
+        matrix = [[0] * size for _ in range(size)]
+        for state, edges in enumerate(self.edges):
+            for symbol, target in edges:
+                matrix[state][target] += self.weights[symbol]
+        vector = [0] * size
+        vector[self.start] = 1
+        while length:
+            if length & 1:
+                vector = [sum(vector[k] * matrix[k][j] for k in range(size) if vector[k]) for j in range(size)]
+            length >>= 1
+            if length:
+                columns = list(zip(*matrix))
+                matrix = [[sum(a * b for a, b in zip(row, column)) for column in columns] for row in matrix]
+        return sum(vector[i] for i in self.accept)
+
+    def strings(self, after=None):
+        # Accepted strings in shortlex order (by length, then symbol by
+        # symbol), starting just after `after` when given.
+        if self.empty:
+            return
+        length = 0 if after is None else len(after)
+        while not (self.finite and length >= len(self.states)):
+            yield from self._strings_of_length(length, after if after is not None and len(after) == length else None)
+            length += 1
+
+    def _strings_of_length(self, length, after):
+        if self.start not in self.live(length):
+            return
+        if length == 0:
+            if after is None:
+                yield ""
+            return
+        path = []
+        # (state, next range to try, next code point in it, still equal to
+        # the prefix of `after`)
+        stack = [(self.start, 0, None, after is not None)]
+        while stack:
+            state, i, code, tight = stack.pop()
+            depth = len(path)
+            remaining = length - depth - 1
+            live = self.live(remaining)
+            ranges = self.ranges[state]
+            bound = ord(after[depth]) if tight else -1
+            while i < len(ranges):
+                lo, hi, target = ranges[i]
+                code = max(lo, bound) if code is None else code
+                if target not in live or code > hi:
+                    i, code = i + 1, None
+                    continue
+                char = chr(code)
+                child_tight = tight and code == bound
+                if remaining == 0:
+                    if code < hi:
+                        code += 1
+                    else:
+                        i, code = i + 1, None
+                    if not child_tight:
+                        yield "".join(path) + char
+                    continue
+                if code < hi:
+                    stack.append((state, i, code + 1, tight))
+                else:
+                    stack.append((state, i + 1, None, tight))
+                stack.append((target, 0, None, child_tight))
+                path.append(char)
+                break
+            else:
+                if path:
+                    path.pop()
+
+
+def summarize(language):
+    return {
+        "empty": language.empty,
+        "finite": language.finite,
+        "shortest": language.shortest,
+        "useful_states": len(language.states)
+    }
+
+
+@timed("count_strings")
+def count_strings(dfa_data, length):
+    language = Language(dfa_data)
+    return dict(summarize(language), length=length, count=decimal(language.count(length)))
+
+
+@timed("enumerate_strings")
+def enumerate_strings(dfa_data, limit, after=None):
+    # One page of the shortlex enumeration; "cursor" resumes after it, and
+    # is None once the language is exhausted.
+    language = Language(dfa_data)
+    page = []
+    for string in language.strings(after):
+        if len(page) == limit:
+            break
+        page.append(string)
+    else:
+        return dict(summarize(language), strings=page, cursor=None)
+    return dict(summarize(language), strings=page, cursor=page[-1])
+
+
+def decimal(n):
+    # Counts easily pass the interpreter's int -> str digit limit.
+    if not hasattr(sys, "get_int_max_str_digits"):
+        return str(n)
+    limit = sys.get_int_max_str_digits()
+    sys.set_int_max_str_digits(0)
+    try:
+        return str(n)
+    finally:
+        sys.set_int_max_str_digits(limit)
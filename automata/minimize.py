@@ -0,0 +1,59 @@
+from collections import deque
+
+from core.metrics import timed
+
+
+@timed("minimize")
+def minimize_dfa(dfa_data):
+    # Moore's partition refinement on a DFA dict (the nfa_to_dfa format),
+    # with missing transitions going to an implicit dead state. Returns the
+    # minimal partial DFA, states M0, M1, ... in breadth-first order, and a
+    # state_map from each new state to the states it merges.
+    table = {(t["from"], t["symbol"]): t["to"] for t in dfa_data["transitions"]}
+    alphabet = sorted({symbol for _, symbol in table})
+    accept = set(dfa_data["accept"])
+    states = list(dfa_data["states"]) + [None]
+    block = {s: int(s in accept) for s in states}
+    count = len(set(block.values()))
+    while True:
+        signatures = {}
+        refined = {}
+        for s in states:
+            key = (block[s],) + tuple(block[table.get((s, a))] for a in alphabet)
+            refined[s] = signatures.setdefault(key, len(signatures))
+        block = refined
+        if len(signatures) == count:
+            break
+        count = len(signatures)
+
+    dead = block[None]
+    members = {}
+    for s in dfa_data["states"]:
+        members.setdefault(block[s], []).append(s)
+    start = block[dfa_data["start"]]
+    names = {start: "M0"}
+    queue = deque([start])
+    transitions = []
+    while queue:
+        b = queue.popleft()
+        if b == dead:
+            continue
+        source = members[b][0]
+        for a in alphabet:
+            target = block[table.get((source, a))]
+            if target == dead:
+                continue
+            if target not in names:
+                names[target] = f"M{len(names)}"
+                queue.append(target)
+            transitions.append({"from": names[b], "to": names[target], "symbol": a})
+    result = {
+        "states": list(names.values()),
+        "transitions": transitions,
+        "start": "M0",
+        "accept": [name for b, name in names.items() if members.get(b, [None])[0] in accept],
+        "state_map": {name: members.get(b, []) for b, name in names.items()}
+    }
+    if "classes" in dfa_data:
+        result["classes"] = dfa_data["classes"]
+    return result
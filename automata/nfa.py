@@ -4,9 +4,27 @@ class NFA(Automaton):
     def __init__(self):
         super().__init__()
         self.transitions = {}
+        # SymbolClasses when edges read class representatives, else None.
+        self.classes = None
 
     def add_transition(self, from_state, symbol, to_state):
         key = (from_state, symbol)
         if key not in self.transitions:
             self.transitions[key] = set()
         self.transitions[key].add(to_state)
+
+
+def serialize_nfa(nfa):
+    result = {
+        "states": [s.name for s in nfa.states],
+        "start": nfa.start_state.name,
+        "accept": [s.name for s in nfa.accept_states],
+        "transitions": [
+            {"from": s.name, "symbol": sym or "ε", "to": t.name}
+            for (s, sym), targets in nfa.transitions.items()
+            for t in targets
+        ]
+    }
+    if nfa.classes is not None:
+        result["classes"] = nfa.classes.to_dict()
+    return result
@@ -0,0 +1,162 @@
+from collections import deque
+
+from automata.alphabet import align_classes
+from automata.equivalence import LazyDFA, ProductDFA
+from automata.minimize import minimize_dfa
+from core.limits import LimitExceeded, get_limit
+from core.metrics import timed
+
+# accept(left accepts, right accepts) for each binary operation.
+OPERATIONS = {
+    "intersection": lambda a, b: a and b,
+    "union": lambda a, b: a or b,
+    "difference": lambda a, b: a and not b,
+    "symmetric_difference": lambda a, b: a != b
+}
+
+
+class TableDFA:
+    # A DFA dict (the nfa_to_dfa format) behind the lazy interface; None is
+    # the dead state that missing transitions lead to.
+    def __init__(self, dfa_data):
+        self.table = {(t["from"], t["symbol"]): t["to"] for t in dfa_data["transitions"]}
+        self.alphabet = sorted({symbol for _, symbol in self.table})
+        self.start = dfa_data["start"]
+        self.accept = set(dfa_data["accept"])
+
+    def next(self, state, symbol):
+        return self.table.get((state, symbol))
+
+    def accepting(self, state):
+        return state in self.accept
+
+    def dead(self, state):
+        return state is None
+
+    def describe(self, state):
+        return [] if state is None else [state]
+
+
+class ComplementDFA:
+    # Accepts exactly where dfa does not. The dead state becomes an accepting
+    # sink, so words over symbols dfa never uses are in the complement.
+    def __init__(self, dfa, alphabet=()):
+        self.dfa = dfa
+        self.alphabet = sorted(set(dfa.alphabet) | set(alphabet))
+        self.start = dfa.start
+
+    def next(self, state, symbol):
+        return self.dfa.next(state, symbol)
+
+    def accepting(self, state):
+        return not self.dfa.accepting(state)
+
+    def dead(self, state):
+        return False
+
+    def describe(self, state):
+        return self.dfa.describe(state)
+
+
+def lazy(machine):
+    # NFA or DFA dict -> lazy DFA.
+    if isinstance(machine, dict):
+        return TableDFA(machine)
+    return LazyDFA(machine)
+
+
+def product(left, right, operation, alphabet=()):
+    if operation == "complement":
+        return ComplementDFA(lazy(left), alphabet)
+    if operation not in OPERATIONS:
+        raise ValueError(f"Unknown operation '{operation}'")
+    return ProductDFA(lazy(left), lazy(right), OPERATIONS[operation])
+
+
+@timed("product_construction")
+def build_product(dfa, alphabet=()):
+    # Materializes the states reachable from the start, breadth first, in
+    # the nfa_to_dfa format. States from which nothing can be accepted are
+    # left out, so the result is a partial DFA.
+    alphabet = sorted(set(dfa.alphabet) | set(alphabet))
+    max_states = get_limit("max_states")
+    names = {dfa.start: "P0"}
+    queue = deque([dfa.start])
+    transitions = []
+    accept = []
+    while queue:
+        state = queue.popleft()
+        name = names[state]
+        if dfa.accepting(state):
+            accept.append(name)
+        for symbol in alphabet:
+            target = dfa.next(state, symbol)
+            if dfa.dead(target):
+                continue
+            if target not in names:
+                if len(names) >= max_states:
+                    raise LimitExceeded("max_states", max_states, f"Product construction exceeded {max_states} states")
+                names[target] = f"P{len(names)}"
+                queue.append(target)
+            transitions.append({"from": name, "to": names[target], "symbol": symbol})
+    return {
+        "states": list(names.values()),
+        "transitions": transitions,
+        "start": "P0",
+        "accept": accept,
+        "state_map": {name: dfa.describe(state) for state, name in names.items()}
+    }
+
+
+def shortest_accepted(dfa, alphabet=()):
+    # Breadth-first search that stops at the first accepting state: the
+    # shortest (then alphabetically first) word in the language, or None.
+    alphabet = sorted(set(dfa.alphabet) | set(alphabet))
+    max_states = get_limit("max_states")
+    parents = {dfa.start: None}
+    queue = deque([dfa.start])
+    while queue:
+        state = queue.popleft()
+        if dfa.accepting(state):
+            word = []
+            while parents[state] is not None:
+                state, symbol = parents[state]
+                word.append(symbol)
+            return "".join(reversed(word))
+        for symbol in alphabet:
+            target = dfa.next(state, symbol)
+            if target in parents or dfa.dead(target):
+                continue
+            if len(parents) >= max_states:
+                raise LimitExceeded("max_states", max_states, f"Search exceeded {max_states} states")
+            parents[target] = (state, symbol)
+            queue.append(target)
+    return None
+
+
+def combine(left, right, operation, alphabet=(), minimize=False, build=True):
+    # left/right: NFAs or DFA dicts (right is ignored for complement).
+    # Returns {"dfa", "empty", "example", "metrics"}; without build only the
+    # example is searched for, which stops at the first accepted word.
+    # NFAs over symbol classes are first put on a common partition (with
+    # the extra alphabet characters as classes of their own).
+    machines = (left,) if operation == "complement" else (left, right)
+    classes = align_classes([m for m in machines if not isinstance(m, dict)], alphabet)
+    if classes is not None:
+        alphabet = [classes.classify(c) for c in alphabet]
+    dfa = product(left, right, operation, alphabet)
+    example = shortest_accepted(dfa, alphabet)
+    result = {"dfa": None, "empty": example is None, "example": example}
+    if build:
+        result["dfa"] = build_product(dfa, alphabet)
+        states = len(result["dfa"]["states"])
+        if classes is not None:
+            result["dfa"]["classes"] = classes.to_dict()
+        if minimize:
+            result["dfa"] = minimize_dfa(result["dfa"])
+        result["metrics"] = {
+            "product_states": states,
+            "states": len(result["dfa"]["states"]),
+            "transitions": len(result["dfa"]["transitions"])
+        }
+    return result
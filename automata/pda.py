@@ -9,9 +9,33 @@ class PDA:
         self.start_state = None
         self.accept_states = set()
         self.start_stack_symbol = "$"
+        # SymbolClasses when input edges read class representatives.
+        self.classes = None
 
     def add_transition(self, state, inp, stack_top, next_state, push):
         key = (state, inp, stack_top)
         if key not in self.transitions:
             self.transitions[key] = set()
         self.transitions[key].add((next_state, push))
+
+
+def serialize_pda(pda):
+    result = {
+        "states": [s.name for s in pda.states],
+        "start": pda.start_state.name,
+        "accept": [s.name for s in pda.accept_states],
+        "transitions": [
+            {
+                "from": s.name,
+                "symbol": sym or "ε",
+                "pop": pop_sym,
+                "to": t.name,
+                "push": "".join(push) if isinstance(push, (list, tuple)) else str(push)
+            }
+            for (s, sym, pop_sym), targets in pda.transitions.items()
+            for (t, push) in targets
+        ]
+    }
+    if pda.classes is not None:
+        result["classes"] = pda.classes.to_dict()
+    return result
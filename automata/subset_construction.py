@@ -1,4 +1,6 @@
 from simulation.nfa_simulator import epsilon_closure, move
+from core.limits import LimitExceeded, get_limit
+from core.metrics import timed
 
 def get_alphabet(nfa):
 
@@ -8,6 +10,7 @@ def get_alphabet(nfa):
             alphabet.add(symbol)
     return sorted(list(alphabet))
 
+@timed("subset_construction")
 def nfa_to_dfa(nfa):
 
     
@@ -27,6 +30,7 @@ def nfa_to_dfa(nfa):
     
     transitions = []
     alphabet = get_alphabet(nfa)
+    max_states = get_limit("max_states")
     
     processed_count = 0
     
@@ -47,6 +51,8 @@ def nfa_to_dfa(nfa):
             next_names = frozenset([s.name for s in next_closure])
             
             if next_names not in dfa_states:
+                if len(dfa_states) >= max_states:
+                    raise LimitExceeded("max_states", max_states, f"Subset construction exceeded {max_states} DFA states")
                 new_id = f"D{len(dfa_states)}"
                 dfa_states[next_names] = new_id
                 queue.append(next_closure)
@@ -73,10 +79,14 @@ def nfa_to_dfa(nfa):
         if not state_set.isdisjoint(nfa_accept_names):
             accept_ids.append(d_id)
             
-    return {
+    result = {
         "states": sorted(list(dfa_states.values()), key=lambda x: int(x[1:])),
         "transitions": transitions,
         "start": "D0",
         "accept": sorted(accept_ids, key=lambda x: int(x[1:])),
         "state_map": state_map_serializable
     }
+    # Symbols are class representatives: one column per class.
+    if nfa.classes is not None:
+        result["classes"] = nfa.classes.to_dict()
+    return result
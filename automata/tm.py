@@ -1,5 +1,121 @@
+from automata.alphabet import load_classes
+
+
 class TuringMachine:
     def __init__(self):
         self.transitions = {}
         self.start_state = None
         self.accept_states = set()
+
+
+BLANK = "_"
+WILDCARD = "*"
+ACCEPT_STATE = "q_accept"
+REJECT_STATE = "q_reject"
+
+
+def _symbols(value, tapes):
+    # One symbol per tape: "a" for a single tape, "ab" or ["a", "b"] for two.
+    if isinstance(value, (list, tuple)):
+        symbols = tuple(value)
+    elif tapes == 1:
+        symbols = (value,)
+    else:
+        symbols = tuple(value)
+    if len(symbols) != tapes:
+        raise ValueError(f"Expected {tapes} symbol(s), got {value!r}")
+    return symbols
+
+
+class CompiledTM:
+    # Transition table keyed by (state, tuple of symbols read, one per tape).
+    # Accepts the dict form used by /simulate/tm ({"from", "read", "to",
+    # "write", "move"}) and a compact row form [from, read, to, write, move].
+    # "*" in read matches any symbol that has no more specific transition;
+    # "*" in write keeps the symbol that was read.
+    def __init__(self, tm):
+        self.tapes = tm.get("tapes", 1)
+        self.start = tm["start"]
+        self.blank = tm.get("blank", BLANK)
+        self.accept = set(tm.get("accept") or [ACCEPT_STATE])
+        self.reject = set(tm.get("reject") or [REJECT_STATE])
+        # Machines built from a DFA over symbol classes read representatives.
+        self.classes = load_classes(tm)
+        self.table = {}
+        self.wildcards = {}
+        self._resolved = {}
+
+        for t in tm["transitions"]:
+            if isinstance(t, dict):
+                row = (t["from"], t["read"], t["to"], t["write"], t["move"])
+            else:
+                row = tuple(t)
+            state, read, to, write, move = row
+            pattern = _symbols(read, self.tapes)
+            entry = (to, _symbols(write, self.tapes), _symbols(move, self.tapes), pattern)
+            if WILDCARD in pattern:
+                self.wildcards.setdefault(state, []).append(entry)
+            else:
+                self.table.setdefault((state, pattern), entry)
+        for entries in self.wildcards.values():
+            # Most specific pattern first; ties keep definition order.
+            entries.sort(key=lambda e: e[3].count(WILDCARD))
+
+    def translate(self, string):
+        return string if self.classes is None else self.classes.translate(string)
+
+    def lookup(self, state, reads):
+        entry = self.table.get((state, reads))
+        if entry is not None or state not in self.wildcards:
+            return entry
+        key = (state, reads)
+        if key not in self._resolved:
+            match = None
+            for candidate in self.wildcards[state]:
+                if all(p == WILDCARD or p == r for p, r in zip(candidate[3], reads)):
+                    match = candidate
+                    break
+            self._resolved[key] = match
+        return self._resolved[key]
+
+
+def compile_tm(tm):
+    if isinstance(tm, CompiledTM):
+        return tm
+    return CompiledTM(tm)
+
+
+def tm_as_dfa(tm):
+    # A TM that only moves right, writes back what it reads and decides as
+    # soon as it reaches the blank after the input is a DFA in disguise.
+    # Returns that DFA (in the subset-construction dict format) or None.
+    compiled = compile_tm(tm)
+    halting = (ACCEPT_STATE, REJECT_STATE)
+    if compiled.tapes != 1 or compiled.wildcards or compiled.start in halting:
+        return None
+
+    states = {compiled.start}
+    transitions = []
+    accept = []
+    for (state, (read,)), (to, (write,), (move,), _) in compiled.table.items():
+        if state in halting:
+            continue
+        if move != "R" or write not in (read, WILDCARD):
+            return None
+        if read == BLANK:
+            if to not in halting:
+                return None
+            if to == ACCEPT_STATE:
+                accept.append(state)
+        else:
+            if to in halting:
+                return None
+            transitions.append({"from": state, "to": to, "symbol": read})
+            states.add(to)
+        states.add(state)
+    return {
+        "states": sorted(states),
+        "start": compiled.start,
+        "accept": sorted(accept),
+        "transitions": transitions
+    }
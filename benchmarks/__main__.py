@@ -0,0 +1,63 @@
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from benchmarks.runner import DEFAULT_REPEAT, DEFAULT_THRESHOLD, run_all, save, load, compare
+
+RESULTS = os.path.join(os.path.dirname(__file__), "results", "latest.json")
+BASELINE = os.path.join(os.path.dirname(__file__), "results", "baseline.json")
+
+
+def print_comparison(rows, threshold):
+    regressions = [row for row in rows if row[5]]
+    for name, metric, old, new, ratio, regressed in rows:
+        unit = "ms" if metric == "min_s" else "KiB"
+        scale = 1000 if metric == "min_s" else 1
+        flag = "REGRESSION" if regressed else ""
+        print(f"{name:<55} {metric:<15} {old * scale:>10.2f} -> {new * scale:>10.2f} {unit:<3} x{ratio:5.2f} {flag}")
+    print(f"{len(regressions)} regression(s) above {threshold:.0%}")
+    return 1 if regressions else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="run workloads and write a results file")
+    run.add_argument("patterns", nargs="*", help="only workloads whose name matches (glob or substring)")
+    run.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    run.add_argument("--output", default=RESULTS)
+    run.add_argument("--save-baseline", action="store_true", help="also store the results as the baseline")
+    run.add_argument("--compare", action="store_true", help="compare the results against the baseline")
+    run.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+
+    cmp = commands.add_parser("compare", help="compare a results file against the baseline")
+    cmp.add_argument("current", nargs="?", default=RESULTS)
+    cmp.add_argument("--baseline", default=BASELINE)
+    cmp.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+
+    commands.add_parser("list", help="list workload names")
+
+    args = parser.parse_args(argv)
+    if args.command == "list":
+        from benchmarks.workloads import WORKLOADS
+        for name, _, _ in WORKLOADS:
+            print(name)
+        return 0
+    if args.command == "run":
+        report = run_all(args.patterns, args.repeat)
+        save(report, args.output)
+        print(f"Results written to {args.output}")
+        if args.save_baseline:
+            save(report, BASELINE)
+            print(f"Baseline written to {BASELINE}")
+        elif args.compare:
+            return print_comparison(compare(load(BASELINE), report, args.threshold), args.threshold)
+        return 0
+    return print_comparison(compare(load(args.baseline), load(args.current), args.threshold), args.threshold)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,296 @@
+import argparse
+import http.client
+import json
+import os
+import random
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+from urllib.parse import urlsplit
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+# Local load generator: starts api.main:app under uvicorn (or targets
+# --url), replays a weighted mix of requests from --concurrency client
+# threads with keep-alive connections, and samples the server's RSS (the
+# uvicorn process tree, including pool workers) while it runs.
+#
+#   python -m benchmarks.loadtest --workers 4 --concurrency 32 --duration 30
+
+REGEXES = ["(a|b)*abb", "a(b|c)*a", "(ab|ba)*", "(a|b)*a(a|b)(a|b)(a|b)", "((a|b)(a|b))*", "(a*b*)*c"]
+STRINGS = ["", "abb", "abab", "aabb", "abcba", "babababb", "ab" * 20, "ba" * 40 + "bb"]
+GRAMMARS = [
+    {"start": "S", "grammar": {"S": [["a", "S", "b"], ""]}},
+    {"start": "E", "grammar": {"E": [["E", "+", "T"], ["T"]], "T": [["T", "*", "F"], ["F"]], "F": [["(", "E", ")"], ["a"]]}}
+]
+GRAMMAR_STRINGS = [["aabb", "ab", "aab", "aaabbb"], ["a+a*a", "(a+a)*a", "a+", "a*(a+a+a)"]]
+
+# name -> (weight, path, body factory)
+MIX = {
+    "nfa": (2, "/nfa", lambda r: {"regex": r.choice(REGEXES)}),
+    "dfa": (2, "/dfa", lambda r: {"regex": r.choice(REGEXES)}),
+    "simulate_nfa": (3, "/simulate/nfa", lambda r: {"regex": r.choice(REGEXES), "string": r.choice(STRINGS)}),
+    "simulate_dfa": (3, "/simulate/dfa", lambda r: {"regex": r.choice(REGEXES), "string": r.choice(STRINGS)}),
+    "simulate_pda": (1, "/simulate/pda", lambda r: {"regex": r.choice(REGEXES), "string": r.choice(STRINGS)}),
+    "compare": (2, "/compare", lambda r: {"regex": r.choice(REGEXES), "string": r.choice(STRINGS)}),
+    "cfg_parse": (2, "/cfg/parse", lambda r: _grammar_body(r)),
+    # The PDA search does not terminate on left-recursive grammars.
+    "cfg_pda": (1, "/simulate/cfg/pda", lambda r: _grammar_body(r, 0))
+}
+
+
+def _grammar_body(r, i=None):
+    i = r.randrange(len(GRAMMARS)) if i is None else i
+    return dict(GRAMMARS[i], string=r.choice(GRAMMAR_STRINGS[i]))
+
+
+def parse_mix(text):
+    if not text:
+        return {name: weight for name, (weight, _, _) in MIX.items()}
+    weights = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        if name not in MIX:
+            raise SystemExit(f"Unknown request type '{name}' (known: {', '.join(MIX)})")
+        weights[name] = float(weight or 1)
+    return weights
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(port, workers, env):
+    command = [sys.executable, "-m", "uvicorn", "api.main:app", "--host", "127.0.0.1",
+               "--port", str(port), "--workers", str(workers), "--log-level", "warning"]
+    return subprocess.Popen(command, cwd=ROOT, env=dict(os.environ, **env), start_new_session=True)
+
+
+def wait_ready(host, port, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection(host, port, timeout=2)
+            conn.request("GET", "/metrics")
+            if conn.getresponse().status == 200:
+                return
+        except OSError:
+            pass
+        time.sleep(0.2)
+    raise SystemExit("Server did not become ready")
+
+
+def stop_server(process):
+    try:
+        os.killpg(process.pid, signal.SIGTERM)
+        process.wait(timeout=15)
+    except (ProcessLookupError, subprocess.TimeoutExpired):
+        os.killpg(process.pid, signal.SIGKILL)
+
+
+def process_tree_rss(pid):
+    # Sum of VmRSS over pid and its descendants, from /proc (Linux only).
+    children = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+    total, pending = 0, [pid]
+    while pending:
+        current = pending.pop()
+        pending.extend(children.get(current, ()))
+        try:
+            with open(f"/proc/{current}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        total += int(line.split()[1])
+        except OSError:
+            pass
+    return total / 1024
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return None
+    index = min(int(round(p / 100 * (len(sorted_values) - 1))), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+class LoadTest:
+    def __init__(self, host, port, weights, concurrency, duration, requests, accept, seed):
+        self.host = host
+        self.port = port
+        self.names = list(weights)
+        self.weights = [weights[n] for n in self.names]
+        self.concurrency = concurrency
+        self.duration = duration
+        self.requests = requests
+        self.accept = accept
+        self.seed = seed
+        self.samples = {name: [] for name in self.names}
+        self.errors = {name: {} for name in self.names}
+        self._lock = threading.Lock()
+        self._issued = 0
+
+    def _next(self):
+        with self._lock:
+            if self.requests is not None and self._issued >= self.requests:
+                return False
+            self._issued += 1
+            return True
+
+    def _client(self, index, deadline):
+        r = random.Random(self.seed * 1000 + index)
+        conn = http.client.HTTPConnection(self.host, self.port, timeout=60)
+        headers = {"Content-Type": "application/json", "Accept": self.accept}
+        while time.monotonic() < deadline and self._next():
+            name = r.choices(self.names, self.weights)[0]
+            _, path, body = MIX[name]
+            # As bytes, headers and body go out in one send; a str body
+            # would stall on Nagle + delayed ACK.
+            payload = json.dumps(body(r)).encode("utf-8")
+            start = time.perf_counter()
+            try:
+                conn.request("POST", path, payload, headers)
+                response = conn.getresponse()
+                response.read()
+                status = response.status
+            except (OSError, http.client.HTTPException) as e:
+                status = type(e).__name__
+                conn.close()
+                conn = http.client.HTTPConnection(self.host, self.port, timeout=60)
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self.samples[name].append(elapsed)
+                if status != 200:
+                    self.errors[name][str(status)] = self.errors[name].get(str(status), 0) + 1
+        conn.close()
+
+    def run(self):
+        deadline = time.monotonic() + self.duration
+        threads = [threading.Thread(target=self._client, args=(i, deadline), daemon=True) for i in range(self.concurrency)]
+        start = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        return time.perf_counter() - start
+
+    def summary(self, elapsed):
+        def stats(values, errors):
+            values = sorted(values)
+            failed = sum(errors.values())
+            return {
+                "requests": len(values),
+                "throughput_rps": round(len(values) / elapsed, 2) if elapsed else None,
+                "error_rate": round(failed / len(values), 4) if values else 0,
+                "errors": errors,
+                "p50_ms": _ms(percentile(values, 50)),
+                "p95_ms": _ms(percentile(values, 95)),
+                "p99_ms": _ms(percentile(values, 99)),
+                "max_ms": _ms(values[-1] if values else None)
+            }
+
+        everything = [v for values in self.samples.values() for v in values]
+        all_errors = {}
+        for errors in self.errors.values():
+            for status, n in errors.items():
+                all_errors[status] = all_errors.get(status, 0) + n
+        return {
+            "elapsed_s": round(elapsed, 3),
+            "total": stats(everything, all_errors),
+            "endpoints": {name: stats(self.samples[name], self.errors[name]) for name in self.names if self.samples[name]}
+        }
+
+
+def _ms(seconds):
+    return None if seconds is None else round(seconds * 1000, 2)
+
+
+def sample_rss(pid, interval, series, stop):
+    start = time.monotonic()
+    while not stop.wait(interval):
+        series.append([round(time.monotonic() - start, 1), round(process_tree_rss(pid), 1)])
+
+
+def print_report(report):
+    print(f"{'endpoint':<15} {'requests':>9} {'rps':>9} {'errors':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    rows = list(report["endpoints"].items()) + [("total", report["total"])]
+    for name, s in rows:
+        print(f"{name:<15} {s['requests']:>9} {s['throughput_rps']:>9} {s['error_rate']:>8.2%} "
+              f"{s['p50_ms']:>9} {s['p95_ms']:>9} {s['p99_ms']:>9}")
+    if report["total"]["errors"]:
+        print("errors:", report["total"]["errors"])
+    rss = report.get("rss_mb")
+    if rss:
+        values = [v for _, v in rss]
+        print(f"server RSS: start {values[0]} MiB, peak {max(values)} MiB, end {values[-1]} MiB ({len(values)} samples)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.loadtest")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--concurrency", type=int, default=16, help="client threads")
+    parser.add_argument("--duration", type=float, default=20, help="seconds")
+    parser.add_argument("--requests", type=int, help="stop after this many requests")
+    parser.add_argument("--mix", help="weights, e.g. 'simulate_dfa=5,compare=1' (default: all)")
+    parser.add_argument("--accept", default="application/json", help="Accept header, e.g. application/vnd.toc.columnar+json")
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE", help="server environment, e.g. TOC_WORKERS=2")
+    parser.add_argument("--url", help="target a running server instead of starting one")
+    parser.add_argument("--pid", type=int, help="with --url: server PID to sample RSS from")
+    parser.add_argument("--rss-interval", type=float, default=1.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the report as JSON")
+    args = parser.parse_args(argv)
+
+    weights = parse_mix(args.mix)
+    server = None
+    if args.url:
+        parts = urlsplit(args.url)
+        host, port, pid = parts.hostname, parts.port or 80, args.pid
+    else:
+        env = dict(item.split("=", 1) for item in args.env)
+        host, port = "127.0.0.1", free_port()
+        server = start_server(port, args.workers, env)
+        pid = server.pid
+    try:
+        wait_ready(host, port)
+        series, stop = [], threading.Event()
+        sampler = None
+        if pid and os.path.isdir("/proc"):
+            series.append([0.0, round(process_tree_rss(pid), 1)])
+            sampler = threading.Thread(target=sample_rss, args=(pid, args.rss_interval, series, stop), daemon=True)
+            sampler.start()
+        test = LoadTest(host, port, weights, args.concurrency, args.duration, args.requests, args.accept, args.seed)
+        elapsed = test.run()
+        stop.set()
+        if sampler is not None:
+            sampler.join()
+            series.append([round(elapsed, 1), round(process_tree_rss(pid), 1)])
+    finally:
+        if server is not None:
+            stop_server(server)
+
+    report = test.summary(elapsed)
+    report["config"] = {k: v for k, v in vars(args).items() if k != "output"}
+    if series:
+        report["rss_mb"] = series
+    print_report(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
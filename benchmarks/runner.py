@@ -0,0 +1,106 @@
+import fnmatch
+import gc
+import json
+import os
+import platform
+import statistics
+import subprocess
+import time
+import tracemalloc
+
+from benchmarks.workloads import WORKLOADS
+
+# Results file: {"meta": {...}, "results": {name: {"time_s", "min_s",
+# "repeat", "peak_memory_kb", "counts"}}}. time_s is the median of the
+# repeats; peak memory comes from one extra run under tracemalloc.
+# Comparisons use the fastest repeat, which is the least noisy.
+
+DEFAULT_REPEAT = 5
+DEFAULT_THRESHOLD = 0.25
+# Differences below this are noise whatever the ratio.
+MIN_TIME_DELTA = 0.0005
+MIN_MEMORY_DELTA_KB = 64
+
+
+def select(patterns):
+    if not patterns:
+        return list(WORKLOADS)
+    return [w for w in WORKLOADS if any(fnmatch.fnmatch(w[0], p) or p in w[0] for p in patterns)]
+
+
+def run_workload(fn, params, repeat):
+    run, counts = fn(**params)
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+    gc.collect()
+    tracemalloc.start()
+    try:
+        run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        "time_s": statistics.median(times),
+        "min_s": min(times),
+        "repeat": repeat,
+        "peak_memory_kb": round(peak / 1024, 1),
+        "counts": counts
+    }
+
+
+def _revision():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5)
+        return out.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def run_all(patterns=None, repeat=DEFAULT_REPEAT, log=print):
+    results = {}
+    for name, fn, params in select(patterns):
+        result = results[name] = run_workload(fn, params, repeat)
+        log(f"{name:<55} {result['time_s'] * 1000:>10.2f} ms {result['peak_memory_kb']:>10.1f} KiB")
+    return {
+        "meta": {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "revision": _revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "repeat": repeat
+        },
+        "results": results
+    }
+
+
+def save(report, path):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+
+
+def load(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def compare(baseline, current, threshold=DEFAULT_THRESHOLD):
+    # Returns rows (name, metric, before, after, ratio, regressed) for every
+    # workload present in both reports.
+    rows = []
+    for name, after in sorted(current["results"].items()):
+        before = baseline["results"].get(name)
+        if before is None:
+            continue
+        for metric, floor in (("min_s", MIN_TIME_DELTA), ("peak_memory_kb", MIN_MEMORY_DELTA_KB)):
+            old, new = before.get(metric), after.get(metric)
+            if not old or new is None:
+                continue
+            ratio = new / old
+            regressed = ratio > 1 + threshold and new - old > floor
+            rows.append((name, metric, old, new, ratio, regressed))
+    return rows
@@ -0,0 +1,281 @@
+from core.state import State
+from regex.compile import build_regex_nfa
+from regex.validation import validate_regex
+from regex.regex_parser import insert_concatenation
+from regex.postfix import to_postfix
+from regex.thompson import regex_to_nfa
+from automata.subset_construction import nfa_to_dfa
+from automata.dfa_to_tm import dfa_to_tm
+from automata.equivalence import check_equivalent
+from automata.operations import combine
+from conversions.cfg_to_pda import cfg_to_pda
+from simulation.nfa_simulator import simulate_nfa
+from simulation.bitparallel_nfa import compile_nfa
+from simulation.dfa_simulator import compile_dfa, simulate_dfa
+from simulation.pda_simulator import simulate_general_pda
+from simulation.tm_simulator import simulate_tm
+from simulation.tm_accelerated import run_tm_accelerated
+from cfg.parser import parse_with_tree
+from cfg.cyk import CYKParser
+from cfg.table_parser import TableParser
+from cfg.forest import parse_forest
+from cfg.compiler import compile_grammar
+from cfg.grammar import Grammar
+
+# Each workload takes its parameters and returns (run, counts): run() is
+# the timed call, everything before it is setup. counts describe the size
+# of the problem (states, steps, ...) and are stored with the timings.
+
+WORKLOADS = []
+
+
+def workload(group, *param_sets):
+    def register(fn):
+        for params in param_sets or ({},):
+            label = ",".join(f"{k}={v}" for k, v in params.items())
+            name = f"{group}.{fn.__name__}" + (f"[{label}]" if label else "")
+            WORKLOADS.append((name, fn, params))
+        return fn
+    return register
+
+
+def star_tail(n):
+    # (a|b)*a(a|b)^n: the DFA needs 2^(n+1) states.
+    return "(a|b)*a" + "(a|b)" * n
+
+
+def nested_stars(depth):
+    regex = "a"
+    for _ in range(depth):
+        regex = f"({regex}|b)*"
+    return regex
+
+
+def wide_alternation(size):
+    symbols = "abcdefghijklmnopqrstuvwxyz0123456789"
+    return "(" + "|".join(symbols[i % len(symbols)] for i in range(size)) + ")*"
+
+
+def grammar(start, rules):
+    return compile_grammar(Grammar.from_dict(start, rules))
+
+
+BALANCED = {"S": [["(", "S", ")", "S"], ""]}
+AMBIGUOUS = {"E": [["E", "+", "E"], ["a"]]}
+AMBIGUOUS_PDA = {"S": [["a", "S", "b"], ["a", "S", "b", "b"], ""]}
+LEFT_RECURSIVE = {"E": [["E", "+", "T"], ["T"]], "T": [["T", "*", "F"], ["F"]], "F": [["(", "E", ")"], ["a"]]}
+
+# a^n b^n by crossing off one a and one b per sweep: O(n^2) steps.
+ANBN_TM = {
+    "start": "q0",
+    "transitions": [
+        ["q0", "a", "q1", "X", "R"], ["q0", "Y", "q3", "Y", "R"], ["q0", "_", "q_accept", "_", "R"],
+        ["q1", "a", "q1", "a", "R"], ["q1", "Y", "q1", "Y", "R"], ["q1", "b", "q2", "Y", "L"],
+        ["q2", "a", "q2", "a", "L"], ["q2", "Y", "q2", "Y", "L"], ["q2", "X", "q0", "X", "R"],
+        ["q3", "Y", "q3", "Y", "R"], ["q3", "_", "q_accept", "_", "R"]
+    ]
+}
+
+
+@workload("regex", {"n": 4}, {"n": 8}, {"n": 11})
+def construct_star_tail(n):
+    regex = star_tail(n)
+
+    def run():
+        return nfa_to_dfa(build_regex_nfa(regex))
+    dfa = run()
+    return run, {"nfa_states": len(build_regex_nfa(regex).states), "dfa_states": len(dfa["states"])}
+
+
+@workload("regex", {"depth": 10}, {"depth": 40})
+def construct_nested_stars(depth):
+    regex = nested_stars(depth)
+
+    def run():
+        return nfa_to_dfa(build_regex_nfa(regex))
+    dfa = run()
+    return run, {"nfa_states": len(build_regex_nfa(regex).states), "dfa_states": len(dfa["states"])}
+
+
+@workload("regex", {"size": 300}, {"size": 1000})
+def construct_alternation(size):
+    # Includes normalize_nfa, which is quadratic in the NFA size.
+    regex = wide_alternation(size)
+
+    def run():
+        return build_regex_nfa(regex)
+    return run, {"nfa_states": len(run().states)}
+
+
+@workload("regex", {"size": 10000})
+def thompson_alternation(size):
+    regex = wide_alternation(size)
+
+    def run():
+        validate_regex(regex)
+        State._id = 0
+        return regex_to_nfa(to_postfix(insert_concatenation(regex)))
+    return run, {"nfa_states": len(run().states)}
+
+
+@workload("regex", {"n": 8})
+def construct_class_star_tail(n):
+    # star_tail over all of Unicode: [a-m] and its complement are the only
+    # symbol classes, so the DFA is as small and as narrow as star_tail(n).
+    regex = "[^\\-]*[a-m]" + "[^\\-]" * n
+
+    def run():
+        return nfa_to_dfa(build_regex_nfa(regex))
+    dfa = run()
+    return run, {"classes": len(dfa["classes"]), "dfa_states": len(dfa["states"])}
+
+
+@workload("regex", {"n": 8})
+def equivalent_star_tail(n):
+    # Equivalent, so every reachable pair is explored.
+    left = build_regex_nfa(star_tail(n))
+    right = build_regex_nfa("(b|a)*a" + "(b|a)" * n)
+
+    def run():
+        return check_equivalent(left, right)
+    return run, {"pairs": run()["metrics"]["pairs_explored"]}
+
+
+@workload("regex", {"n": 8})
+def difference_star_tail(n):
+    left = build_regex_nfa(star_tail(n))
+    right = build_regex_nfa("(a|b)*b(a|b)*")
+
+    def run():
+        return combine(left, right, "difference", minimize=True)
+    return run, {"product_states": run()["metrics"]["product_states"]}
+
+
+@workload("nfa", {"length": 1000}, {"length": 20000})
+def simulate_nfa_long(length):
+    nfa = build_regex_nfa(star_tail(6))
+    string = "ab" * (length // 2)
+
+    def run():
+        return simulate_nfa(nfa, string)
+    return run, {"nfa_states": len(nfa.states), "steps": len(run()[1])}
+
+
+@workload("nfa", {"length": 20000}, {"length": 200000})
+def bitparallel_nfa_long(length):
+    nfa = build_regex_nfa(star_tail(6))
+    compiled = compile_nfa(nfa)
+    string = "ab" * (length // 2)
+
+    def run():
+        return compiled.run(string)
+    return run, {"bits": compiled.size, "steps": run()[1]}
+
+
+@workload("dfa", {"length": 1000}, {"length": 100000})
+def simulate_dfa_long(length):
+    dfa = nfa_to_dfa(build_regex_nfa(star_tail(6)))
+    compiled = compile_dfa(dfa)
+    string = "ab" * (length // 2)
+
+    def run():
+        return simulate_dfa(dfa, string, compiled)
+    return run, {"dfa_states": len(dfa["states"]), "steps": len(run()[1])}
+
+
+@workload("dfa", {"length": 100000})
+def run_compiled_dfa(length):
+    compiled = compile_dfa(nfa_to_dfa(build_regex_nfa(star_tail(6))))
+    string = "ab" * (length // 2)
+
+    def run():
+        return compiled.run(string)
+    return run, {"steps": length}
+
+
+@workload("tm", {"length": 4000})
+def simulate_dfa_derived_tm(length):
+    tm = dfa_to_tm(nfa_to_dfa(build_regex_nfa(star_tail(4))))
+    string = "ab" * (length // 2)
+
+    def run():
+        return simulate_tm(tm, string)
+    return run, {"tm_states": len(tm["states"]), "steps": len(run()[1])}
+
+
+@workload("tm", {"n": 10}, {"n": 30})
+def simulate_anbn_tm(n):
+    string = "a" * n + "b" * n
+
+    def run():
+        return simulate_tm(ANBN_TM, string)
+    return run, {"steps": len(run()[1])}
+
+
+@workload("tm", {"n": 1000})
+def accelerated_anbn_tm(n):
+    string = "a" * n + "b" * n
+
+    def run():
+        return run_tm_accelerated(ANBN_TM, string, keyframes=50)
+    return run, {"steps": run()["metrics"]["execution_steps"]}
+
+
+@workload("cfg", {"rules": "balanced"}, {"rules": "left_recursive"})
+def construct_parsers(rules):
+    start, productions = {"balanced": ("S", BALANCED), "left_recursive": ("E", LEFT_RECURSIVE)}[rules]
+    compiled = compile_grammar(grammar(start, productions))
+
+    def run():
+        return TableParser(compiled), CYKParser(compiled)
+    table, cyk = run()
+    return run, {"lalr_states": len(table.lalr.kernels)}
+
+
+@workload("cfg", {"length": 200}, {"length": 600})
+def descent_balanced(length):
+    g = grammar("S", BALANCED)
+    string = "()" * (length // 2)
+
+    def run():
+        return parse_with_tree(g, string)
+    return run, {"length": length}
+
+
+@workload("cfg", {"length": 50}, {"length": 150})
+def cyk_ambiguous(length):
+    g = grammar("E", AMBIGUOUS)
+    string = "+".join("a" * ((length + 1) // 2))
+
+    def run():
+        forest = parse_forest(g, string)
+        return forest.count()
+    return run, {"length": len(string), "trees": min(run(), 2 ** 53)}
+
+
+@workload("cfg", {"length": 1000})
+def lalr_left_recursive(length):
+    g = grammar("E", LEFT_RECURSIVE)
+    parser = TableParser(compile_grammar(g))
+    string = "+".join("a*(a+a)" for _ in range(length // 8))
+
+    def run():
+        return parser.parse(string, "lalr")
+    return run, {"length": len(string)}
+
+
+@workload("pda", {"rules": "balanced", "n": 32}, {"rules": "balanced", "n": 128}, {"rules": "ambiguous", "n": 16}, {"rules": "ambiguous_reject", "n": 10})
+def general_pda(rules, n):
+    # The search is exponential on the ambiguous grammar, worst when the
+    # input is rejected and every branch has to be exhausted.
+    if rules == "balanced":
+        pda = cfg_to_pda(grammar("S", BALANCED))
+        string = "(" * n + ")" * n
+    else:
+        pda = cfg_to_pda(grammar("S", AMBIGUOUS_PDA))
+        string = "a" * n + "b" * (3 * n // 2 if rules == "ambiguous" else 2 * n + 1)
+
+    def run():
+        return simulate_general_pda(pda, string, accept_by_empty_stack=True)
+    accepted, history = run()
+    return run, {"accepted": accepted, "steps": len(history)}
@@ -0,0 +1,238 @@
+from itertools import product
+
+from cfg.compiler import compile_grammar, EPSILON
+from cfg.parse_tree import ParseTreeNode
+
+# Every CNF rule carries a template describing how to rebuild the original
+# grammar's subtree from the subtrees of its (one or two) RHS symbols:
+#   ("child", k)          -> the nodes produced for RHS symbol k
+#   ("eps", X)            -> the nodes of a fixed ε-derivation of X
+#   ("leaf", a)           -> a single leaf node a
+#   ("node", A, items)    -> one node A whose children are the items
+# A template evaluates to a list of nodes; helper nonterminals introduced by
+# the conversion evaluate to the flat list of their original children, so they
+# disappear when spliced into the parent.
+
+START = ("start",)
+
+
+def _substitute(template, mapping):
+    result = []
+    for item in template:
+        if item[0] == "child" and item[1] in mapping:
+            result.extend(mapping[item[1]])
+        elif item[0] == "node":
+            result.append(("node", item[1], _substitute(item[2], mapping)))
+        else:
+            result.append(item)
+    return tuple(result)
+
+
+class CNFGrammar:
+    def __init__(self, grammar):
+        self.compiled = compile_grammar(grammar)
+        self.start = START
+        self.nonterminals = set(self.compiled.nonterminals) | {START}
+
+        rules = []
+        for lhs, rhs in self.compiled.rules:
+            if rhs:
+                items = tuple(("child", k) for k in range(len(rhs)))
+            else:
+                items = (("leaf", EPSILON),)
+            rules.append((lhs, rhs, (("node", lhs, items),)))
+
+        rules = self._start(rules)
+        rules = self._term(rules)
+        rules = self._bin(rules)
+        rules = self._del(rules)
+        rules = self._unit(rules)
+
+        self.rules = rules
+        self.binary_rules = [i for i, r in enumerate(rules) if len(r[1]) == 2]
+        self.terminal_rules = {}
+        for i, (lhs, rhs, _) in enumerate(rules):
+            if len(rhs) == 1:
+                self.terminal_rules.setdefault(rhs[0], []).append(i)
+
+    def is_helper(self, symbol):
+        return isinstance(symbol, tuple)
+
+    # START: fresh start symbol that never appears on a right-hand side.
+    def _start(self, rules):
+        return [(START, (self.compiled.start,), (("child", 0),))] + rules
+
+    # TERM: terminals inside long right-hand sides get their own nonterminal.
+    def _term(self, rules):
+        result = []
+        added = set()
+        for lhs, rhs, template in rules:
+            if len(rhs) < 2:
+                result.append((lhs, rhs, template))
+                continue
+            new_rhs = []
+            for sym in rhs:
+                if sym in self.nonterminals:
+                    new_rhs.append(sym)
+                    continue
+                helper = ("term", sym)
+                if helper not in added:
+                    added.add(helper)
+                    self.nonterminals.add(helper)
+                    result.append((helper, (sym,), (("child", 0),)))
+                new_rhs.append(helper)
+            result.append((lhs, tuple(new_rhs), template))
+        return result
+
+    # BIN: split right-hand sides longer than two into a chain of helpers.
+    def _bin(self, rules):
+        result = []
+        for index, (lhs, rhs, template) in enumerate(rules):
+            if len(rhs) <= 2:
+                result.append((lhs, rhs, template))
+                continue
+            helpers = [("bin", index, j) for j in range(1, len(rhs) - 1)]
+            self.nonterminals.update(helpers)
+            # Children stay in order, so child 1 (the first helper) stands in
+            # for the spliced results of rhs[1:].
+            head = _substitute(template, {k: [] for k in range(2, len(rhs))})
+            result.append((lhs, (rhs[0], helpers[0]), head))
+            splice = (("child", 0), ("child", 1))
+            for j, helper in enumerate(helpers):
+                nxt = helpers[j + 1] if j + 1 < len(helpers) else rhs[-1]
+                result.append((helper, (rhs[j + 1], nxt), splice))
+        return result
+
+    # DEL: drop ε-rules, adding variants with nullable symbols left out.
+    def _del(self, rules):
+        nullable = set()
+        self.eps_rules = {}
+        changed = True
+        while changed:
+            changed = False
+            for lhs, rhs, template in rules:
+                if lhs not in nullable and all(s in nullable for s in rhs):
+                    nullable.add(lhs)
+                    self.eps_rules[lhs] = (rhs, template)
+                    changed = True
+        self.accepts_empty = START in nullable
+
+        result = []
+        seen = set()
+        for lhs, rhs, template in rules:
+            options = [
+                (False, True) if sym in nullable else (True,)
+                for sym in rhs
+            ]
+            for keep in product(*options):
+                if not any(keep):
+                    continue
+                mapping = {}
+                new_rhs = []
+                for k, sym in enumerate(rhs):
+                    if keep[k]:
+                        mapping[k] = [("child", len(new_rhs))]
+                        new_rhs.append(sym)
+                    else:
+                        mapping[k] = [("eps", sym)]
+                rule = (lhs, tuple(new_rhs), _substitute(template, mapping))
+                if rule not in seen:
+                    seen.add(rule)
+                    result.append(rule)
+        return result
+
+    # UNIT: replace chains A -> B -> ... -> rhs by A -> rhs, one chain (the
+    # shortest) per pair of symbols. Parallel unit rules between the same two
+    # symbols (S -> A with the ε dropped on either side) are kept in
+    # unit_alternatives, and chains[r] records rule r's hops and the template
+    # of the rule it ends in, so the parse forest can pack the alternatives
+    # without a CNF rule per path.
+    def _unit(self, rules):
+        units = {}
+        others = {}
+        self.unit_alternatives = {}
+        for lhs, rhs, template in rules:
+            if len(rhs) == 1 and rhs[0] in self.nonterminals:
+                units.setdefault(lhs, []).append((rhs[0], template))
+                self.unit_alternatives.setdefault((lhs, rhs[0]), []).append(template)
+            else:
+                others.setdefault(lhs, []).append((rhs, template))
+
+        result = []
+        self.chains = []
+        seen = set()
+        for lhs in sorted(self.nonterminals, key=repr):
+            # BFS keeps the shortest unit chain to every reachable symbol.
+            chains = {lhs: ((("child", 0),), ())}
+            queue = [lhs]
+            while queue:
+                current = queue.pop(0)
+                chain, hops = chains[current]
+                for target, template in units.get(current, []):
+                    if target not in chains:
+                        chains[target] = (_substitute(chain, {0: template}), hops + ((current, target),))
+                        queue.append(target)
+            for target, (chain, hops) in chains.items():
+                for rhs, template in others.get(target, []):
+                    rule = (lhs, rhs, _substitute(chain, {0: template}))
+                    if rule not in seen:
+                        seen.add(rule)
+                        result.append(rule)
+                        self.chains.append((hops, template))
+        return result
+
+    def variants(self, r):
+        # Number of ways rule r's unit chain can be taken.
+        total = 1
+        for hop in self.chains[r][0]:
+            total *= len(self.unit_alternatives[hop])
+        return total
+
+    def variant(self, r, index):
+        # The template of rule r with its index-th choice of unit rules (the
+        # first hop varies slowest).
+        hops, template = self.chains[r]
+        for hop in reversed(hops):
+            alternatives = self.unit_alternatives[hop]
+            index, k = divmod(index, len(alternatives))
+            template = _substitute(alternatives[k], {0: template})
+        return template
+
+    def eps_nodes(self, symbol):
+        rhs, template = self.eps_rules[symbol]
+        return self.build(template, [self.eps_nodes(s) for s in rhs])
+
+    def build(self, template, children):
+        nodes = []
+        for item in template:
+            kind = item[0]
+            if kind == "child":
+                nodes.extend(children[item[1]])
+            elif kind == "eps":
+                nodes.extend(self.eps_nodes(item[1]))
+            elif kind == "leaf":
+                nodes.append(ParseTreeNode(item[1]))
+            else:
+                node = ParseTreeNode(item[1])
+                node.children = self.build(item[2], children)
+                nodes.append(node)
+        return nodes
+
+    def summary(self):
+        def name(sym):
+            if not self.is_helper(sym):
+                return sym
+            if sym == START:
+                return self.compiled.start + "₀"
+            if sym[0] == "term":
+                return f"T[{sym[1]}]"
+            return f"B{sym[1]}_{sym[2]}"
+
+        return {
+            "start": name(START),
+            "accepts_empty": self.accepts_empty,
+            "rules": [
+                f"{name(lhs)} -> {' '.join(name(s) for s in rhs)}"
+                for lhs, rhs, _ in self.rules
+            ]
+        }
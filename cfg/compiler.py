@@ -0,0 +1,215 @@
+import hashlib
+import json
+
+from core.cache import LRUCache
+
+EPSILON = "ε"
+END_MARKER = "$"
+CACHE_SIZE = 128
+
+_cache = LRUCache(CACHE_SIZE)
+
+
+def normalize_rhs(rhs):
+    if isinstance(rhs, (list, tuple)):
+        return tuple(sym for sym in rhs if sym not in ("", EPSILON))
+    if rhs in ("", EPSILON):
+        return ()
+    return tuple(rhs)
+
+
+def grammar_key(grammar):
+    payload = {
+        "start": grammar.start,
+        "productions": [
+            [lhs, [list(normalize_rhs(rhs)) for rhs in rhss]]
+            for lhs, rhss in grammar.productions.items()
+        ]
+    }
+    blob = json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+class CompiledGrammar:
+    def __init__(self, grammar, key=None):
+        self.key = key or grammar_key(grammar)
+        self.start = grammar.start
+        # Every LHS is a nonterminal, even if all of its rules turn out useless.
+        self.nonterminals = set(grammar.productions.keys()) | {grammar.start}
+
+        all_rules = []
+        for lhs, rhss in grammar.productions.items():
+            for rhs in rhss:
+                rule = (lhs, normalize_rhs(rhs))
+                if rule not in all_rules:
+                    all_rules.append(rule)
+
+        self.rules = self._remove_useless(all_rules)
+        self.removed = [r for r in all_rules if r not in self.rules]
+
+        self.productions = {nt: [] for nt in self.nonterminals}
+        for lhs, rhs in self.rules:
+            self.productions[lhs].append(rhs)
+
+        self.terminals = set()
+        for lhs, rhs in all_rules:
+            for sym in rhs:
+                if sym not in self.nonterminals:
+                    self.terminals.add(sym)
+
+        # Interned symbols: nonterminals first (start is 0), then terminals.
+        ordered_nts = [self.start] + sorted(self.nonterminals - {self.start})
+        self.symbols = ordered_nts + sorted(self.terminals)
+        self.symbol_ids = {sym: i for i, sym in enumerate(self.symbols)}
+        self.encoded_rules = [
+            (self.symbol_ids[lhs], tuple(self.symbol_ids[s] for s in rhs))
+            for lhs, rhs in self.rules
+        ]
+
+        self.nullable = self._compute_nullable()
+        self.first = self._compute_first()
+        self.follow = self._compute_follow()
+        self.left_recursive = self._find_left_recursion()
+
+    def is_terminal(self, symbol):
+        return symbol not in self.nonterminals
+
+    def _remove_useless(self, rules):
+        # 1. Generating symbols: derive at least one terminal string.
+        generating = set()
+        changed = True
+        while changed:
+            changed = False
+            for lhs, rhs in rules:
+                if lhs in generating:
+                    continue
+                if all(s in generating or s not in self.nonterminals for s in rhs):
+                    generating.add(lhs)
+                    changed = True
+        rules = [
+            (lhs, rhs) for lhs, rhs in rules
+            if lhs in generating
+            and all(s in generating or s not in self.nonterminals for s in rhs)
+        ]
+
+        # 2. Reachable symbols from the start symbol.
+        reachable = {self.start}
+        stack = [self.start]
+        while stack:
+            current = stack.pop()
+            for lhs, rhs in rules:
+                if lhs != current:
+                    continue
+                for s in rhs:
+                    if s in self.nonterminals and s not in reachable:
+                        reachable.add(s)
+                        stack.append(s)
+        return [(lhs, rhs) for lhs, rhs in rules if lhs in reachable]
+
+    def _compute_nullable(self):
+        nullable = set()
+        changed = True
+        while changed:
+            changed = False
+            for lhs, rhs in self.rules:
+                if lhs not in nullable and all(s in nullable for s in rhs):
+                    nullable.add(lhs)
+                    changed = True
+        return nullable
+
+    def _compute_first(self):
+        first = {nt: set() for nt in self.nonterminals}
+        changed = True
+        while changed:
+            changed = False
+            for lhs, rhs in self.rules:
+                before = len(first[lhs])
+                for sym in rhs:
+                    if sym not in self.nonterminals:
+                        first[lhs].add(sym)
+                        break
+                    first[lhs] |= first[sym]
+                    if sym not in self.nullable:
+                        break
+                if len(first[lhs]) != before:
+                    changed = True
+        return first
+
+    def first_of(self, symbols):
+        # FIRST of a sentential form, plus whether the whole form is nullable.
+        result = set()
+        for sym in symbols:
+            if sym not in self.nonterminals:
+                result.add(sym)
+                return result, False
+            result |= self.first[sym]
+            if sym not in self.nullable:
+                return result, False
+        return result, True
+
+    def _compute_follow(self):
+        follow = {nt: set() for nt in self.nonterminals}
+        follow[self.start].add(END_MARKER)
+        changed = True
+        while changed:
+            changed = False
+            for lhs, rhs in self.rules:
+                for i, sym in enumerate(rhs):
+                    if sym not in self.nonterminals:
+                        continue
+                    before = len(follow[sym])
+                    rest_first, rest_nullable = self.first_of(rhs[i + 1:])
+                    follow[sym] |= rest_first
+                    if rest_nullable:
+                        follow[sym] |= follow[lhs]
+                    if len(follow[sym]) != before:
+                        changed = True
+        return follow
+
+    def _find_left_recursion(self):
+        # A -> B edge whenever A -> α B β with α nullable.
+        edges = {nt: set() for nt in self.nonterminals}
+        for lhs, rhs in self.rules:
+            for sym in rhs:
+                if sym not in self.nonterminals:
+                    break
+                edges[lhs].add(sym)
+                if sym not in self.nullable:
+                    break
+
+        recursive = set()
+        for nt in self.nonterminals:
+            stack = list(edges[nt])
+            seen = set()
+            while stack:
+                current = stack.pop()
+                if current == nt:
+                    recursive.add(nt)
+                    break
+                if current in seen:
+                    continue
+                seen.add(current)
+                stack.extend(edges[current])
+        return recursive
+
+    def summary(self):
+        return {
+            "key": self.key,
+            "start": self.start,
+            "nonterminals": sorted(self.nonterminals),
+            "terminals": sorted(self.terminals),
+            "nullable": sorted(self.nullable),
+            "first": {nt: sorted(s) for nt, s in sorted(self.first.items())},
+            "follow": {nt: sorted(s) for nt, s in sorted(self.follow.items())},
+            "left_recursive": sorted(self.left_recursive),
+            "removed": [
+                {"lhs": lhs, "rhs": list(rhs) or [EPSILON]} for lhs, rhs in self.removed
+            ]
+        }
+
+
+def compile_grammar(grammar):
+    if isinstance(grammar, CompiledGrammar):
+        return grammar
+    key = grammar_key(grammar)
+    return _cache.get(key, lambda: CompiledGrammar(grammar, key))
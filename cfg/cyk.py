@@ -0,0 +1,144 @@
+from core.cache import LRUCache
+from cfg.compiler import compile_grammar
+from cfg.cnf import CNFGrammar, START
+from cfg.parse_tree import ParseTreeNode
+
+CACHE_SIZE = 128
+
+_cache = LRUCache(CACHE_SIZE)
+
+
+class CYKParser:
+    def __init__(self, grammar):
+        self.cnf = CNFGrammar(grammar)
+        symbols = sorted(self.cnf.nonterminals, key=repr)
+        self.index = {sym: i for i, sym in enumerate(symbols)}
+        self.start_index = self.index[START]
+
+        # Binary rules grouped by (B, C) so each pair costs one AND per split.
+        self.pairs = {}
+        for r in self.cnf.binary_rules:
+            lhs, (b, c), _ = self.cnf.rules[r]
+            heads = self.pairs.setdefault((self.index[b], self.index[c]), [])
+            if self.index[lhs] not in heads:
+                heads.append(self.index[lhs])
+        self.pairs = list(self.pairs.items())
+
+        self.binary_by_lhs = {}
+        for r in self.cnf.binary_rules:
+            self.binary_by_lhs.setdefault(self.cnf.rules[r][0], []).append(r)
+
+        self.terminal_heads = {}
+        for terminal, rules in self.cnf.terminal_rules.items():
+            heads = {self.index[self.cnf.rules[r][0]] for r in rules}
+            self.terminal_heads[terminal] = sorted(heads)
+
+    def chart(self, string):
+        # chart[l][X] is a bitset over start positions i such that X derives
+        # string[i:i + l]; one AND per (B, C, split) covers every span of
+        # length l at once instead of looping over start positions.
+        n = len(string)
+        size = len(self.index)
+        chart = [None] * (n + 1)
+        if n == 0:
+            return chart
+        row = [0] * size
+        for i, char in enumerate(string):
+            for x in self.terminal_heads.get(char, ()):
+                row[x] |= 1 << i
+        chart[1] = row
+        for length in range(2, n + 1):
+            row = [0] * size
+            for split in range(1, length):
+                left = chart[split]
+                right = chart[length - split]
+                for (b, c), heads in self.pairs:
+                    lb = left[b]
+                    if not lb:
+                        continue
+                    spans = lb & (right[c] >> split)
+                    if spans:
+                        for a in heads:
+                            row[a] |= spans
+            chart[length] = row
+        return chart
+
+    def contains(self, chart, symbol, start, length):
+        return (chart[length][self.index[symbol]] >> start) & 1
+
+    def accepts(self, string):
+        if not string:
+            return self.cnf.accepts_empty
+        chart = self.chart(string)
+        return bool(chart[len(string)][self.start_index] & 1)
+
+    def parse(self, string):
+        if not string:
+            if not self.cnf.accepts_empty:
+                return False, None
+            return True, self.cnf.eps_nodes(START)[0]
+        chart = self.chart(string)
+        n = len(string)
+        if not chart[n][self.start_index] & 1:
+            return False, None
+
+        def choose(symbol, start, length):
+            if length == 1:
+                for r in self.cnf.terminal_rules.get(string[start], ()):
+                    if self.cnf.rules[r][0] == symbol:
+                        return r, 0, ()
+            for r in self.binary_by_lhs.get(symbol, ()):
+                _, (b, c), _ = self.cnf.rules[r]
+                for split in range(1, length):
+                    if (self.contains(chart, b, start, split)
+                            and self.contains(chart, c, start + split, length - split)):
+                        return r, split, None
+
+        return True, self.rebuild(string, choose)[0]
+
+    def rebuild(self, string, choose, rank=None):
+        # Iterative post-order walk, so long inputs do not hit the recursion
+        # limit. choose(symbol, start, length) picks the rule, the split and
+        # None; with a rank, choose(symbol, start, length, rank) picks the
+        # tree of that rank and returns the ranks of the two children, plus
+        # the rule's template when it takes another unit chain variant.
+        stack = [[START, 0, len(string), rank, None, []]]
+        while True:
+            frame = stack[-1]
+            symbol, start, length, rank, choice, results = frame
+            if choice is None:
+                choice = choose(symbol, start, length) if rank is None else choose(symbol, start, length, rank)
+                frame[4] = choice
+            r, split, ranks = choice[:3]
+            ranks = ranks or (None, None)
+            lhs, rhs, template = self.cnf.rules[r]
+            if len(choice) > 3:
+                template = choice[3]
+            if length == 1:
+                nodes = self.cnf.build(template, [[ParseTreeNode(rhs[0])]])
+            elif len(results) == 0:
+                stack.append([rhs[0], start, split, ranks[0], None, []])
+                continue
+            elif len(results) == 1:
+                stack.append([rhs[1], start + split, length - split, ranks[1], None, []])
+                continue
+            else:
+                nodes = self.cnf.build(template, results)
+            stack.pop()
+            if not stack:
+                return nodes
+            stack[-1][5].append(nodes)
+
+
+def get_cyk_parser(grammar):
+    compiled = compile_grammar(grammar)
+    return _cache.get(compiled.key, lambda: CYKParser(compiled))
+
+
+def parse_with_cyk(grammar, string):
+    return get_cyk_parser(grammar).parse(string)
+
+
+def cyk_batch(grammar, strings):
+    parser = get_cyk_parser(grammar)
+    return [parser.accepts(s) for s in strings]
@@ -0,0 +1,52 @@
+from cfg.compiler import EPSILON
+
+# Leftmost derivations from a parse tree, produced lazily as diffs.
+# A pre-order walk of the tree visits internal nodes in exactly the order a
+# leftmost derivation expands them, and everything to the left of the node
+# being expanded is already terminal, so its index in the sentential form is
+# just the number of terminal leaves seen so far. Each step is O(1) to emit;
+# full sentential forms are only built when explicitly requested.
+
+
+def iter_leftmost_steps(root):
+    if root is None:
+        return
+    stack = [root]
+    emitted = 0
+    step = 0
+    while stack:
+        node = stack.pop()
+        if not node.children:
+            if node.symbol != EPSILON:
+                emitted += 1
+            continue
+        step += 1
+        yield {
+            "step": step,
+            "index": emitted,
+            "replaced": node.symbol,
+            "with": [c.symbol for c in node.children if c.symbol != EPSILON]
+        }
+        stack.extend(reversed(node.children))
+
+
+def apply_step(form, step):
+    form[step["index"]:step["index"] + 1] = step["with"]
+    return form
+
+
+def iter_sentential_forms(root):
+    if root is None:
+        return
+    form = [root.symbol]
+    yield list(form)
+    for step in iter_leftmost_steps(root):
+        yield list(apply_step(form, step))
+
+
+def format_form(form):
+    return " ".join(form) if form else EPSILON
+
+
+def leftmost_derivation(root):
+    return [format_form(form) for form in iter_sentential_forms(root)]
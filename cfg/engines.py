@@ -0,0 +1,23 @@
+from cfg.parser import parse_with_tree
+from cfg.table_parser import generate_parser
+from cfg.cyk import get_cyk_parser
+
+
+def choose_engine(grammar):
+    # Table parsers when the grammar is LL(1)/LALR(1), otherwise CYK for
+    # left-recursive grammars and recursive descent for the rest.
+    return generate_parser(grammar).kind or ("cyk" if grammar.left_recursive else "descent")
+
+
+def parse(grammar, string, engine="auto"):
+    if engine == "auto":
+        engine = choose_engine(grammar)
+    if engine == "descent":
+        accepted, tree = parse_with_tree(grammar, string)
+    elif engine in ("ll1", "lalr"):
+        accepted, tree = generate_parser(grammar).parse(string, engine)
+    elif engine == "cyk":
+        accepted, tree = get_cyk_parser(grammar).parse(string)
+    else:
+        raise ValueError(f"Unknown parser engine '{engine}'")
+    return engine, accepted, tree
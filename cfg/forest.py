@@ -0,0 +1,211 @@
+from cfg.cnf import START
+from cfg.compiler import EPSILON
+from cfg.cyk import get_cyk_parser
+
+# Shared packed parse forest built on the CYK chart. Forest nodes are keyed
+# by (CNF symbol, start, length) and each packed family is a (rule, split)
+# pair, so subtrees shared between alternative parses are stored once.
+# Each way of dropping nullable symbols is a CNF rule of its own, so it gets
+# its own packed family; parallel unit rules along a rule's unit chain are
+# packed as alternatives of that family (CNFGrammar.variants). Trees are
+# counted modulo the conversion's canonical choices: one fixed ε-subtree per
+# nullable symbol and the shortest unit chain, which keeps the count finite
+# even for cyclic grammars.
+
+
+class ParseForest:
+    def __init__(self, grammar, string):
+        self.parser = get_cyk_parser(grammar)
+        self.cnf = self.parser.cnf
+        self.string = string
+        self.families = {}
+        self._counts = None
+
+        n = len(string)
+        if n == 0:
+            self.accepted = self.cnf.accepts_empty
+            self.root = None
+            return
+        self.chart = self.parser.chart(string)
+        self.root = (START, 0, n)
+        self.accepted = bool(self.parser.contains(self.chart, START, 0, n))
+        if self.accepted:
+            self._build()
+
+    def _build(self):
+        stack = [self.root]
+        while stack:
+            key = stack.pop()
+            if key in self.families:
+                continue
+            symbol, start, length = key
+            families = []
+            if length == 1:
+                for r in self.cnf.terminal_rules.get(self.string[start], ()):
+                    if self.cnf.rules[r][0] == symbol:
+                        families.append((r, 0))
+            else:
+                for r in self.parser.binary_by_lhs.get(symbol, ()):
+                    _, (b, c), _ = self.cnf.rules[r]
+                    for split in range(1, length):
+                        if (self.parser.contains(self.chart, b, start, split)
+                                and self.parser.contains(self.chart, c, start + split, length - split)):
+                            families.append((r, split))
+                            stack.append((b, start, split))
+                            stack.append((c, start + split, length - split))
+            self.families[key] = families
+
+    def children(self, key, family):
+        symbol, start, length = key
+        r, split = family
+        if length == 1:
+            return ()
+        _, (b, c), _ = self.cnf.rules[r]
+        return (b, start, split), (c, start + split, length - split)
+
+    def count(self):
+        if not self.accepted:
+            return 0
+        if self.root is None:
+            return 1
+        if self._counts is None:
+            # Children are always strictly shorter, so ascending length
+            # order visits every child before its parents.
+            counts = {}
+            for key in sorted(self.families, key=lambda k: k[2]):
+                total = 0
+                for family in self.families[key]:
+                    product = self.cnf.variants(family[0])
+                    for child in self.children(key, family):
+                        product *= counts[child]
+                    total += product
+                counts[key] = total
+            self._counts = counts
+        return self._counts[self.root]
+
+    def tree(self, rank):
+        if not 0 <= rank < self.count():
+            raise IndexError("parse tree index out of range")
+        if self.root is None:
+            return self.cnf.eps_nodes(START)[0]
+        self.count()
+        counts = self._counts
+
+        def choose(symbol, start, length, rank):
+            key = (symbol, start, length)
+            for family in self.families[key]:
+                r = family[0]
+                kids = self.children(key, family)
+                trees = counts[kids[0]] * counts[kids[1]] if kids else 1
+                size = self.cnf.variants(r) * trees
+                if rank < size:
+                    variant, rank = divmod(rank, trees)
+                    ranks = divmod(rank, counts[kids[1]]) if kids else ()
+                    return r, family[1], ranks, self.cnf.variant(r, variant)
+                rank -= size
+
+        return self.parser.rebuild(self.string, choose, rank)[0]
+
+    def iter_trees(self, offset=0):
+        for rank in range(offset, self.count()):
+            yield self.tree(rank)
+
+    def dag(self):
+        # Flatten the forest into original-grammar nodes with integer IDs.
+        # Helper nonterminals introduced by CNF become "intermediate" nodes
+        # whose children are spliced into the parent by the consumer.
+        nodes = []
+        ids = {}
+
+        def add(node):
+            node["id"] = len(nodes)
+            nodes.append(node)
+            return node["id"]
+
+        def leaf(symbol, position):
+            key = ("leaf", symbol, position)
+            if key not in ids:
+                end = position if symbol == EPSILON else position + 1
+                ids[key] = add({"symbol": symbol, "start": position, "end": end})
+            return ids[key]
+
+        def evaluate(items, child_ids, child_spans, cursor):
+            result = []
+            for item in items:
+                kind = item[0]
+                if kind == "child":
+                    result.append(child_ids[item[1]])
+                    cursor = child_spans[item[1]][1]
+                elif kind == "eps":
+                    result.append(eps(item[1], cursor))
+                elif kind == "leaf":
+                    result.append(leaf(item[1], cursor))
+                else:
+                    begin = cursor
+                    inner, cursor = evaluate(item[2], child_ids, child_spans, cursor)
+                    result.append(add({"symbol": item[1], "start": begin, "end": cursor, "families": [inner]}))
+            return result, cursor
+
+        def pack(alternatives, start, end):
+            # alternatives: (template, child_ids, child_spans) per family.
+            templates = [t for t, _, _ in alternatives]
+            tops = {t[0][1] for t in templates if len(t) == 1 and t[0][0] == "node"}
+            single = len(tops) == 1 and all(len(t) == 1 and t[0][0] == "node" for t in templates)
+            families = [
+                evaluate(t[0][2] if single else t, child_ids, spans, start)[0]
+                for t, child_ids, spans in alternatives
+            ]
+            if single:
+                return add({"symbol": tops.pop(), "start": start, "end": end, "families": families})
+            if len(families) == 1 and len(families[0]) == 1:
+                return families[0][0]
+            return add({"symbol": None, "intermediate": True, "start": start, "end": end, "families": families})
+
+        def eps(symbol, position):
+            key = ("eps", symbol, position)
+            if key not in ids:
+                rhs, template = self.cnf.eps_rules[symbol]
+                child_ids = [eps(s, position) for s in rhs]
+                spans = [(position, position)] * len(rhs)
+                ids[key] = pack([(template, child_ids, spans)], position, position)
+            return ids[key]
+
+        if not self.accepted:
+            return None, []
+        if self.root is None:
+            return eps(START, 0), nodes
+
+        for key in sorted(self.families, key=lambda k: k[2]):
+            symbol, start, length = key
+            alternatives = []
+            for family in self.families[key]:
+                _, rhs, _ = self.cnf.rules[family[0]]
+                hops, template = self.cnf.chains[family[0]]
+                kids = self.children(key, family)
+                if kids:
+                    child_ids = [ids[k] for k in kids]
+                    spans = [(k[1], k[1] + k[2]) for k in kids]
+                else:
+                    child_ids = [leaf(rhs[0], start)]
+                    spans = [(start, start + 1)]
+                if not hops:
+                    alternatives.append((template, child_ids, spans))
+                    continue
+                # Pack the unit chain hop by hop, innermost first, so the
+                # alternatives of each hop are stored once.
+                inner = pack([(template, child_ids, spans)], start, start + length)
+                for hop in reversed(hops[1:]):
+                    inner = pack([
+                        (unit, [inner], [(start, start + length)])
+                        for unit in self.cnf.unit_alternatives[hop]
+                    ], start, start + length)
+                alternatives.extend(
+                    (unit, [inner], [(start, start + length)])
+                    for unit in self.cnf.unit_alternatives[hops[0]]
+                )
+            ids[key] = pack(alternatives, start, start + length)
+        return ids[self.root], nodes
+
+
+def parse_forest(grammar, string):
+    return ParseForest(grammar, string)
@@ -3,6 +3,15 @@ class Grammar:
         self.start = start
         self.productions = {}  # A -> list of RHS
 
+    @classmethod
+    def from_dict(cls, start, rules):
+        # {"S": [["a", "S", "b"], ""]}, the JSON form used by the API.
+        g = cls(start)
+        for lhs, rhss in rules.items():
+            for rhs in rhss:
+                g.add_production(lhs, rhs)
+        return g
+
     def add_production(self, lhs, rhs):
         if lhs not in self.productions:
             self.productions[lhs] = []
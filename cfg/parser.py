@@ -1,12 +1,26 @@
+from cfg.compiler import compile_grammar
+
+
+def _check_left_recursion(compiled):
+    if compiled.left_recursive:
+        raise ValueError(
+            "Grammar is left-recursive in " + ", ".join(sorted(compiled.left_recursive))
+            + "; recursive descent cannot parse it"
+        )
+
+
 def parse_string(grammar, string):
+    compiled = compile_grammar(grammar)
+    _check_left_recursion(compiled)
+
     def derive(symbol, pos):
         if pos > len(string):
             return None
-        if symbol not in grammar.productions:
+        if compiled.is_terminal(symbol):
             if pos < len(string) and symbol == string[pos]:
                 return pos + 1
             return None
-        for production in grammar.productions[symbol]:
+        for production in compiled.productions[symbol]:
             cur = pos
             for sym in production:
                 cur = derive(sym, cur)
@@ -15,19 +29,22 @@ def parse_string(grammar, string):
             if cur is not None:
                 return cur
         return None
-    result = derive(grammar.start, 0)
+    result = derive(compiled.start, 0)
     return result == len(string)
 
 from cfg.parse_tree import ParseTreeNode
 
 def parse_with_tree(grammar, string):
+    compiled = compile_grammar(grammar)
+    _check_left_recursion(compiled)
+
     def derive(symbol, pos):
         node = ParseTreeNode(symbol)
-        if symbol not in grammar.productions:
+        if compiled.is_terminal(symbol):
             if pos < len(string) and symbol == string[pos]:
                 return node, pos + 1
             return None, pos
-        for production in grammar.productions[symbol]:
+        for production in compiled.productions[symbol]:
             cur_pos = pos
             children = []
             valid = True
@@ -43,7 +60,7 @@ def parse_with_tree(grammar, string):
                 node.children = children
                 return node, cur_pos
         return None, pos
-    tree, pos = derive(grammar.start, 0)
+    tree, pos = derive(compiled.start, 0)
     if tree and pos == len(string):
         return True, tree
 
@@ -0,0 +1,315 @@
+from core.cache import LRUCache
+from cfg.compiler import compile_grammar, END_MARKER, EPSILON
+from cfg.parse_tree import ParseTreeNode
+
+CACHE_SIZE = 128
+
+_cache = LRUCache(CACHE_SIZE)
+
+
+class GrammarConflictError(ValueError):
+    def __init__(self, message, conflicts):
+        super().__init__(message)
+        self.conflicts = conflicts
+
+    def __reduce__(self):
+        return type(self), (str(self), self.conflicts)
+
+
+def format_rule(lhs, rhs):
+    return f"{lhs} -> {' '.join(rhs) if rhs else EPSILON}"
+
+
+def _make_node(lhs, children):
+    node = ParseTreeNode(lhs)
+    node.children = children if children else [ParseTreeNode(EPSILON)]
+    return node
+
+
+#------------------------------------------
+# LL(1)
+#------------------------------------------
+
+def build_ll1_table(compiled):
+    table = {}
+    conflicts = []
+    for index, (lhs, rhs) in enumerate(compiled.rules):
+        first, nullable = compiled.first_of(rhs)
+        lookaheads = set(first)
+        if nullable:
+            lookaheads |= compiled.follow[lhs]
+        for a in sorted(lookaheads):
+            key = (lhs, a)
+            if key in table:
+                conflicts.append({
+                    "type": "ll1",
+                    "nonterminal": lhs,
+                    "lookahead": a,
+                    "rules": [
+                        format_rule(*compiled.rules[table[key]]),
+                        format_rule(lhs, rhs)
+                    ]
+                })
+                continue
+            table[key] = index
+    return table, conflicts
+
+
+def ll1_parse(compiled, table, string):
+    tokens = list(string) + [END_MARKER]
+    root = ParseTreeNode(compiled.start)
+    stack = [(compiled.start, root)]
+    pos = 0
+    while stack:
+        symbol, node = stack.pop()
+        lookahead = tokens[pos]
+        if compiled.is_terminal(symbol):
+            if symbol != lookahead:
+                return False, None
+            pos += 1
+            continue
+        index = table.get((symbol, lookahead))
+        if index is None:
+            return False, None
+        _, rhs = compiled.rules[index]
+        children = [ParseTreeNode(s) for s in rhs]
+        node.children = children if children else [ParseTreeNode(EPSILON)]
+        for sym, child in reversed(list(zip(rhs, children))):
+            stack.append((sym, child))
+    if tokens[pos] != END_MARKER:
+        return False, None
+    return True, root
+
+
+#------------------------------------------
+# LALR(1)
+#------------------------------------------
+
+class LALRTable:
+    def __init__(self, compiled):
+        augmented = compiled.start + "'"
+        while augmented in compiled.symbol_ids:
+            augmented += "'"
+        self.compiled = compiled
+        # Rule 0 is the augmented rule S' -> S; grammar rule i is rule i + 1.
+        self.rules = [(augmented, (compiled.start,))] + list(compiled.rules)
+        self.by_lhs = {}
+        for index, (lhs, _) in enumerate(self.rules):
+            self.by_lhs.setdefault(lhs, []).append(index)
+
+        self.kernels, self.goto = self._build_lr0()
+        self.closures = self._propagate_lookaheads()
+        self.action, self.goto_table, self.conflicts = self._build_tables()
+
+    def _lr0_closure(self, kernel):
+        items = set(kernel)
+        stack = list(kernel)
+        while stack:
+            r, d = stack.pop()
+            rhs = self.rules[r][1]
+            if d < len(rhs) and rhs[d] in self.by_lhs:
+                for r2 in self.by_lhs[rhs[d]]:
+                    if (r2, 0) not in items:
+                        items.add((r2, 0))
+                        stack.append((r2, 0))
+        return items
+
+    def _build_lr0(self):
+        start = frozenset([(0, 0)])
+        kernels = [start]
+        index = {start: 0}
+        goto = [{}]
+        i = 0
+        while i < len(kernels):
+            moves = {}
+            for r, d in self._lr0_closure(kernels[i]):
+                rhs = self.rules[r][1]
+                if d < len(rhs):
+                    moves.setdefault(rhs[d], set()).add((r, d + 1))
+            for symbol in sorted(moves):
+                kernel = frozenset(moves[symbol])
+                if kernel not in index:
+                    index[kernel] = len(kernels)
+                    kernels.append(kernel)
+                    goto.append({})
+                goto[i][symbol] = index[kernel]
+            i += 1
+        return kernels, goto
+
+    def _lr1_closure(self, lookaheads):
+        closure = {item: set(la) for item, la in lookaheads.items()}
+        stack = list(closure)
+        while stack:
+            r, d = stack.pop()
+            rhs = self.rules[r][1]
+            if d >= len(rhs) or rhs[d] not in self.by_lhs:
+                continue
+            first, nullable = self.compiled.first_of(rhs[d + 1:])
+            new_la = set(first)
+            if nullable:
+                new_la |= closure[(r, d)]
+            for r2 in self.by_lhs[rhs[d]]:
+                item = (r2, 0)
+                current = closure.setdefault(item, set())
+                if not new_la <= current:
+                    current |= new_la
+                    stack.append(item)
+        return closure
+
+    def _propagate_lookaheads(self):
+        la = [{item: set() for item in kernel} for kernel in self.kernels]
+        la[0][(0, 0)].add(END_MARKER)
+        changed = True
+        while changed:
+            changed = False
+            closures = []
+            for state in range(len(self.kernels)):
+                closure = self._lr1_closure(la[state])
+                closures.append(closure)
+                for (r, d), lookaheads in closure.items():
+                    rhs = self.rules[r][1]
+                    if d >= len(rhs):
+                        continue
+                    target = la[self.goto[state][rhs[d]]][(r, d + 1)]
+                    if not lookaheads <= target:
+                        target |= lookaheads
+                        changed = True
+        return closures
+
+    def _build_tables(self):
+        action = [{} for _ in self.kernels]
+        conflicts = []
+
+        def describe(entry):
+            if entry[0] == "shift":
+                return f"shift {entry[1]}"
+            if entry[0] == "accept":
+                return "accept"
+            return "reduce " + format_rule(*self.rules[entry[1]])
+
+        def set_action(state, symbol, entry):
+            existing = action[state].get(symbol)
+            if existing is None:
+                action[state][symbol] = entry
+                return
+            if existing == entry:
+                return
+            kinds = {existing[0], entry[0]}
+            conflicts.append({
+                "type": "shift-reduce" if "shift" in kinds else "reduce-reduce",
+                "state": state,
+                "lookahead": symbol,
+                "actions": [describe(existing), describe(entry)]
+            })
+
+        for state, closure in enumerate(self.closures):
+            for symbol, target in self.goto[state].items():
+                if self.compiled.is_terminal(symbol):
+                    set_action(state, symbol, ("shift", target))
+            for (r, d), lookaheads in sorted(closure.items()):
+                if d < len(self.rules[r][1]):
+                    continue
+                for symbol in sorted(lookaheads):
+                    if r == 0:
+                        set_action(state, symbol, ("accept", 0))
+                    else:
+                        set_action(state, symbol, ("reduce", r))
+
+        goto_table = [
+            {sym: t for sym, t in moves.items() if not self.compiled.is_terminal(sym)}
+            for moves in self.goto
+        ]
+        return action, goto_table, conflicts
+
+    def parse(self, string):
+        tokens = list(string) + [END_MARKER]
+        states = [0]
+        nodes = []
+        pos = 0
+        while True:
+            entry = self.action[states[-1]].get(tokens[pos])
+            if entry is None:
+                return False, None
+            kind, value = entry
+            if kind == "shift":
+                states.append(value)
+                nodes.append(ParseTreeNode(tokens[pos]))
+                pos += 1
+            elif kind == "reduce":
+                lhs, rhs = self.rules[value]
+                if rhs:
+                    children = nodes[-len(rhs):]
+                    del nodes[-len(rhs):]
+                    del states[-len(rhs):]
+                else:
+                    children = []
+                nodes.append(_make_node(lhs, children))
+                states.append(self.goto_table[states[-1]][lhs])
+            else:
+                return True, nodes[-1]
+
+
+#------------------------------------------
+# Generator
+#------------------------------------------
+
+class TableParser:
+    def __init__(self, compiled):
+        self.compiled = compiled
+        self.ll1_table, self.ll1_conflicts = build_ll1_table(compiled)
+        self._lalr = None
+
+    @property
+    def lalr(self):
+        if self._lalr is None:
+            self._lalr = LALRTable(self.compiled)
+        return self._lalr
+
+    @property
+    def kind(self):
+        if not self.ll1_conflicts:
+            return "ll1"
+        if not self.lalr.conflicts:
+            return "lalr"
+        return None
+
+    def parse(self, string, method="auto"):
+        if method == "auto":
+            method = self.kind
+            if method is None:
+                raise GrammarConflictError(
+                    "Grammar is neither LL(1) nor LALR(1)",
+                    self.ll1_conflicts + self.lalr.conflicts
+                )
+        if method == "ll1":
+            if self.ll1_conflicts:
+                raise GrammarConflictError("Grammar is not LL(1)", self.ll1_conflicts)
+            return ll1_parse(self.compiled, self.ll1_table, string)
+        if method == "lalr":
+            if self.lalr.conflicts:
+                raise GrammarConflictError("Grammar is not LALR(1)", self.lalr.conflicts)
+            return self.lalr.parse(string)
+        raise ValueError(f"Unknown table parser '{method}'")
+
+    def diagnostics(self):
+        ll1 = {
+            "conflicts": self.ll1_conflicts,
+            "table": {
+                f"{lhs}, {a}": format_rule(*self.compiled.rules[index])
+                for (lhs, a), index in sorted(self.ll1_table.items())
+            }
+        }
+        lalr = {
+            "conflicts": self.lalr.conflicts,
+            "states": len(self.lalr.kernels)
+        }
+        return {"kind": self.kind, "ll1": ll1, "lalr": lalr}
+
+
+def generate_parser(grammar):
+    compiled = compile_grammar(grammar)
+    return _cache.get(compiled.key, lambda: TableParser(compiled))
+
+
+def parse_with_table(grammar, string, method="auto"):
+    return generate_parser(grammar).parse(string, method)
@@ -1,7 +1,9 @@
 from automata.pda import PDA
 from core.state import State
+from cfg.compiler import compile_grammar
 
 def cfg_to_pda(grammar):
+    compiled = compile_grammar(grammar)
     pda = PDA()
     q = State("q")
 
@@ -9,24 +11,17 @@ def cfg_to_pda(grammar):
     pda.start_state = q
     pda.accept_states.add(q)
 
-    pda.stack_alphabet.update(grammar.productions.keys())
-    pda.start_stack_symbol = grammar.start
+    pda.stack_alphabet.update(compiled.nonterminals)
+    pda.start_stack_symbol = compiled.start
 
-    
+    # 1. Nonterminals: (q, ε, A) -> (q, rhs) for every useful rule A -> rhs
     terminals = set()
-    for lhs, rhss in grammar.productions.items():
-        for rhs in rhss:
-
-            push_content = tuple(rhs) if isinstance(rhs, list) else (rhs,)
-            if len(push_content) == 1 and push_content[0] == "": 
-                push_content = ()
-
-            pda.add_transition(q, None, lhs, q, push_content)
-            
+    for lhs, rhs in compiled.rules:
+        pda.add_transition(q, None, lhs, q, rhs)
 
-            for symbol in rhs:
-                if symbol not in grammar.productions:
-                    terminals.add(symbol)
+        for symbol in rhs:
+            if compiled.is_terminal(symbol):
+                terminals.add(symbol)
 
     # 2. Terminals: (q, a, a) -> (q, ε)
     pda.input_alphabet.update(terminals)
@@ -8,6 +8,7 @@ def nfa_to_pda(nfa):
     pda.start_state = nfa.start_state
     pda.accept_states = nfa.accept_states.copy()
     pda.start_stack_symbol = "Z0"
+    pda.classes = nfa.classes
 
     for (state, symbol), targets in nfa.transitions.items():
         for t in targets:
@@ -0,0 +1,33 @@
+from collections import OrderedDict
+
+# A small least-recently-used cache for per-process derived objects
+# (compiled grammars, parse tables, CNF parsers), keyed by content hash.
+# Not locked: each worker process has its own copy, and a race in the API
+# process only builds the same object twice.
+
+
+class LRUCache:
+    def __init__(self, size=128):
+        self.size = size
+        self._entries = OrderedDict()
+
+    def get(self, key, build):
+        # The cached value for key, or build() stored as the newest entry.
+        value = self._entries.get(key)
+        if value is not None:
+            self._entries.move_to_end(key)
+            return value
+        value = build()
+        self._entries[key] = value
+        if len(self._entries) > self.size:
+            self._entries.popitem(last=False)
+        return value
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
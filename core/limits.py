@@ -0,0 +1,67 @@
+import os
+from contextlib import contextmanager
+
+# Per-request resource limits. Server-wide ceilings come from the
+# environment; a request may only lower them. Code running a job reads the
+# active values with get_limit().
+DEFAULT_LIMITS = {
+    "timeout": float(os.environ.get("TOC_TIMEOUT", 10.0)),
+    "max_states": int(os.environ.get("TOC_MAX_STATES", 10000)),
+    "max_steps": int(os.environ.get("TOC_MAX_STEPS", 10 ** 7)),
+    "max_memory_mb": int(os.environ.get("TOC_MAX_MEMORY_MB", 512))
+}
+
+_active = dict(DEFAULT_LIMITS)
+
+
+class LimitExceeded(Exception):
+    def __init__(self, limit, value, message=None):
+        super().__init__(limit, value, message)
+        self.limit = limit
+        self.value = value
+        self.message = message or f"Exceeded {limit} ({value})"
+
+    def __str__(self):
+        return self.message
+
+    def detail(self):
+        return {
+            "error": "timeout" if self.limit == "timeout" else "limit_exceeded",
+            "limit": self.limit,
+            "value": self.value,
+            "message": self.message
+        }
+
+
+class Cancelled(Exception):
+    pass
+
+
+def resolve_limits(requested=None):
+    limits = dict(DEFAULT_LIMITS)
+    for name, value in (requested or {}).items():
+        if name not in limits:
+            raise ValueError(f"Unknown limit '{name}'")
+        try:
+            value = type(limits[name])(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"Invalid value for limit '{name}': {value!r}")
+        if value <= 0:
+            raise ValueError(f"Limit '{name}' must be positive")
+        limits[name] = min(value, limits[name])
+    return limits
+
+
+def get_limit(name):
+    return _active[name]
+
+
+@contextmanager
+def use_limits(limits):
+    global _active
+    previous = _active
+    _active = dict(DEFAULT_LIMITS, **limits)
+    try:
+        yield
+    finally:
+        _active = previous
@@ -0,0 +1,150 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+# Built-in instrumentation. Timers and counters either append to the
+# records of the current request/job (see recording()) or, outside one,
+# update the process-wide registry directly. Nothing is formatted until
+# /metrics is scraped. Records of a worker job travel back with its result
+# and are merged in the API process.
+
+BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+HELP = {
+    "toc_stage_seconds": "Time spent per pipeline stage or simulator",
+    "toc_request_seconds": "Request latency by route",
+    "toc_requests_total": "Requests by route and status",
+    "toc_worker_jobs_total": "Worker pool jobs by outcome"
+}
+
+_records = ContextVar("toc_metric_records", default=None)
+
+
+class Histogram:
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+
+class Registry:
+    def __init__(self):
+        self.histograms = {}
+        self.counters = {}
+        self._lock = threading.Lock()
+
+    def apply(self, records):
+        with self._lock:
+            for kind, name, labels, value in records:
+                key = (name, labels)
+                if kind == "h":
+                    histogram = self.histograms.get(key)
+                    if histogram is None:
+                        histogram = self.histograms[key] = Histogram()
+                    histogram.observe(value)
+                else:
+                    self.counters[key] = self.counters.get(key, 0) + value
+
+    def render(self):
+        with self._lock:
+            histograms = sorted(self.histograms.items())
+            counters = sorted(self.counters.items())
+            histograms = [(key, list(h.counts), h.sum, h.buckets) for key, h in histograms]
+        lines = []
+        seen = set()
+
+        def header(name, kind):
+            if name not in seen:
+                seen.add(name)
+                if name in HELP:
+                    lines.append(f"# HELP {name} {HELP[name]}")
+                lines.append(f"# TYPE {name} {kind}")
+
+        for (name, labels), value in counters:
+            header(name, "counter")
+            lines.append(f"{name}{_labels(labels)} {value}")
+        for (name, labels), counts, total, buckets in histograms:
+            header(name, "histogram")
+            cumulative = 0
+            for bound, count in zip(buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{name}_bucket{_labels(labels + (('le', le),))} {cumulative}")
+            lines.append(f"{name}_sum{_labels(labels)} {total}")
+            lines.append(f"{name}_count{_labels(labels)} {cumulative}")
+        return "\n".join(lines) + "\n"
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in labels)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(labels, escaped)) + "}"
+
+
+registry = Registry()
+
+
+def record(records):
+    # Adds records to the current request/job, or to the registry.
+    current = _records.get()
+    if current is None:
+        registry.apply(records)
+    else:
+        current.extend(records)
+
+
+def observe(name, value, **labels):
+    record([("h", name, tuple(sorted(labels.items())), value)])
+
+
+def count(name, value=1, **labels):
+    record([("c", name, tuple(sorted(labels.items())), value)])
+
+
+@contextmanager
+def timer(stage):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe("toc_stage_seconds", time.perf_counter() - start, stage=stage)
+
+
+def timed(stage):
+    def decorate(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with timer(stage):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+@contextmanager
+def recording():
+    # Collects the records made inside the block into the yielded list
+    # instead of the registry; the caller decides where they go.
+    records = []
+    token = _records.set(records)
+    try:
+        yield records
+    finally:
+        _records.reset(token)
+
+
+def stage_breakdown(records):
+    # Total milliseconds per stage, in order of first appearance.
+    totals = {}
+    for kind, name, labels, value in records:
+        if kind == "h" and name == "toc_stage_seconds":
+            stage = dict(labels)["stage"]
+            totals[stage] = totals.get(stage, 0.0) + value * 1000
+    return totals
@@ -0,0 +1,130 @@
+import cProfile
+import json
+import os
+import pstats
+import secrets
+import tempfile
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Opt-in profiling of single requests. When a request asks for it (and
+# TOC_PROFILING=1), the handler thread and every worker job it starts run
+# under cProfile; the stats are merged and kept in PROFILE_DIR as a pstats
+# file plus a JSON summary, newest PROFILE_KEEP only.
+
+PROFILING = os.environ.get("TOC_PROFILING") == "1"
+PROFILE_DIR = os.environ.get("TOC_PROFILE_DIR") or os.path.join(tempfile.gettempdir(), "toc-profiles")
+PROFILE_KEEP = int(os.environ.get("TOC_PROFILE_KEEP", 50))
+TOP_FUNCTIONS = 40
+
+_session = ContextVar("toc_profile_session", default=None)
+
+
+class _Profile:
+    # What pstats.Stats accepts in place of a Profile object.
+    def __init__(self, stats):
+        self.stats = stats
+
+    def create_stats(self):
+        pass
+
+
+@contextmanager
+def profiling():
+    # Collects the stats of everything profiled inside the block.
+    session = []
+    token = _session.set(session)
+    try:
+        yield session
+    finally:
+        _session.reset(token)
+
+
+def profile_requested():
+    return _session.get() is not None
+
+
+def add_profiles(profiles):
+    session = _session.get()
+    if session is not None:
+        session.extend(profiles)
+
+
+@contextmanager
+def profiled_block():
+    # Profiles the current thread if a session is active; a no-op otherwise
+    # or when another profiler already runs in this thread.
+    session = _session.get()
+    profiler = None
+    if session is not None:
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            profiler = None
+    try:
+        yield
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            profiler.create_stats()
+            session.append(profiler.stats)
+
+
+def _short(filename):
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    return os.path.relpath(filename, root) if filename.startswith(root) else filename
+
+
+def save_profile(profiles, meta):
+    if not profiles:
+        return None
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    profile_id = secrets.token_hex(8)
+    stats = pstats.Stats(_Profile(profiles[0]))
+    for extra in profiles[1:]:
+        stats.add(_Profile(extra))
+    stats.dump_stats(os.path.join(PROFILE_DIR, f"{profile_id}.prof"))
+    rows = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)[:TOP_FUNCTIONS]
+    summary = dict(meta, id=profile_id, created=time.time(), functions=[
+        {
+            "function": f"{_short(filename)}:{line}({name})",
+            "calls": calls,
+            "total_ms": round(total * 1000, 3),
+            "cumulative_ms": round(cumulative * 1000, 3)
+        }
+        for (filename, line, name), (_, calls, total, cumulative, _) in rows
+    ])
+    with open(os.path.join(PROFILE_DIR, f"{profile_id}.json"), "w", encoding="utf-8") as f:
+        json.dump(summary, f, ensure_ascii=False)
+    _prune()
+    return profile_id
+
+
+def _prune():
+    summaries = sorted(
+        (entry for entry in os.scandir(PROFILE_DIR) if entry.name.endswith(".json")),
+        key=lambda entry: entry.stat().st_mtime
+    )
+    for entry in summaries[:max(len(summaries) - PROFILE_KEEP, 0)]:
+        for suffix in (".json", ".prof"):
+            try:
+                os.remove(entry.path[:-5] + suffix)
+            except OSError:
+                pass
+
+
+def profile_path(profile_id, suffix):
+    if not profile_id.isalnum():
+        return None
+    path = os.path.join(PROFILE_DIR, profile_id + suffix)
+    return path if os.path.exists(path) else None
+
+
+def load_summary(profile_id):
+    path = profile_path(profile_id, ".json")
+    if path is None:
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
@@ -0,0 +1,100 @@
+MAX_CODEPOINT = 0x10FFFF
+SPECIAL = set("]\\-^")
+# "ε" stands for the empty string in NFA output, "_" is the TM blank and "*"
+# the TM wildcard, so none of them is ever an input symbol; classes leave
+# them out.
+RESERVED = ("ε", "_", "*")
+
+# Character classes: [abc], ranges [a-z0-9], negation [^a-z] (relative to
+# all of Unicode), and \ to take the next character literally. A class is
+# held as sorted, disjoint, inclusive (lo, hi) code point ranges.
+
+
+def parse_class(text):
+    if len(text) < 3 or text[0] != "[" or text[-1] != "]":
+        raise ValueError(f"Invalid character class '{text}'")
+    body = text[1:-1]
+    negate = body.startswith("^")
+    if negate:
+        body = body[1:]
+    items = []
+    i = 0
+    while i < len(body):
+        if body[i] == "\\":
+            if i + 1 >= len(body):
+                raise ValueError(f"Dangling escape in character class '{text}'")
+            items.append((body[i + 1], True))
+            i += 2
+        else:
+            items.append((body[i], False))
+            i += 1
+    if not items:
+        raise ValueError(f"Empty character class '{text}'")
+
+    ranges = []
+    i = 0
+    while i < len(items):
+        char = items[i][0]
+        if i + 2 < len(items) and items[i + 1] == ("-", False):
+            end = items[i + 2][0]
+            if end < char:
+                raise ValueError(f"Invalid range '{char}-{end}' in character class '{text}'")
+            ranges.append((ord(char), ord(end)))
+            i += 3
+        else:
+            ranges.append((ord(char), ord(char)))
+            i += 1
+    ranges = merge_ranges(ranges)
+    if negate:
+        ranges = complement_ranges(ranges)
+    reserved = merge_ranges((ord(c), ord(c)) for c in RESERVED)
+    ranges = complement_ranges(merge_ranges(complement_ranges(ranges) + reserved))
+    if not ranges:
+        raise ValueError(f"Character class '{text}' matches no input symbol")
+    return ranges
+
+
+def merge_ranges(ranges):
+    merged = []
+    for lo, hi in sorted(ranges):
+        if merged and lo <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], hi))
+        else:
+            merged.append((lo, hi))
+    return merged
+
+
+def complement_ranges(ranges):
+    result = []
+    next_lo = 0
+    for lo, hi in ranges:
+        if lo > next_lo:
+            result.append((next_lo, lo - 1))
+        next_lo = hi + 1
+    if next_lo <= MAX_CODEPOINT:
+        result.append((next_lo, MAX_CODEPOINT))
+    return result
+
+
+def class_label(ranges):
+    # The canonical class text for ranges; parse_class reads it back.
+    def char(code):
+        c = chr(code)
+        return "\\" + c if c in SPECIAL else c
+
+    parts = []
+    for lo, hi in ranges:
+        if lo == hi:
+            parts.append(char(lo))
+        elif hi == lo + 1:
+            parts.append(char(lo) + char(hi))
+        else:
+            parts.append(f"{char(lo)}-{char(hi)}")
+    return "[" + "".join(parts) + "]"
+
+
+def label_ranges(label):
+    # An NFA edge label: one character, or a class.
+    if len(label) == 1:
+        return [(ord(label), ord(label))]
+    return parse_class(label)
@@ -0,0 +1,46 @@
+from core.state import State
+from core.metrics import timed
+from regex.validation import validate_regex
+from regex.regex_parser import insert_concatenation
+from regex.postfix import to_postfix
+from regex.thompson import regex_to_nfa
+
+@timed("normalize_nfa")
+def normalize_nfa(nfa):
+
+    queue = [nfa.start_state]
+    mapping = {nfa.start_state: "q0"}
+    nfa.start_state.name = "q0"
+    visited = {nfa.start_state}
+    count = 1
+
+    while queue:
+        current = queue.pop(0)
+        outgoing = []
+        for key, targets in nfa.transitions.items():
+            if key[0] == current:
+                 symbol = key[1] if key[1] else "ε"
+                 sorted_targets = sorted(list(targets), key=lambda x: int(x.name[1:]) if x.name.startswith("q") and x.name[1:].isdigit() else x.name) 
+                 outgoing.append((symbol, sorted_targets))
+        
+        outgoing.sort(key=lambda x: x[0])
+        for _, targets in outgoing:
+            for next_state in targets:
+                if next_state not in visited:
+                    visited.add(next_state)
+                    name = f"q{count}"
+                    count += 1
+                    mapping[next_state] = name
+                    next_state.name = name
+                    queue.append(next_state)
+    nfa.states = visited
+    return nfa
+
+def build_regex_nfa(regex_text):
+    validate_regex(regex_text.strip())
+    regex = insert_concatenation(regex_text.strip())
+    postfix = to_postfix(regex)
+    State._id = 0
+    nfa = regex_to_nfa(postfix)
+    normalize_nfa(nfa)
+    return nfa
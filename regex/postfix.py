@@ -1,10 +1,17 @@
+from core.metrics import timed
+
+OPERATORS = ("|", "*", ".", "(", ")")
+
+@timed("to_postfix")
 def to_postfix(regex):
+    # regex: the token list from insert_concatenation. Returns the postfix
+    # token list.
     precedence = {"*": 3, ".": 2, "|": 1}
     output = []
     stack = []
 
     for char in regex:
-        if char.isalnum():
+        if char not in OPERATORS:
             output.append(char)
         elif char == "(":
             stack.append(char)
@@ -21,4 +28,4 @@ def to_postfix(regex):
     while stack:
         output.append(stack.pop())
 
-    return "".join(output)
+    return output
@@ -1,13 +1,46 @@
+from regex.charclass import parse_class
+
+
+def scan_tokens(regex):
+    # (position, token) pairs: operators and literal characters are one
+    # character; "\x" (an escaped character) and "[...]" (a character
+    # class) are single operand tokens.
+    tokens = []
+    i = 0
+    while i < len(regex):
+        char = regex[i]
+        if char == "\\":
+            if i + 1 >= len(regex):
+                raise ValueError(f"Dangling escape at position {i}")
+            tokens.append((i, regex[i:i + 2]))
+            i += 2
+        elif char == "[":
+            end = i + 1
+            while end < len(regex) and regex[end] != "]":
+                end += 2 if regex[end] == "\\" else 1
+            if end >= len(regex):
+                raise ValueError(f"Unterminated character class at position {i}")
+            if end == i + 1:
+                raise ValueError(f"Empty character class at position {i}")
+            parse_class(regex[i:end + 1])
+            tokens.append((i, regex[i:end + 1]))
+            i = end + 1
+        else:
+            tokens.append((i, char))
+            i += 1
+    return tokens
+
+
 def insert_concatenation(regex):
-    result = ""
-    operators = set("|*()")
-    for i in range(len(regex)):
-        c1 = regex[i]
-        result += c1
-
-        if i + 1 < len(regex):
-            c2 = regex[i + 1]
-            if (c1 not in "|(." and
-                c2 not in "|)*."):
-                result += "."
+    tokens = [token for _, token in scan_tokens(regex)]
+    result = []
+    for i in range(len(tokens)):
+        c1 = tokens[i]
+        result.append(c1)
+
+        if i + 1 < len(tokens):
+            c2 = tokens[i + 1]
+            if (c1 not in ("|", "(", ".") and
+                c2 not in ("|", ")", "*", ".")):
+                result.append(".")
     return result
@@ -1,5 +1,7 @@
 from core.state import State
 from automata.nfa import NFA
+from automata.alphabet import assign_symbol_classes
+from core.metrics import timed
 
 class Fragment:
 
@@ -7,6 +9,7 @@ class Fragment:
         self.start = start
         self.accepts = accepts
 
+@timed("regex_to_nfa")
 def regex_to_nfa(postfix_tokens):
     stack = []
     
@@ -95,7 +98,9 @@ def regex_to_nfa(postfix_tokens):
             nfa.states.add(s_start)
             nfa.states.add(s_end)
             
-            nfa.add_transition(s_start, token, s_end)
+            # "\x" reads x; "[...]" stays a class label for now.
+            label = token[1] if token.startswith("\\") else token
+            nfa.add_transition(s_start, label, s_end)
             
             stack.append(Fragment(s_start, {s_end}))
             
@@ -106,4 +111,4 @@ def regex_to_nfa(postfix_tokens):
     nfa.start_state = final_fragment.start
     nfa.accept_states = final_fragment.accepts
     
-    return nfa
+    return assign_symbol_classes(nfa)
@@ -1,62 +1,72 @@
-import string
+from core.metrics import timed
+from regex.charclass import RESERVED
+from regex.regex_parser import scan_tokens
 
+@timed("validate_regex")
 def validate_regex(regex: str) -> bool:
 
     if not regex:
         raise ValueError("Empty regular expression")
 
-    valid_chars = set(string.ascii_letters + string.digits + "|*()")
-    for i, char in enumerate(regex):
-        if char not in valid_chars:
+    # Letters and digits (any script), "\x" for any other single character,
+    # and "[...]" classes; scan_tokens checks escapes and classes.
+    tokens = scan_tokens(regex)
+    for i, token in tokens:
+        if token in ("|", "*", "(", ")") or token.startswith("["):
+            continue
+        char = token[-1]
+        if char in RESERVED:
+            raise ValueError(f"Reserved character '{char}' at position {i}")
+        if len(token) == 1 and not char.isalnum():
             raise ValueError(f"Illegal character '{char}' at position {i}")
 
     balance = 0
-    for i, char in enumerate(regex):
-        if char == '(':
+    for k, (i, token) in enumerate(tokens):
+        if token == '(':
             balance += 1
 
-            if i + 1 < len(regex) and regex[i+1] == ')':
+            if k + 1 < len(tokens) and tokens[k+1][1] == ')':
                 raise ValueError(f"Empty parentheses '()' at position {i}")
-        elif char == ')':
+        elif token == ')':
             balance -= 1
             if balance < 0:
                 raise ValueError(f"Unmatched closing parenthesis at position {i}")
-    
+
     if balance != 0:
         raise ValueError("Unmatched opening parenthesis")
 
     # 3. Operator Placement Rules
 
-    if regex[0] == '|':
+    if tokens[0][1] == '|':
         raise ValueError("Union operator '|' cannot be at the start")
-    if regex[-1] == '|':
+    if tokens[-1][1] == '|':
         raise ValueError("Union operator '|' cannot be at the end")
 
 
-    if regex[0] == '*':
+    if tokens[0][1] == '*':
         raise ValueError("Kleene star '*' cannot be at the start")
 
-    for i, char in enumerate(regex):
+    for k, (i, token) in enumerate(tokens):
 
-        prev = regex[i-1] if i > 0 else None
-        next_char = regex[i+1] if i < len(regex) - 1 else None
+        prev = tokens[k-1][1] if k > 0 else None
+        next_token = tokens[k+1][1] if k < len(tokens) - 1 else None
 
-        if char == '|':
+        if token == '|':
             if prev == '(':
                 raise ValueError(f"Union operator '|' cannot immediately follow '(' at position {i}")
-            if next_char == ')':
+            if next_token == ')':
                 raise ValueError(f"Union operator '|' cannot immediately precede ')' at position {i}")
-            if next_char == '|':
+            if next_token == '|':
                 raise ValueError(f"Double union operator '||' at position {i}")
-            if next_char == '*':
+            if next_token == '*':
                 raise ValueError(f"Invalid sequence '|*' at position {i}")
 
-        if char == '*':
+        if token == '*':
 
             if prev in ['(', '|']:
                 raise ValueError(f"Kleene star '*' cannot follow '{prev}' at position {i}")
 
-            if next_char == '*':
+            if next_token == '*':
                 raise ValueError(f"Double Kleene star '**' at position {i}")
 
     return True
@@ -0,0 +1,133 @@
+from simulation.nfa_simulator import epsilon_closure
+from core.metrics import timed
+
+# Trace-free NFA simulation on bitmasks. Only states that read a symbol
+# ("positions") and accept states get a bit; the active set is one int
+# holding the ε-closure of everything reached so far, restricted to them.
+#
+# When every position reads exactly one symbol (Thompson NFAs), reading a
+# is follow(active & B[a]): B[a] masks the positions reading a, and follow
+# ORs the ε-closed successors of each set bit. follow is split into a
+# Shift-And part, (x & SHIFT) << 1 for positions whose successors include
+# the next bit, and byte-chunk table lookups for the remaining edges. Other
+# NFAs use chunk tables per symbol. Tables fill in lazily, per chunk value
+# actually seen, so they stay small for large NFAs.
+
+CHUNK = 8
+CHUNK_MASK = (1 << CHUNK) - 1
+
+
+class ChunkTable:
+    # follow(x) = OR of targets[i] over the set bits i of x, one table
+    # lookup per non-zero byte of x.
+    def __init__(self, targets):
+        self.targets = targets
+        self.chunks = {}
+
+    def __call__(self, x):
+        result = 0
+        while x:
+            chunk = ((x & -x).bit_length() - 1) // CHUNK
+            shift = chunk * CHUNK
+            byte = (x >> shift) & CHUNK_MASK
+            x ^= byte << shift
+            table = self.chunks.setdefault(chunk, {})
+            mask = table.get(byte)
+            if mask is None:
+                mask = 0
+                for bit in range(CHUNK):
+                    if byte >> bit & 1:
+                        mask |= self.targets.get(shift + bit, 0)
+                table[byte] = mask
+            result |= mask
+        return result
+
+
+class BitNFA:
+    def __init__(self, nfa):
+        symbols = {}
+        for (state, symbol), targets in nfa.transitions.items():
+            if symbol is not None and targets:
+                symbols.setdefault(state, {})[symbol] = targets
+        tracked = set(symbols) | set(nfa.accept_states)
+        order = sorted(tracked, key=lambda s: (len(s.name), s.name))
+        index = {s: i for i, s in enumerate(order)}
+        self.size = len(order)
+        self.classes = nfa.classes
+
+        closures = {}
+
+        def closure_mask(states):
+            mask = 0
+            for s in states:
+                if s not in closures:
+                    closed, _ = epsilon_closure(nfa, {s})
+                    closures[s] = sum(1 << index[t] for t in closed if t in index)
+                mask |= closures[s]
+            return mask
+
+        self.start = closure_mask({nfa.start_state})
+        self.accept = sum(1 << index[s] for s in nfa.accept_states)
+        self.alphabet = sorted({a for edges in symbols.values() for a in edges})
+
+        # follow[a][i]: the active bits after position i reads a.
+        follow = {a: {} for a in self.alphabet}
+        for state, edges in symbols.items():
+            for symbol, targets in edges.items():
+                follow[symbol][index[state]] = closure_mask(targets)
+
+        # reads[a]: the positions with an edge on a.
+        self.reads = {a: sum(1 << i for i in follow[a]) for a in self.alphabet}
+        self.positional = all(len(edges) == 1 for edges in symbols.values())
+        if self.positional:
+            merged = {i: mask for edges in follow.values() for i, mask in edges.items()}
+            self.shift = sum(1 << i for i, mask in merged.items() if mask >> (i + 1) & 1)
+            rest = {i: mask & ~(1 << (i + 1)) for i, mask in merged.items()}
+            rest = {i: mask for i, mask in rest.items() if mask}
+            self.other = sum(1 << i for i in rest)
+            self.table = ChunkTable(rest)
+        else:
+            self.tables = {a: ChunkTable(edges) for a, edges in follow.items()}
+
+    def step(self, active, symbol):
+        if self.positional:
+            x = active & self.reads.get(symbol, 0)
+            return ((x & self.shift) << 1) | self.table(x & self.other)
+        table = self.tables.get(symbol)
+        return table(active) if table is not None else 0
+
+    def execute(self, input_string):
+        # (accepted, characters read before the active set emptied, how
+        # many of those had at least one transition to take).
+        active = self.start
+        moved = 0
+        symbols = input_string if self.classes is None else map(self.classes.classify, input_string)
+        for i, char in enumerate(symbols):
+            if active & self.reads.get(char, 0):
+                moved += 1
+            active = self.step(active, char)
+            if not active:
+                return False, i + 1, moved
+        return bool(active & self.accept), len(input_string), moved
+
+    def run(self, input_string):
+        # (accepted, characters read before the active set emptied).
+        return self.execute(input_string)[:2]
+
+    def accepts(self, input_string):
+        return self.run(input_string)[0]
+
+
+def compile_nfa(nfa):
+    if isinstance(nfa, BitNFA):
+        return nfa
+    return BitNFA(nfa)
+
+
+@timed("simulate_nfa_bitparallel")
+def simulate_nfa_bitparallel(nfa, input_string, compiled=None):
+    # (accepted, length of simulate_nfa's history for the same run): the
+    # initial entry, a "consume" entry per character and an ε-closure entry
+    # per character that had a transition to take.
+    accepted, _, moved = (compiled or compile_nfa(nfa)).execute(input_string)
+    return accepted, 1 + len(input_string) + moved
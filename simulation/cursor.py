@@ -0,0 +1,98 @@
+from simulation.nfa_simulator import nfa_start, nfa_step, nfa_accepts
+from simulation.dfa_simulator import compile_dfa, dfa_start, dfa_step
+from simulation.pda_simulator import (
+    pda_start, pda_step, pda_accepts,
+    general_pda_start, general_pda_step, general_pda_accepts
+)
+
+# Incremental simulation for live typing. frames[i] is the configuration
+# after the first i characters, so appending k characters costs k steps and
+# backspacing is a pop; nothing is re-simulated from the start.
+
+
+class SimulationCursor:
+    def __init__(self, start, step, accepts, describe):
+        self._step = step
+        self._accepts = accepts
+        self._describe = describe
+        config, entries = start()
+        self.frames = [config]
+        self.text = []
+        self.initial = entries
+
+    @property
+    def position(self):
+        return len(self.text)
+
+    @property
+    def config(self):
+        return self.frames[-1]
+
+    def accepted(self):
+        return self._accepts(self.config)
+
+    def active(self):
+        return self._describe(self.config)
+
+    def append(self, chars):
+        entries = []
+        for char in chars:
+            config, new = self._step(self.config, char)
+            self.frames.append(config)
+            self.text.append(char)
+            entries.extend(new)
+        return entries
+
+    def backspace(self, count=1):
+        count = min(max(count, 0), len(self.text))
+        if count:
+            del self.frames[-count:]
+            del self.text[-count:]
+        return count
+
+
+def nfa_cursor(nfa):
+    return SimulationCursor(
+        lambda: nfa_start(nfa),
+        lambda states, char: nfa_step(nfa, states, char),
+        lambda states: nfa_accepts(nfa, states),
+        lambda states: sorted(s.name for s in states)
+    )
+
+
+def dfa_cursor(dfa_data, compiled=None):
+    compiled = compiled or compile_dfa(dfa_data)
+    table = compiled.table
+    accept = compiled.accept
+
+    def step(state, char):
+        # A dead DFA stays dead; later characters add no entries.
+        if state is None:
+            return None, []
+        state, entry = dfa_step(table, state, char, compiled.translate(char))
+        return state, [entry]
+
+    return SimulationCursor(
+        lambda: dfa_start(compiled),
+        step,
+        lambda state: state in accept,
+        lambda state: [] if state is None else [state]
+    )
+
+
+def pda_cursor(pda):
+    return SimulationCursor(
+        lambda: pda_start(pda),
+        lambda states, char: pda_step(pda, states, char),
+        lambda states: pda_accepts(pda, states),
+        lambda states: sorted(s.name for s in states)
+    )
+
+
+def general_pda_cursor(pda, accept_by_empty_stack=False):
+    return SimulationCursor(
+        lambda: general_pda_start(pda),
+        lambda configs, char: general_pda_step(pda, configs, char),
+        lambda configs: general_pda_accepts(pda, configs, accept_by_empty_stack),
+        lambda configs: sorted({state.name for state, _ in configs})
+    )
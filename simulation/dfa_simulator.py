@@ -1,40 +1,108 @@
-def simulate_dfa(dfa_data, input_string):
-    current_state = dfa_data["start"]
-    history = []
-    history.append({
-        "step": "initial",
-        "description": "Start",
-        "active": [current_state],
-        "transitions": []
-    })
-    
-    for char in input_string:
-        next_state = None
+from automata.alphabet import load_classes
+from core.metrics import timed
+
+class CompiledDFA:
+    def __init__(self, dfa_data):
+        self.start = dfa_data["start"]
+        self.accept = set(dfa_data["accept"])
+        self.classes = load_classes(dfa_data)
+        self.table = {}
         for t in dfa_data["transitions"]:
-            if t["from"] == current_state and t["symbol"] == char:
-                next_state = t["to"]
+            self.table.setdefault((t["from"], t["symbol"]), t["to"])
+
+    def translate(self, text):
+        # Input as table symbols: class representatives when the DFA has them.
+        return text if self.classes is None else self.classes.translate(text)
+
+    def run(self, input_string):
+        # Trace-free run: (accepted, number of characters consumed).
+        table = self.table
+        state = self.start
+        for i, char in enumerate(self.translate(input_string)):
+            state = table.get((state, char))
+            if state is None:
+                return False, i
+        return state in self.accept, len(input_string)
+
+    def match(self, text, pos=0):
+        # End of the longest accepted prefix of text[pos:], or -1.
+        table = self.table
+        state = self.start
+        end = pos if state in self.accept else -1
+        classify = self.classes.classify if self.classes is not None else None
+        for i in range(pos, len(text)):
+            char = text[i] if classify is None else classify(text[i])
+            state = table.get((state, char))
+            if state is None:
                 break
-        if next_state:
-            history.append({
-                "step": "move",
-                "char": char,
-                "description": f"Read '{char}' -> {next_state}",
-                "active": [next_state],
-                "transitions": [{
-                    "from": current_state, 
-                    "to": next_state, 
-                    "symbol": char
-                }]
-            })
-            current_state = next_state
+            if state in self.accept:
+                end = i + 1
+        return end
+
+
+def find_matches(compiled, text):
+    # Leftmost-longest, non-overlapping, non-empty matches as (start, end).
+    pos = 0
+    while pos < len(text):
+        end = compiled.match(text, pos)
+        if end > pos:
+            yield pos, end
+            pos = end
         else:
-            history.append({
-                "step": "dead",
-                "char": char,
-                "description": f"No transition for '{char}' (Dead)",
-                "active": [],
-                "transitions": []
-            })
+            pos += 1
+
+
+def compile_dfa(dfa_data):
+    # Already compiled (a CompiledDFA, or a MappedDFA loaded from a file).
+    if not isinstance(dfa_data, dict):
+        return dfa_data
+    return CompiledDFA(dfa_data)
+
+
+def dfa_step(table, current_state, char, symbol=None):
+    # symbol: the table symbol for char (its class representative), if not char.
+    symbol = char if symbol is None else symbol
+    next_state = table.get((current_state, symbol))
+    if next_state:
+        return next_state, {
+            "step": "move",
+            "char": char,
+            "description": f"Read '{char}' -> {next_state}",
+            "active": [next_state],
+            "transitions": [{
+                "from": current_state,
+                "to": next_state,
+                "symbol": symbol
+            }]
+        }
+    return None, {
+        "step": "dead",
+        "char": char,
+        "description": f"No transition for '{char}' (Dead)",
+        "active": [],
+        "transitions": []
+    }
+
+
+def dfa_start(compiled):
+    return compiled.start, [{
+        "step": "initial",
+        "description": "Start",
+        "active": [compiled.start],
+        "transitions": []
+    }]
+
+
+@timed("simulate_dfa")
+def simulate_dfa(dfa_data, input_string, compiled=None):
+    # dfa_data: a DFA dict, or a compiled or mapped DFA.
+    compiled = compiled or compile_dfa(dfa_data)
+    table = compiled.table
+    current_state, history = dfa_start(compiled)
+    for char, symbol in zip(input_string, compiled.translate(input_string)):
+        current_state, entry = dfa_step(table, current_state, char, symbol)
+        history.append(entry)
+        if current_state is None:
             return False, history
-    accepted = current_state in dfa_data["accept"]
+    accepted = current_state in compiled.accept
     return accepted, history
@@ -0,0 +1,276 @@
+import multiprocessing
+import os
+import queue
+import signal
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import nullcontext
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+from core.limits import LimitExceeded, Cancelled, resolve_limits, use_limits
+from core.metrics import count, record, recording
+from core.profiling import profiling, profiled_block, profile_requested, add_profiles
+
+# Managed pool of worker processes for CPU-bound jobs. Unlike a plain
+# ProcessPoolExecutor, a job that overruns its deadline or whose client
+# went away is stopped by killing its worker, which is then replaced.
+
+MAX_WORKERS = int(os.environ.get("TOC_WORKERS", os.cpu_count() or 2))
+POLL_INTERVAL = 0.05
+EXIT_WAIT = 1.0
+STREAM_CHUNK = 256
+
+# How a worker dies when an allocation fails outside Python's MemoryError
+# handling (in C code under RLIMIT_AS) or the kernel's OOM killer picks it.
+MEMORY_SIGNALS = {-signal.SIGKILL, -signal.SIGSEGV, -signal.SIGABRT}
+
+_pool = None
+
+
+class WorkerError(Exception):
+    # The pool failed to run a job for a reason other than a limit: the
+    # worker crashed, or the job could not be sent to it.
+    pass
+
+
+def _max_rss_kb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 if sys.platform == "darwin" else peak
+
+
+def measured(fn, *args, memory=False):
+    # Times one call. With memory, the same call runs under tracemalloc and
+    # reports its exact peak allocation (the wall time then includes the
+    # tracing overhead); otherwise the peak is how far the call raised the
+    # worker's maximum RSS, which is free to read but 0 when the job fits in
+    # memory the worker already had.
+    if memory:
+        tracemalloc.start()
+    else:
+        rss = _max_rss_kb()
+    try:
+        start = time.perf_counter()
+        result = fn(*args)
+        elapsed = time.perf_counter() - start
+        if memory:
+            peak_kb = tracemalloc.get_traced_memory()[1] / 1024
+        else:
+            after = _max_rss_kb()
+            peak_kb = None if rss is None else after - rss
+    finally:
+        if memory:
+            tracemalloc.stop()
+    return result, {
+        "wall_time_ms": round(elapsed * 1000, 3),
+        "peak_memory_kb": None if peak_kb is None else round(peak_kb, 1)
+    }
+
+
+def _address_space():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[0]) * resource.getpagesize()
+    except OSError:
+        return None
+
+
+class _MemoryLimit:
+    # RLIMIT_AS of the worker, set to its current size plus the budget.
+    def __init__(self, megabytes):
+        self.megabytes = megabytes
+        self.saved = None
+
+    def __enter__(self):
+        if resource is None:
+            return
+        size = _address_space()
+        if size is None:
+            return
+        soft, hard = resource.getrlimit(resource.RLIMIT_AS)
+        limit = size + self.megabytes * 1024 * 1024
+        if hard != resource.RLIM_INFINITY:
+            limit = min(limit, hard)
+        resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
+        self.saved = (soft, hard)
+
+    def __exit__(self, *exc):
+        if self.saved is not None:
+            resource.setrlimit(resource.RLIMIT_AS, self.saved)
+
+
+def _serve(conn):
+    while True:
+        try:
+            fn, args, limits, profile, stream = conn.recv()
+        except (EOFError, OSError):
+            return
+        with recording() as records, (profiling() if profile else nullcontext([])) as profiles:
+            try:
+                with use_limits(limits), _MemoryLimit(limits["max_memory_mb"]), profiled_block():
+                    if stream:
+                        # fn is a generator: its items go back in chunks as
+                        # they are produced, the rest with the final reply.
+                        # A full pipe blocks the worker until they are read.
+                        items = []
+                        for item in fn(*args):
+                            items.append(item)
+                            if len(items) >= STREAM_CHUNK:
+                                conn.send(("chunk", items))
+                                items = []
+                        reply = ("ok", items)
+                    else:
+                        reply = ("ok", fn(*args))
+            except MemoryError:
+                reply = ("error", LimitExceeded("max_memory_mb", limits["max_memory_mb"]))
+            except Exception as e:
+                reply = ("error", e)
+        try:
+            conn.send(reply + (records, profiles))
+        except Exception as e:
+            # The result (or the exception) does not pickle.
+            failure = reply[1] if reply[0] == "error" else e
+            conn.send(("error", RuntimeError(f"{type(failure).__name__}: {failure}"), records, profiles))
+
+
+class _Worker:
+    def __init__(self, ctx):
+        self.conn, child = ctx.Pipe()
+        self.process = ctx.Process(target=_serve, args=(child,), daemon=True)
+        self.process.start()
+        child.close()
+
+    def kill(self):
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+    def exit_code(self):
+        # Exit code (negative: signal) of a worker whose pipe closed.
+        self.process.join(EXIT_WAIT)
+        return self.process.exitcode
+
+
+class WorkerPool:
+    def __init__(self, size=MAX_WORKERS):
+        self.size = size
+        methods = multiprocessing.get_all_start_methods()
+        self._ctx = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._workers = 0
+
+    def _acquire(self, deadline, timeout):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._workers < self.size:
+                self._workers += 1
+                try:
+                    return _Worker(self._ctx)
+                except BaseException:
+                    self._workers -= 1
+                    raise
+        try:
+            return self._idle.get(timeout=max(deadline - time.monotonic(), 0))
+        except queue.Empty:
+            raise LimitExceeded("timeout", timeout, "Timed out waiting for a free worker")
+
+    def _discard(self, worker):
+        worker.kill()
+        with self._lock:
+            self._workers -= 1
+
+    def run(self, fn, args=(), limits=None, cancelled=None):
+        # Runs fn(*args) in a worker. Raises LimitExceeded on deadline or
+        # when the worker dies of memory exhaustion, Cancelled when
+        # cancelled() turns true, WorkerError when the worker crashes or the
+        # job cannot be sent; exceptions raised by fn are re-raised here.
+        # Metrics recorded and profiles taken by the job are merged into the
+        # caller's.
+        try:
+            next(self._exchange(fn, args, limits, cancelled, False))
+        except StopIteration as done:
+            return done.value
+
+    def stream(self, fn, args=(), limits=None, cancelled=None):
+        # Runs the generator fn(*args) in a worker and yields its items in
+        # lists of up to STREAM_CHUNK as they arrive. Errors are raised as by
+        # run; the deadline covers the whole stream. Closing the iterator
+        # early kills the worker.
+        rest = yield from self._exchange(fn, args, limits, cancelled, True)
+        if rest:
+            yield rest
+
+    def _exchange(self, fn, args, limits, cancelled, stream):
+        # Yields the chunks of a streamed job and returns its final payload.
+        limits = resolve_limits(limits)
+        deadline = time.monotonic() + limits["timeout"]
+        worker = self._acquire(deadline, limits["timeout"])
+        try:
+            worker.conn.send((fn, args, limits, profile_requested(), stream))
+            while True:
+                while not worker.conn.poll(POLL_INTERVAL):
+                    if cancelled is not None and cancelled():
+                        raise Cancelled()
+                    if time.monotonic() >= deadline:
+                        raise LimitExceeded("timeout", limits["timeout"], f"Timed out after {limits['timeout']} s")
+                message = worker.conn.recv()
+                if message[0] != "chunk":
+                    break
+                yield message[1]
+            status, payload, records, profiles = message
+        except (EOFError, OSError):
+            code = worker.exit_code()
+            self._discard(worker)
+            if code in MEMORY_SIGNALS:
+                count("toc_worker_jobs_total", outcome="died")
+                raise LimitExceeded("max_memory_mb", limits["max_memory_mb"],
+                                    f"Worker died (signal {-code}, out of memory?)")
+            count("toc_worker_jobs_total", outcome="crashed")
+            raise WorkerError(f"Worker exited unexpectedly (exit code {code})")
+        except (Cancelled, LimitExceeded) as e:
+            self._discard(worker)
+            count("toc_worker_jobs_total", outcome="cancelled" if isinstance(e, Cancelled) else "timeout")
+            raise
+        except Exception as e:
+            # Typically the job's function or arguments do not pickle.
+            self._discard(worker)
+            count("toc_worker_jobs_total", outcome="failed")
+            raise WorkerError(f"Could not run job: {type(e).__name__}: {e}") from e
+        except BaseException:
+            # Includes a stream closed before its end: the worker is still
+            # busy with the job.
+            self._discard(worker)
+            raise
+        self._idle.put(worker)
+        record(records)
+        add_profiles(profiles)
+        count("toc_worker_jobs_total", outcome=status)
+        if status == "error":
+            raise payload
+        return payload
+
+    def shutdown(self):
+        while True:
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            self._discard(worker)
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        _pool = WorkerPool()
+    return _pool
@@ -1,4 +1,5 @@
 from core.state import State
+from core.metrics import timed
 
 def epsilon_closure(nfa, states):
     stack = list(states)
@@ -35,46 +36,44 @@ def move(nfa, states, symbol):
                 })
     return next_states, transitions
 
-def simulate_nfa(nfa, input_string):
-    history = []
-    # 1. Initial State
-    start_node = nfa.start_state
-    # 2. Initial Epsilon Closure
-    current_states, initial_epsilon_trans = epsilon_closure(nfa, {start_node})
-    history.append({
+def nfa_start(nfa):
+    current_states, transitions = epsilon_closure(nfa, {nfa.start_state})
+    return current_states, [{
         "step": "initial",
         "description": "Start & Initial ε-closure",
         "active": [s.name for s in current_states],
-        "transitions": initial_epsilon_trans
-    })
-    # 3. Process Input
-    for char in input_string:
-        move_dest, move_trans = move(nfa, current_states, char)
-        next_active, epsilon_trans = epsilon_closure(nfa, move_dest)
-        history.append({
-            "step": "consume",
-            "char": char,
-            "description": f"Consume '{char}'",
-            "active": [s.name for s in move_dest],
-            "transitions": move_trans
+        "transitions": transitions
+    }]
+
+def nfa_step(nfa, current_states, char):
+    # One input character: move, then ε-closure. Returns the new active
+    # set and the history entries for this character.
+    symbol = nfa.classes.classify(char) if nfa.classes is not None else char
+    move_dest, move_trans = move(nfa, current_states, symbol)
+    next_active, epsilon_trans = epsilon_closure(nfa, move_dest)
+    entries = [{
+        "step": "consume",
+        "char": char,
+        "description": f"Consume '{char}'",
+        "active": [s.name for s in move_dest],
+        "transitions": move_trans
+    }]
+    if epsilon_trans or len(move_dest) > 0:
+        entries.append({
+            "step": "epsilon",
+            "description": f"ε-closure after '{char}'",
+            "active": [s.name for s in next_active],
+            "transitions": epsilon_trans
         })
-        if epsilon_trans or len(move_dest) > 0:
-             history.append({
-                "step": "epsilon",
-                "description": f"ε-closure after '{char}'",
-                "active": [s.name for s in next_active],
-                "transitions": epsilon_trans
-            })
-        else:
-             if not epsilon_trans and not move_trans:
-                  pass
-             elif not epsilon_trans:
-                   history.append({
-                    "step": "epsilon",
-                     "description": "State Update",
-                    "active": [s.name for s in next_active],
-                    "transitions": []
-                })
-        current_states = next_active
-    accepted = any(s in nfa.accept_states for s in current_states)    
-    return accepted, history
+    return next_active, entries
+
+def nfa_accepts(nfa, current_states):
+    return any(s in nfa.accept_states for s in current_states)
+
+@timed("simulate_nfa")
+def simulate_nfa(nfa, input_string):
+    current_states, history = nfa_start(nfa)
+    for char in input_string:
+        current_states, entries = nfa_step(nfa, current_states, char)
+        history.extend(entries)
+    return nfa_accepts(nfa, current_states), history
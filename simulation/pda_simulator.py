@@ -1,90 +1,175 @@
-def simulate_pda(pda, input_string):
-    def epsilon_closure(states):
-        stack = list(states)
-        closure = set(states)
-        transitions = []
-        while stack:
-            s = stack.pop()
-            key = (s, None, "Z0")
-            if key in pda.transitions:
-                targets = pda.transitions[key]
-                for (t, push) in targets:
-                    if t not in closure:
-                        closure.add(t)
-                        stack.append(t)
-                        transitions.append({
-                            "from": s.name,
-                            "to": t.name,
-                            "label": "ε, Z0 → Z0",
-                            "read": "ε",
-                            "pop": "Z0",
-                            "push": "Z0"
-                        })
-        return closure, transitions
-
-    def move(states, char):
-        next_states = set()
-        transitions = []        
-        for s in states:
-            key = (s, char, "Z0")
-            if key in pda.transitions:
-                targets = pda.transitions[key]
-                for (t, push) in targets:
-                    next_states.add(t)
+from core.metrics import timed
+
+def _pda_closure(pda, states):
+    stack = list(states)
+    closure = set(states)
+    transitions = []
+    while stack:
+        s = stack.pop()
+        key = (s, None, "Z0")
+        if key in pda.transitions:
+            targets = pda.transitions[key]
+            for (t, push) in targets:
+                if t not in closure:
+                    closure.add(t)
+                    stack.append(t)
                     transitions.append({
                         "from": s.name,
                         "to": t.name,
-                        "label": f"{char}, Z0 → Z0",
-                        "read": char,
+                        "label": "ε, Z0 → Z0",
+                        "read": "ε",
                         "pop": "Z0",
                         "push": "Z0"
                     })
-        return next_states, transitions
-    
-    history = []
-    start_node = pda.start_state
-    current_states, initial_epsilon = epsilon_closure({start_node})
-    history.append({
+    return closure, transitions
+
+def _pda_move(pda, states, char):
+    next_states = set()
+    transitions = []
+    for s in states:
+        key = (s, char, "Z0")
+        if key in pda.transitions:
+            targets = pda.transitions[key]
+            for (t, push) in targets:
+                next_states.add(t)
+                transitions.append({
+                    "from": s.name,
+                    "to": t.name,
+                    "label": f"{char}, Z0 → Z0",
+                    "read": char,
+                    "pop": "Z0",
+                    "push": "Z0"
+                })
+    return next_states, transitions
+
+def pda_start(pda):
+    current_states, initial_epsilon = _pda_closure(pda, {pda.start_state})
+    return current_states, [{
         "step": "initial",
         "description": "Start & Initial ε-closure",
         "active": [s.name for s in current_states],
         "transitions": initial_epsilon,
         "stack": ["Z0"]
-    })
-    # 2. Process Input
-    for char in input_string:
-        move_dest, move_trans = move(current_states, char)
-        next_active, epsilon_trans = epsilon_closure(move_dest)
-        history.append({
-            "step": "consume",
-            "char": char,
-            "description": f"Consume '{char}'",
-            "active": [s.name for s in move_dest],
-            "transitions": move_trans,
+    }]
+
+def pda_step(pda, current_states, char):
+    symbol = pda.classes.classify(char) if pda.classes is not None else char
+    move_dest, move_trans = _pda_move(pda, current_states, symbol)
+    next_active, epsilon_trans = _pda_closure(pda, move_dest)
+    entries = [{
+        "step": "consume",
+        "char": char,
+        "description": f"Consume '{char}'",
+        "active": [s.name for s in move_dest],
+        "transitions": move_trans,
+        "stack": ["Z0"]
+    }]
+    if epsilon_trans or (not epsilon_trans and not move_trans):
+        entries.append({
+            "step": "epsilon",
+            "description": f"ε-closure after '{char}'",
+            "active": [s.name for s in next_active],
+            "transitions": epsilon_trans,
             "stack": ["Z0"]
         })
-        if epsilon_trans or (not epsilon_trans and not move_trans):
-             history.append({
-                "step": "epsilon",
-                "description": f"ε-closure after '{char}'",
-                "active": [s.name for s in next_active],
-                "transitions": epsilon_trans,
-                "stack": ["Z0"]
+    else:
+        entries.append({
+            "step": "epsilon",
+            "description": "State Update",
+            "active": [s.name for s in next_active],
+            "transitions": [],
+            "stack": ["Z0"]
+        })
+    return next_active, entries
+
+def pda_accepts(pda, current_states):
+    return any(s in pda.accept_states for s in current_states)
+
+@timed("simulate_pda")
+def simulate_pda(pda, input_string):
+    current_states, history = pda_start(pda)
+    for char in input_string:
+        current_states, entries = pda_step(pda, current_states, char)
+        history.extend(entries)
+    return pda_accepts(pda, current_states), history
+
+# Configuration-set stepping for general PDAs (e.g. built from a CFG), used
+# for incremental simulation. A configuration is (state, stack tuple, top
+# last). ε-closure can grow the stack without bound, so it is cut off at
+# MAX_CONFIGS configurations and stacks deeper than MAX_STACK_DEPTH.
+MAX_CONFIGS = 5000
+MAX_STACK_DEPTH = 200
+
+def _general_moves(pda, config, char):
+    state, stack = config
+    if not stack:
+        return
+    top = stack[-1]
+    for target, push in pda.transitions.get((state, char, top), ()):
+        push_list = list(push) if push else []
+        yield target, stack[:-1] + tuple(reversed(push_list)), top, push_list
+
+def _general_closure(pda, configs):
+    closure = set(configs)
+    pending = list(configs)
+    transitions = []
+    truncated = False
+    while pending:
+        config = pending.pop()
+        for target, stack, top, push_list in _general_moves(pda, config, None):
+            new = (target, stack)
+            if new in closure:
+                continue
+            if len(stack) > MAX_STACK_DEPTH or len(closure) >= MAX_CONFIGS:
+                truncated = True
+                continue
+            closure.add(new)
+            pending.append(new)
+            transitions.append({
+                "from": config[0].name,
+                "to": target.name,
+                "label": f"ε, {top} → {''.join(push_list) if push_list else 'ε'}"
             })
-        else:
-             history.append({
-                "step": "epsilon",
-                "description": "State Update",
-                "active": [s.name for s in next_active],
-                "transitions": [],
-                "stack": ["Z0"]
-            })  
-        current_states = next_active
-
-    # 3. Acceptance
-    accepted = any(s in pda.accept_states for s in current_states)    
-    return accepted, history
+    return closure, transitions, truncated
+
+def _general_entry(step, char, description, configs, transitions, truncated):
+    entry = {
+        "step": step,
+        "description": description,
+        "active": sorted({state.name for state, _ in configs}),
+        "transitions": transitions,
+        "configurations": len(configs)
+    }
+    if char is not None:
+        entry["char"] = char
+    if truncated:
+        entry["truncated"] = True
+    return entry
+
+def general_pda_start(pda):
+    configs, transitions, truncated = _general_closure(pda, {(pda.start_state, (pda.start_stack_symbol,))})
+    return configs, [_general_entry("initial", None, "Start & ε-closure", configs, transitions, truncated)]
+
+def general_pda_step(pda, configs, char):
+    moved = set()
+    transitions = []
+    for config in configs:
+        for target, stack, top, push_list in _general_moves(pda, config, char):
+            moved.add((target, stack))
+            transitions.append({
+                "from": config[0].name,
+                "to": target.name,
+                "label": f"{char}, {top} → {''.join(push_list) if push_list else 'ε'}"
+            })
+    closure, epsilon_trans, truncated = _general_closure(pda, moved)
+    return closure, [_general_entry("consume", char, f"Consume '{char}' & ε-closure", closure, transitions + epsilon_trans, truncated)]
+
+def general_pda_accepts(pda, configs, accept_by_empty_stack=False):
+    if accept_by_empty_stack:
+        return any(not stack for _, stack in configs)
+    return any(state in pda.accept_states for state, _ in configs)
 
+@timed("simulate_general_pda")
 def simulate_general_pda(pda, input_string, accept_by_empty_stack=False):
     def format_stack(s):
         return list(s)
@@ -0,0 +1,200 @@
+from automata.tm import compile_tm, BLANK, WILDCARD, ACCEPT_STATE, REJECT_STATE
+from core.metrics import timed
+
+# Accelerated single-tape runner. The tape is held as run-length blocks on
+# both sides of the head (nearest block last), the way busy-beaver
+# simulators do it. When a transition keeps the state and moves in one
+# direction while reading symbol s, the machine will sweep the whole run of
+# s-cells in that direction writing the same symbol, so the run is applied
+# as one macro step. Step counts stay exact; only sampled keyframes are kept.
+
+
+def _push(stack, symbol, count):
+    if count <= 0:
+        return
+    if stack and stack[-1][0] == symbol:
+        stack[-1][1] += count
+    else:
+        stack.append([symbol, count])
+
+
+def _pop(stack):
+    # Right side: an empty stack is the infinite blank tape.
+    if not stack:
+        return BLANK
+    block = stack[-1]
+    block[1] -= 1
+    if block[1] == 0:
+        stack.pop()
+    return block[0]
+
+
+class RLETape:
+    def __init__(self, input_string):
+        self.left = []
+        self.right = []
+        self.head = 0
+        cells = list(input_string) or [BLANK]
+        self.current = cells[0]
+        for symbol in reversed(cells[1:]):
+            _push(self.right, symbol, 1)
+
+    def step(self, write, move):
+        if move == "R":
+            _push(self.left, write, 1)
+            self.current = _pop(self.right)
+            self.head += 1
+        elif move == "L" and self.left:
+            _push(self.right, write, 1)
+            self.current = _pop(self.left)
+            self.head -= 1
+        else:
+            # "S", or "L" against the left end of the tape.
+            self.current = write
+
+    def run_length(self, move):
+        # Cells the sweep would cover: the current cell plus the adjacent
+        # block of the same symbol in the direction of travel.
+        side = self.right if move == "R" else self.left
+        extra = side[-1][1] if side and side[-1][0] == self.current else 0
+        return 1 + extra
+
+    def sweep(self, write, move, count):
+        # Apply count consecutive identical steps (count <= run_length).
+        if move == "R":
+            _push(self.left, write, count)
+            side = self.right
+            if count > 1:
+                side[-1][1] -= count - 1
+                if side[-1][1] == 0:
+                    side.pop()
+            self.current = _pop(side)
+            self.head += count
+            return count
+        side = self.left
+        if count > 1:
+            side[-1][1] -= count - 1
+            if side[-1][1] == 0:
+                side.pop()
+        if side:
+            _push(self.right, write, count)
+            self.current = _pop(side)
+            self.head -= count
+        else:
+            # The sweep ran into the left end: the last move stays put.
+            _push(self.right, write, count - 1)
+            self.current = write
+            self.head -= count - 1
+        return count
+
+    def blank_beyond(self, move):
+        return move == "R" and self.current == BLANK and not self.right
+
+    def snapshot(self):
+        blocks = [list(b) for b in self.left] + [[self.current, 1]] + [list(b) for b in reversed(self.right)]
+        merged = []
+        for symbol, count in blocks:
+            _push(merged, symbol, count)
+        return merged
+
+    def window(self, radius=40):
+        cells = []
+        for symbol, count in reversed(self.left):
+            cells[:0] = [symbol] * min(count, radius - len(cells))
+            if len(cells) >= radius:
+                break
+        offset = self.head - len(cells)
+        cells.append(self.current)
+        for symbol, count in reversed(self.right):
+            cells.extend([symbol] * min(count, 2 * radius + 1 - len(cells)))
+            if len(cells) > 2 * radius:
+                break
+        return offset, "".join(cells)
+
+
+@timed("simulate_tm_accelerated")
+def run_tm_accelerated(tm, input_string, max_steps=10 ** 9, keyframes=200):
+    compiled = compile_tm(tm)
+    if compiled.tapes != 1:
+        raise ValueError("Accelerated mode supports single-tape machines only")
+
+    tape = RLETape(input_string)
+    state = compiled.start
+    steps = 0
+    macro_steps = 0
+    every = 1
+    frames = []
+    verdict = None
+
+    def keyframe(description):
+        offset, cells = tape.window()
+        frames.append({
+            "step": steps,
+            "state": state,
+            "tape": cells,
+            "tape_offset": offset,
+            "tape_rle": tape.snapshot(),
+            "head": tape.head,
+            "description": description,
+            "active": [state],
+            "transitions": []
+        })
+
+    keyframe("Initial State")
+    next_frame = every
+    while True:
+        if state == ACCEPT_STATE or state == REJECT_STATE:
+            verdict = "accept" if state == ACCEPT_STATE else "reject"
+            break
+        if steps >= max_steps:
+            verdict = "step_limit"
+            break
+        read = tape.current
+        entry = compiled.lookup(state, (read,))
+        if entry is None:
+            verdict = "reject"
+            state = "REJECTED (No Transition)"
+            break
+        to, (write,), (move,), _ = entry
+        if write == WILDCARD:
+            write = read
+        if to == state and (tape.blank_beyond(move) or (
+                write == read and (move not in ("R", "L") or (move == "L" and not tape.left)))):
+            # Same state forever: sweeping into endless blank tape, or
+            # rewriting the same cell in place / against the left end.
+            verdict = "loop_detected"
+            break
+        if to == state and move in ("R", "L"):
+            count = min(tape.run_length(move), max_steps - steps)
+            tape.sweep(write, move, count)
+            steps += count
+        else:
+            tape.step(write, move)
+            steps += 1
+        state = to
+        macro_steps += 1
+        if steps >= next_frame:
+            keyframe(f"Read '{read}' → '{write}', {move}")
+            if len(frames) > keyframes:
+                # Keep the trace bounded: halve the sampling rate.
+                frames = frames[::2]
+                every *= 2
+            next_frame = (steps // every + 1) * every
+
+    description = {
+        "accept": "Halt & Accept",
+        "reject": "Halt & Reject",
+        "step_limit": f"Stopped after {max_steps} steps",
+        "loop_detected": f"{state} repeats the same move forever -> Halt (loop)"
+    }[verdict]
+    keyframe(description)
+    return {
+        "accepted": verdict == "accept",
+        "verdict": verdict,
+        "steps": frames,
+        "metrics": {
+            "execution_steps": steps,
+            "macro_steps": macro_steps,
+            "keyframes": len(frames)
+        }
+    }
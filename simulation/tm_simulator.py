@@ -1,14 +1,85 @@
-def simulate_tm(tm, input_string):
+from automata.tm import compile_tm, BLANK, WILDCARD, ACCEPT_STATE, REJECT_STATE
+from core.limits import get_limit
+from core.metrics import timed
+
+
+def step_loop(compiled, tapes, heads, state, max_steps, halting):
+    # Shared k-tape step loop. Tapes and heads are updated in place; yields
+    # (previous state, symbols read, transition entry, symbols written) per
+    # step, or an entry of None when no transition applies.
+    k = compiled.tapes
+    blank = compiled.blank
+    lookup = compiled.lookup
+    steps = 0
+    while steps < max_steps and state not in halting:
+        steps += 1
+        for i in range(k):
+            if heads[i] >= len(tapes[i]):
+                tapes[i].append(blank)
+        reads = tuple(tapes[i][heads[i]] for i in range(k))
+        entry = lookup(state, reads)
+        if entry is None:
+            yield state, reads, None, None
+            return
+        to, writes, moves, _ = entry
+        written = tuple(r if w == WILDCARD else w for r, w in zip(reads, writes))
+        for i in range(k):
+            tapes[i][heads[i]] = written[i]
+            if moves[i] == "R":
+                heads[i] += 1
+            elif moves[i] == "L" and heads[i] > 0:
+                heads[i] -= 1
+        prev_state = state
+        state = to
+        yield prev_state, reads, entry, written
+
+
+def step_bound(max_steps):
+    # The active max_steps limit, lowered further by the caller's bound.
+    limit = get_limit("max_steps")
+    return limit if max_steps is None else min(max_steps, limit)
+
+
+def config_key(state, head, tape):
+    # Canonical configuration: the left end of the tape is fixed, so only
+    # trailing blanks are trimmed.
+    end = len(tape)
+    while end > 0 and tape[end - 1] == BLANK:
+        end -= 1
+    return (state, head, tuple(tape[:end]))
+
+
+@timed("simulate_tm")
+def simulate_tm(tm, input_string, detect_loops=False, max_steps=None):
+    compiled = compile_tm(tm)
+    max_steps = step_bound(max_steps)
     tape = list(input_string) if input_string else []
     if not tape:
         tape = ["_"]
     head = 0
-    current_state = tm["start"]
+    current_state = compiled.start
     history = []
     step_count = 0
-    MAX_STEPS = 5000
-    ACCEPT_STATE = "q_accept"
-    REJECT_STATE = "q_reject"
+    halting = (ACCEPT_STATE, REJECT_STATE)
+
+    # Loop detection state: Brent's cycle finding over exact configurations,
+    # plus "sweeps" into untouched blank tape. A sweep record (head, step) for
+    # a state means everything from head rightwards was blank at that step;
+    # seeing the same state again at or right of it, without having moved
+    # left of it since, means the run repeats (shifted) forever.
+    checkpoint = config_key(current_state, head, tape) if detect_loops else None
+    power, lam = 1, 0
+    rightmost = max((i for i, c in enumerate(tape) if c != BLANK), default=-1)
+    sweeps = {}
+
+    def runaway():
+        if head > rightmost:
+            record = sweeps.get(current_state)
+            if record and record[0] <= head:
+                return step_count - record[1]
+            sweeps.setdefault(current_state, (head, step_count))
+        return None
+
     history.append({
         "step": step_count,
         "state": current_state,
@@ -19,24 +90,13 @@ def simulate_tm(tm, input_string):
         "active": [current_state],
         "transitions": []
     })
-    while step_count < MAX_STEPS:
-        if current_state == ACCEPT_STATE or current_state == REJECT_STATE:
-            break
+    if detect_loops and current_state not in halting:
+        runaway()
+    heads = [head]
+    for prev_state, reads, entry, written in step_loop(compiled, [tape], heads, current_state, max_steps, halting):
         step_count += 1
-        # 1. Read Symbol
-        if head < len(tape) and head >= 0:
-            char_read = tape[head]
-        else:
-            char_read = "_"
-            if head >= len(tape):
-                tape.append("_")
-        # 2. Find Transition
-        transition = None
-        for t in tm["transitions"]:
-            if t["from"] == current_state and t["read"] == char_read:
-                transition = t
-                break
-        if not transition:
+        char_read = reads[0]
+        if entry is None:
             history.append({
                 "step": step_count,
                 "state": "REJECTED (No Transition)",
@@ -47,32 +107,110 @@ def simulate_tm(tm, input_string):
                 "transitions": []
             })
             return False, history
-        # 3. Apply Transition
-        tape[head] = transition["write"]        
-        direction = transition["move"]
-        if direction == "R":
-            head += 1
-        elif direction == "L":
-            head -= 1
-            if head < 0: head = 0
-        prev_state = current_state
-        current_state = transition["to"]
+        written_at = head
+        head = heads[0]
+        direction = entry[2][0]
+        current_state = entry[0]
         history.append({
             "step": step_count,
             "state": current_state,
             "tape": "".join(tape),
             "head": head,
-            "description": f"Read '{transition['read']}' → '{transition['write']}', {direction}",
+            "description": f"Read '{char_read}' → '{written[0]}', {direction}",
             "active": [current_state],
             "transitions": [{
                 "from": prev_state,
                 "to": current_state,
-                "label": f"{transition['read']} → {transition['write']}, {direction}"
+                "label": f"{char_read} → {written[0]}, {direction}"
             }]
         })
-        if current_state == ACCEPT_STATE:
-            break
-        if current_state == REJECT_STATE:
-            break
+        if current_state in halting or not detect_loops:
+            continue
+        if written[0] != BLANK:
+            rightmost = max(rightmost, written_at)
+        if direction == "L" and sweeps:
+            # Keep only records left of the written cell: a left move clamped
+            # at cell 0 still leaves that cell behind the sweep.
+            sweeps = {q: r for q, r in sweeps.items() if r[0] < written_at}
+        key = config_key(current_state, head, tape)
+        lam += 1
+        if key == checkpoint:
+            return False, _loop_detected(history, step_count, tape, head, current_state, lam)
+        if lam == power:
+            checkpoint = key
+            power *= 2
+            lam = 0
+        if step_count < max_steps:
+            period = runaway()
+            if period is not None:
+                return False, _loop_detected(history, step_count, tape, head, current_state, period)
+    if current_state not in halting:
+        history[-1]["verdict"] = "step_limit"
     accepted = (current_state == ACCEPT_STATE)
     return accepted, history
+
+
+def _loop_detected(history, step_count, tape, head, state, cycle_length):
+    history.append({
+        "step": step_count,
+        "state": "LOOP DETECTED",
+        "tape": "".join(tape),
+        "head": head,
+        "description": f"Configuration of {state} repeats every {cycle_length} steps -> Halt (loop)",
+        "active": [],
+        "transitions": [],
+        "verdict": "loop_detected",
+        "cycle_length": cycle_length
+    })
+    return history
+
+
+@timed("simulate_multitape_tm")
+def simulate_multitape_tm(tm, input_string, max_steps=None, trace=True):
+    compiled = compile_tm(tm)
+    max_steps = step_bound(max_steps)
+    blank = compiled.blank
+    tapes = [list(input_string) or [blank]] + [[blank] for _ in range(compiled.tapes - 1)]
+    heads = [0] * compiled.tapes
+    state = compiled.start
+    halting = compiled.accept | compiled.reject
+    history = []
+    step_count = 0
+
+    def snapshot(state, description, transitions):
+        contents = ["".join(t) for t in tapes]
+        return {
+            "step": step_count,
+            "state": state,
+            "tapes": contents,
+            "heads": list(heads),
+            "tape": contents[0],
+            "head": heads[0],
+            "description": description,
+            "active": [state] if transitions is not None else [],
+            "transitions": transitions or []
+        }
+
+    history.append(snapshot(state, "Initial State", []))
+    for prev_state, reads, entry, written in step_loop(compiled, tapes, heads, state, max_steps, halting):
+        step_count += 1
+        if entry is None:
+            history.append(snapshot(
+                "REJECTED (No Transition)",
+                f"No transition for ({state}, {','.join(reads)}) -> Halt & Reject",
+                None
+            ))
+            return False, history
+        state = entry[0]
+        if trace:
+            label = f"{','.join(reads)} → {','.join(written)}, {','.join(entry[2])}"
+            history.append(snapshot(state, f"Read {label}", [{
+                "from": prev_state,
+                "to": state,
+                "label": label
+            }]))
+    if not trace:
+        history.append(snapshot(state, "Final State", []))
+    if state not in halting:
+        history[-1]["verdict"] = "step_limit"
+    return state in compiled.accept, history
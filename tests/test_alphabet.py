@@ -0,0 +1,55 @@
+import re
+
+import pytest
+
+from automata.alphabet import SymbolClasses
+from automata.subset_construction import nfa_to_dfa
+from regex.charclass import label_ranges, parse_class
+from regex.compile import build_regex_nfa
+from simulation.bitparallel_nfa import simulate_nfa_bitparallel
+from simulation.dfa_simulator import compile_dfa
+from simulation.nfa_simulator import simulate_nfa
+import toc
+
+REGEXES = ["[a-z][a-z0-9]*", "[^a-c]x|b", "(Ж|[а-я])*я", "[0-9][0-9]*(\\.[0-9][0-9]*)*", "[a-f]*(f|[0-3])"]
+STRINGS = ["", "a", "abc1", "9", "x", "dx", "bx", "b", "ЖжЖя", "я", "12.5", "1.", "ff", "ab2", "fff", "Я", "a一"]
+
+
+def test_partition():
+    classes = SymbolClasses([parse_class("[a-z]"), parse_class("[d-f]"), [(ord("e"), ord("e"))]])
+    assert sorted(classes.members) == ["a", "d", "e"]
+    assert classes.members["a"] == [(ord("a"), ord("c")), (ord("g"), ord("z"))]
+    assert classes.translate("bdefz!") == "adeda!"
+    assert classes.classify("一") == "一"
+    assert classes.size("a") == 23
+    assert SymbolClasses.from_dict(classes.to_dict()).members == classes.members
+    assert label_ranges(classes.label("a")) == classes.members["a"]
+
+
+@pytest.mark.parametrize("regex", REGEXES)
+def test_engines_match_python_re(regex):
+    nfa = build_regex_nfa(regex)
+    dfa = compile_dfa(nfa_to_dfa(build_regex_nfa(regex)))
+    machines = [toc.compile_regex(regex, model) for model in ("nfa", "dfa", "tm")]
+    for s in STRINGS:
+        expected = re.fullmatch(regex, s) is not None
+        assert simulate_nfa(nfa, nfa.classes.translate(s) if nfa.classes else s)[0] == expected, s
+        assert simulate_nfa_bitparallel(nfa, s)[0] == expected, s
+        assert dfa.run(s)[0] == expected, s
+        assert [m.accepts(s) for m in machines] == [expected] * 3, s
+
+
+def test_table_width_does_not_grow_with_ranges():
+    narrow = nfa_to_dfa(build_regex_nfa("(a|b)*abb"))
+    wide = nfa_to_dfa(build_regex_nfa("([a-y]|[0-9])*[a-y][0-9][0-9]"))
+    assert len(wide["states"]) == len(narrow["states"])
+    assert len({t["symbol"] for t in wide["transitions"]}) == 2
+    assert sorted(wide["classes"].values()) == ["[0-9]", "[a-y]"]
+
+
+def test_reserved_symbols_are_rejected(client):
+    assert client.post("/dfa", json={"regex": "a_b"}).status_code == 400
+    r = client.post("/simulate/dfa", json={"regex": "[^a-z]", "string": "_"}).json()
+    assert r["accepted"] is False
+    r = client.post("/simulate/dfa", json={"regex": "[^a-z]", "string": "Q"}).json()
+    assert r["accepted"] is True
@@ -0,0 +1,49 @@
+import json
+
+from benchmarks.__main__ import main
+from benchmarks.runner import compare, select
+from benchmarks.workloads import WORKLOADS
+
+CHEAP = ["regex.construct_star_tail[n=4]", "dfa.simulate_dfa_long[length=1000]", "tm.simulate_anbn_tm[n=10]"]
+
+
+def report(**results):
+    return {"meta": {}, "results": {name: {"min_s": t, "peak_memory_kb": m} for name, (t, m) in results.items()}}
+
+
+def test_workload_names_are_unique():
+    names = [name for name, _, _ in WORKLOADS]
+    assert len(names) == len(set(names))
+    assert [name for name, _, _ in select(["regex.construct_star_tail*"])][0] == CHEAP[0]
+    assert select(["star_tail[n=4]"])[0][0] == CHEAP[0]
+
+
+def test_run_writes_a_report(tmp_path):
+    output = tmp_path / "results.json"
+    assert main(["run", *CHEAP, "--repeat", "1", "--output", str(output)]) == 0
+    results = json.loads(output.read_text())["results"]
+    assert sorted(results) == sorted(CHEAP)
+    for result in results.values():
+        assert result["repeat"] == 1
+        assert result["time_s"] == result["min_s"] > 0
+        assert result["counts"]
+
+
+def test_compare_flags_regressions_above_noise():
+    baseline = report(a=(0.010, 100), b=(0.0001, 100), c=(0.010, 100))
+    current = report(a=(0.020, 100), b=(0.0003, 100), c=(0.011, 1000), d=(1.0, 1))
+    rows = {(name, metric): regressed for name, metric, _, _, _, regressed in compare(baseline, current)}
+    assert rows[("a", "min_s")] is True
+    # Triple the time, but under MIN_TIME_DELTA.
+    assert rows[("b", "min_s")] is False
+    assert rows[("c", "min_s")] is False and rows[("c", "peak_memory_kb")] is True
+    assert not any(name == "d" for name, _ in rows)
+
+
+def test_compare_command_exit_code(tmp_path):
+    base, cur = tmp_path / "base.json", tmp_path / "cur.json"
+    base.write_text(json.dumps(report(a=(0.010, 100))))
+    cur.write_text(json.dumps(report(a=(0.010, 100))))
+    assert main(["compare", str(cur), "--baseline", str(base)]) == 0
+    cur.write_text(json.dumps(report(a=(0.100, 100))))
+    assert main(["compare", str(cur), "--baseline", str(base)]) == 1
@@ -0,0 +1,47 @@
+import random
+
+from automata.nfa import NFA
+from core.state import State
+from regex.compile import build_regex_nfa
+from simulation.bitparallel_nfa import compile_nfa, simulate_nfa_bitparallel
+from simulation.nfa_simulator import simulate_nfa
+
+REGEXES = ["(a|b)*abb", "a*b*", "(ab|ba)*", "a(b|c)*a", "[a-c]*\\.x"]
+
+
+def random_nfa(rng):
+    nfa = NFA()
+    states = [State() for _ in range(6)]
+    nfa.states.update(states)
+    nfa.start_state = states[0]
+    nfa.accept_states = set(rng.sample(states, 2))
+    for _ in range(12):
+        nfa.add_transition(rng.choice(states), rng.choice(["a", "b", None]), rng.choice(states))
+    return nfa
+
+
+def test_matches_traced_simulator():
+    rng = random.Random(0)
+    nfas = [build_regex_nfa(regex) for regex in REGEXES] + [random_nfa(rng) for _ in range(30)]
+    for nfa in nfas:
+        compiled = compile_nfa(nfa)
+        for _ in range(40):
+            string = "".join(rng.choice("abc.x") for _ in range(rng.randint(0, 8)))
+            accepted, history = simulate_nfa(nfa, string)
+            assert simulate_nfa_bitparallel(None, string, compiled) == (accepted, len(history))
+
+
+def test_compare_steps_do_not_depend_on_trace(client):
+    for trace in (True, False):
+        result = client.post("/compare", json={"regex": "(a|b)*abb", "string": "aabb", "trace": trace}).json()
+        assert result["nfa"]["metrics"]["execution_steps"] == 9
+        assert result["nfa"]["accepted"]
+
+
+def test_stored_machine_steps_do_not_depend_on_trace(client):
+    machine = client.post("/machines", json={"kind": "regex", "definition": "(a|b)*abb"}).json()
+    steps = [
+        client.post(f"/machines/{machine['id']}/simulate", json={"string": "aabbc", "model": "nfa", "trace": trace}).json()["metrics"]["execution_steps"]
+        for trace in (True, False)
+    ]
+    assert steps[0] == steps[1]
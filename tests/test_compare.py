@@ -0,0 +1,40 @@
+import re
+
+import pytest
+
+from api.main import build_compare_pipeline
+
+
+@pytest.mark.parametrize("string", ["", "abb", "aababb", "abab", "abc"])
+def test_columns_agree(client, string):
+    r = client.post("/compare", json={"regex": "(a|b)*abb", "string": string})
+    assert r.status_code == 200
+    result = r.json()
+    expected = re.fullmatch("(a|b)*abb", string) is not None
+    for name in ("nfa", "dfa", "tm"):
+        column = result[name]
+        assert column["accepted"] is expected, name
+        assert column["metrics"]["wall_time_ms"] >= 0
+        assert column["metrics"]["peak_memory_kb"] >= 0
+        assert column["metrics"]["states"] == len(column["graph"]["states"])
+
+
+def test_memory_is_traced_on_request(client):
+    body = {"regex": "(a|b)*abb", "string": "ab" * 2000 + "b", "memory": True}
+    result = client.post("/compare", json=body).json()
+    for name in ("nfa", "dfa", "tm"):
+        assert result[name]["metrics"]["peak_memory_kb"] > 0
+
+
+def test_pipeline_builds_each_artifact_once():
+    nfa, nfa_data, dfa_data, tm_data = build_compare_pipeline("(a|b)*abb")
+    assert nfa_data["states"] and dfa_data["states"]
+    # The TM is the DFA's: its states plus the two halting states.
+    assert set(tm_data["states"]) == set(dfa_data["states"]) | {"q_accept", "q_reject"}
+
+
+def test_product_column(client):
+    body = {"regex": "(a|b)*abb", "string": "babb", "other": "b(a|b)*", "operation": "intersection"}
+    result = client.post("/compare", json=body).json()
+    assert result["product"]["accepted"] is True
+    assert result["product"]["operation"] == "intersection"
@@ -0,0 +1,43 @@
+import threading
+
+
+def open_cursor(client, regex="(a|b)*abb", model="dfa"):
+    machine = client.post("/machines", json={"kind": "regex", "definition": regex}).json()
+    r = client.post("/cursors", json={"machine_id": machine["id"], "model": model})
+    assert r.status_code == 200
+    return r.json()["cursor"]
+
+
+def test_append_backspace_delete(client):
+    cursor = open_cursor(client)
+    state = client.post(f"/cursors/{cursor}/append", json={"chars": "aab"}).json()
+    assert (state["text"], state["accepted"]) == ("aab", False)
+    state = client.post(f"/cursors/{cursor}/append", json={"chars": "b"}).json()
+    assert state["accepted"] is True
+    state = client.post(f"/cursors/{cursor}/backspace", json={"count": 1}).json()
+    assert (state["text"], state["accepted"]) == ("aab", False)
+    assert client.delete(f"/cursors/{cursor}").status_code == 200
+    assert client.post(f"/cursors/{cursor}/append", json={"chars": "a"}).status_code == 404
+
+
+def test_stepping_holds_only_the_cursor_lock(client):
+    import api.main as main
+    busy, free = open_cursor(client), open_cursor(client)
+    _, lock = main._get_cursor(busy)
+    with lock:
+        # Another cursor (and the cursor table) stay usable.
+        state = client.post(f"/cursors/{free}/append", json={"chars": "abb"}).json()
+        assert state["accepted"] is True
+
+    def type_chars():
+        for _ in range(50):
+            main.append_cursor(busy, main.CursorAppendInput(chars="ab"))
+
+    threads = [threading.Thread(target=type_chars) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    state = client.post(f"/cursors/{busy}/append", json={"chars": "b"}).json()
+    assert state["text"] == "ab" * 200 + "b"
+    assert state["accepted"] is True
@@ -0,0 +1,68 @@
+from itertools import product
+
+from cfg.cnf import CNFGrammar
+from cfg.compiler import EPSILON
+from cfg.cyk import cyk_batch, get_cyk_parser
+from cfg.grammar import Grammar
+
+PALINDROMES = {"S": [["a", "S", "a"], ["b", "S", "b"], "a", "b", ""]}
+# Left recursion, ε and unit rules: balanced brackets.
+BRACKETS = {"S": [["S", "P"], ""], "P": [["(", "S", ")"], ["Q"]], "Q": [["[", "S", "]"]]}
+
+
+def leaves(node):
+    if not node.children:
+        return "" if node.symbol == EPSILON else node.symbol
+    return "".join(leaves(child) for child in node.children)
+
+
+def balanced(s):
+    stack = []
+    for c in s:
+        if c in "([":
+            stack.append(c)
+        elif not stack or stack.pop() != {")": "(", "]": "["}[c]:
+            return False
+    return not stack
+
+
+def strings(alphabet, longest):
+    for n in range(longest + 1):
+        for chars in product(alphabet, repeat=n):
+            yield "".join(chars)
+
+
+def test_cnf_shape():
+    cnf = CNFGrammar(Grammar.from_dict("S", BRACKETS))
+    for lhs, rhs, _ in cnf.rules:
+        assert len(rhs) == 2 and all(s in cnf.nonterminals for s in rhs) \
+            or len(rhs) == 1 and rhs[0] not in cnf.nonterminals \
+            or lhs == cnf.start and rhs == ()
+
+
+def test_palindromes():
+    parser = get_cyk_parser(Grammar.from_dict("S", PALINDROMES))
+    for s in strings("ab", 7):
+        accepted, tree = parser.parse(s)
+        assert accepted == (s == s[::-1]), s
+        if accepted:
+            assert tree.symbol == "S" and leaves(tree) == s
+
+
+def test_brackets_with_original_tree():
+    grammar = Grammar.from_dict("S", BRACKETS)
+    parser = get_cyk_parser(grammar)
+    for s in strings("()[]", 6):
+        assert parser.accepts(s) == balanced(s), s
+    accepted, tree = parser.parse("([])")
+    assert accepted and leaves(tree) == "([])"
+    # Unit and ε rules come back as in the original grammar.
+    assert [c.symbol for c in tree.children] == ["S", "P"]
+    assert tree.children[0].children[0].symbol == EPSILON
+    assert cyk_batch(grammar, ["()", "(]", ""]) == [True, False, True]
+
+
+def test_batch_endpoint(client):
+    r = client.post("/cfg/parse/batch", json={"start": "S", "grammar": BRACKETS, "strings": ["()[]", "([)]", "(())"]})
+    assert [x["accepted"] for x in r.json()["results"]] == [True, False, True]
+    assert r.json()["accepted_count"] == 2
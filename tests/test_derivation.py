@@ -0,0 +1,48 @@
+import json
+
+from cfg.compiler import compile_grammar
+from cfg.derivation import apply_step, iter_leftmost_steps, leftmost_derivation
+from cfg.engines import parse
+from cfg.grammar import Grammar
+
+GRAMMAR = {"S": [["a", "S", "B"], ""], "B": ["b", ["B", "b"]]}
+
+
+def test_steps_rewrite_the_leftmost_nonterminal():
+    compiled = compile_grammar(Grammar.from_dict("S", GRAMMAR))
+    _, accepted, tree = parse(compiled, "aabbb")
+    assert accepted
+    form = ["S"]
+    for step in iter_leftmost_steps(tree):
+        first = next(i for i, s in enumerate(form) if s in compiled.nonterminals)
+        assert step["index"] == first and step["replaced"] == form[first]
+        apply_step(form, step)
+    assert "".join(form) == "aabbb"
+    forms = leftmost_derivation(tree)
+    assert forms[0] == "S" and forms[-1] == "a a b b b"
+    assert len(forms) == sum(1 for _ in iter_leftmost_steps(tree)) + 1
+
+
+def test_no_tree_no_steps():
+    assert list(iter_leftmost_steps(None)) == []
+
+
+def test_stream_matches_parse(client):
+    body = {"start": "S", "grammar": GRAMMAR, "string": "abb"}
+    parsed = client.post("/cfg/parse", json=dict(body, derivation="steps")).json()
+    r = client.post("/cfg/derivation/stream", json=body)
+    assert r.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in r.text.splitlines()]
+    assert lines[0] == {"accepted": True, "engine": parsed["engine"], "start": "S"}
+    assert lines[1:] == parsed["derivation_steps"]
+    rejected = client.post("/cfg/derivation/stream", json=dict(body, string="ba"))
+    assert rejected.text.splitlines() == [json.dumps({"accepted": False, "engine": parsed["engine"], "start": "S"})]
+
+
+def test_stream_is_long_and_reports_errors(client):
+    body = {"start": "S", "grammar": GRAMMAR, "string": "a" * 200 + "b" * 200}
+    lines = client.post("/cfg/derivation/stream", json=body).text.splitlines()
+    assert json.loads(lines[0])["accepted"] is True
+    assert len(lines) == 1 + 401  # header, 200 S -> a S B, S -> ε, 200 B -> b
+    bad = client.post("/cfg/derivation/stream", json=dict(body, engine="nope"))
+    assert bad.status_code == 400
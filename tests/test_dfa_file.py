@@ -0,0 +1,66 @@
+import pytest
+
+import automata.dfa_file as dfa_file
+from automata.dfa_file import DFACache, MappedDFA, cached_regex_dfa, dfa_dict, dump_dfa
+from automata.subset_construction import nfa_to_dfa
+from regex.compile import build_regex_nfa
+from simulation.cursor import dfa_cursor
+from simulation.dfa_simulator import compile_dfa, simulate_dfa
+
+REGEXES = ["(a|b)*abb", "[a-z][a-z]*[0-9]*", "x(yz)*|w"]
+STRINGS = ["", "abb", "aabb", "ab", "hello42", "h4x", "xyzyz", "w", "wx", "Ж"]
+
+
+def build(regex):
+    return lambda: nfa_to_dfa(build_regex_nfa(regex))
+
+
+@pytest.mark.parametrize("regex", REGEXES)
+def test_mapped_matches_dict(tmp_path, regex):
+    dfa = build(regex)()
+    path = tmp_path / "m.tdfa"
+    path.write_bytes(dump_dfa(dfa))
+    mapped = MappedDFA(str(path))
+    assert mapped.to_dict() == {k: v for k, v in dfa.items() if k in mapped.to_dict()}
+    compiled = compile_dfa(dfa)
+    for s in STRINGS:
+        assert mapped.run(s) == compiled.run(s)
+        assert mapped.match(s) == compiled.match(s)
+        assert simulate_dfa(mapped, s) == simulate_dfa(dfa, s)
+
+
+def test_cache_hit_is_not_decoded(tmp_path):
+    cache = DFACache(str(tmp_path))
+    calls = []
+
+    def counting():
+        calls.append(1)
+        return build("(a|b)*abb")()
+
+    first = cached_regex_dfa("(a|b)*abb", counting, cache)
+    hit = cached_regex_dfa("(a|b)*abb", counting, cache)
+    assert len(calls) == 1
+    assert isinstance(hit, MappedDFA)
+    assert hit.run("babb") == (True, 4)
+    assert hit._names is None and hit._table is None
+    assert dfa_dict(hit) == dfa_dict(first)
+
+
+def test_cursor_on_mapped(tmp_path):
+    mapped = cached_regex_dfa("(a|b)*abb", build("(a|b)*abb"), DFACache(str(tmp_path)))
+    cursor = dfa_cursor(mapped, mapped)
+    cursor.append("aab")
+    assert not cursor.accepted()
+    cursor.append("b")
+    assert cursor.accepted()
+
+
+def test_stored_machine_uses_mapped(tmp_path, monkeypatch):
+    import api.main as main
+    monkeypatch.setattr(dfa_file, "_default_cache", DFACache(str(tmp_path)))
+    machine = main.StoredMachine("regex", "(a|b)*abb")
+    assert isinstance(machine.artifact("compiled_dfa"), MappedDFA)
+    options = main.MachineSimulateInput(string="abb", model="dfa", trace=True)
+    run = machine.simulate("dfa", "abb", options)
+    assert run["accepted"] is True
+    assert machine.artifact("tm").tapes == 1
@@ -0,0 +1,46 @@
+import pytest
+
+import api.encoding as encoding
+from api.encoding import COLUMNAR, JSON, MSGPACK, choose_format, columnarize
+
+PAYLOAD = {"accepted": True, "steps": [
+    {"state": "q0", "active": ["q0"], "transitions": []},
+    {"state": "q1", "active": ["q0", "q1"], "transitions": [{"from": "q0", "to": "q1", "symbol": "a"}]}
+]}
+
+
+def test_columnar_round_trip():
+    result = columnarize(PAYLOAD)
+    table = result["trace_table"]
+    steps = result["steps"]
+    assert steps["length"] == 2
+    assert [table["strings"][i] for i in steps["columns"]["state"]] == ["q0", "q1"]
+    assert [[table["strings"][i] for i in ids] for ids in steps["columns"]["active"]] == [["q0"], ["q0", "q1"]]
+    edge = table["edges"][steps["columns"]["transitions"][1][0]]
+    assert dict(zip(table["shapes"][edge[0]], (table["strings"][i] for i in edge[1:]))) == PAYLOAD["steps"][1]["transitions"][0]
+
+
+def test_choose_format_without_msgpack(monkeypatch):
+    monkeypatch.setattr(encoding, "msgpack", None)
+    assert choose_format(None) == JSON
+    assert choose_format(COLUMNAR) == COLUMNAR
+    assert choose_format(MSGPACK) is None
+    assert choose_format(f"{MSGPACK}, {JSON};q=0.5") == JSON
+    assert choose_format(f"{MSGPACK}, */*;q=0.1") == JSON
+    assert choose_format(f"application/x-msgpack, {COLUMNAR}") == COLUMNAR
+
+
+def test_choose_format_with_msgpack(monkeypatch):
+    monkeypatch.setattr(encoding, "msgpack", object())
+    assert choose_format(f"{MSGPACK}, {JSON}") == MSGPACK
+
+
+def test_negotiated_endpoint(client):
+    body = {"regex": "(a|b)*abb", "string": "abb"}
+    r = client.post("/simulate/dfa", json=body, headers={"Accept": COLUMNAR})
+    assert r.headers["content-type"].startswith(COLUMNAR)
+    assert r.json()["steps"]["length"] == 4
+    if encoding.msgpack is None:
+        assert client.post("/simulate/dfa", json=body, headers={"Accept": MSGPACK}).status_code == 406
+        r = client.post("/simulate/dfa", json=body, headers={"Accept": f"{MSGPACK}, */*"})
+        assert r.status_code == 200 and r.json()["accepted"] is True
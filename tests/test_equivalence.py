@@ -0,0 +1,59 @@
+import re
+from itertools import product
+
+import pytest
+
+from automata.equivalence import check_equivalent, check_includes
+from regex.compile import build_regex_nfa
+
+PAIRS = [
+    ("(a|b)*", "(a*b*)*"),
+    ("(a|b)*abb", "(a|b)*bb"),
+    ("a(ba)*", "(ab)*a"),
+    ("(ab|a)*", "(a*(ab)*)*"),
+    ("[a-c]*c", "(a|b|c)*c"),
+    ("[a-c]b", "ab|bb"),
+]
+
+
+def words(alphabet, longest):
+    for n in range(longest + 1):
+        for chars in product(alphabet, repeat=n):
+            yield "".join(chars)
+
+
+def language(regex, longest=6):
+    pattern = re.compile(regex)
+    return {w for w in words("abc", longest) if pattern.fullmatch(w)}
+
+
+@pytest.mark.parametrize("left, right", PAIRS)
+def test_equivalence_against_brute_force(left, right):
+    result = check_equivalent(build_regex_nfa(left), build_regex_nfa(right))
+    differing = language(left) ^ language(right)
+    assert result["equivalent"] == (not differing)
+    if differing:
+        word = result["counterexample"]
+        assert word in differing
+        assert len(word) == min(map(len, differing))
+        assert result["accepted_by"] == ("left" if word in language(left) else "right")
+
+
+@pytest.mark.parametrize("left, right", PAIRS)
+def test_inclusion_against_brute_force(left, right):
+    result = check_includes(build_regex_nfa(left), build_regex_nfa(right))
+    missing = language(right) - language(left)
+    assert result["includes"] == (not missing)
+    if missing:
+        assert result["counterexample"] in missing
+        assert len(result["counterexample"]) == min(map(len, missing))
+
+
+def test_endpoints(client):
+    r = client.post("/regex/equivalent", json={"left": "(a|b)*", "right": "(a*b*)*"}).json()
+    assert r["equivalent"] is True and r["counterexample"] is None
+    r = client.post("/regex/includes", json={"left": "(a|b)*", "right": "a*"}).json()
+    assert r["includes"] is True
+    r = client.post("/regex/includes", json={"left": "a*", "right": "(a|b)*"}).json()
+    assert (r["includes"], r["counterexample"]) == (False, "b")
+    assert client.post("/regex/equivalent", json={"left": "(a", "right": "a"}).status_code == 400
@@ -0,0 +1,100 @@
+import itertools
+import os
+import signal
+
+import pytest
+
+from core.limits import LimitExceeded
+from simulation.executor import WorkerPool, WorkerError
+
+
+def kill_self():
+    os.kill(os.getpid(), signal.SIGKILL)
+
+
+@pytest.fixture
+def pool():
+    p = WorkerPool(size=1)
+    yield p
+    p.shutdown()
+
+
+def test_result_and_exception(pool):
+    assert pool.run(sum, ([1, 2, 3],)) == 6
+    with pytest.raises(ValueError):
+        pool.run(int, ("x",))
+
+
+def test_exit_is_not_blamed_on_memory(pool):
+    with pytest.raises(WorkerError):
+        pool.run(os._exit, (3,))
+    assert pool.run(sum, ([1],)) == 1
+
+
+def test_killed_worker_is_a_memory_limit(pool):
+    with pytest.raises(LimitExceeded) as e:
+        pool.run(kill_self)
+    assert e.value.limit == "max_memory_mb"
+
+
+def test_unpicklable_job_fails(pool):
+    with pytest.raises(WorkerError):
+        pool.run(lambda: 1)
+    assert pool.run(sum, ([2],)) == 2
+
+
+def test_timeout(pool):
+    import time
+    with pytest.raises(LimitExceeded) as e:
+        pool.run(time.sleep, (5,), {"timeout": 0.2})
+    assert e.value.limit == "timeout"
+
+
+def test_stream_sends_chunks_as_they_come(pool):
+    assert [len(chunk) for chunk in pool.stream(range, (600,))] == [256, 256, 88]
+    # An endless generator still delivers its first chunk; closing the
+    # stream kills the busy worker.
+    chunks = pool.stream(itertools.count, ())
+    assert next(chunks) == list(range(256))
+    chunks.close()
+    assert pool.run(sum, ([3],)) == 3
+    with pytest.raises(ValueError):
+        list(pool.stream(int, ("x",)))
+
+
+def test_derivation_stream_runs_in_pool(client):
+    grammar = {"start": "S", "grammar": {"S": ["aSb", "ε"]}, "string": "aabb"}
+    r = client.post("/cfg/derivation/stream", json=grammar)
+    assert r.status_code == 200
+    lines = r.text.splitlines()
+    assert '"accepted": true' in lines[0]
+    assert len(lines) == 4
+
+
+def test_measured_runs_the_call_once():
+    import tracemalloc
+    from simulation.executor import measured
+    calls = []
+
+    def job(n):
+        calls.append(tracemalloc.is_tracing())
+        return [0] * n
+
+    result, metrics = measured(job, 100000)
+    assert result == [0] * 100000
+    assert calls == [False]
+    assert metrics["wall_time_ms"] >= 0 and metrics["peak_memory_kb"] >= 0
+
+    result, metrics = measured(job, 100000, memory=True)
+    assert calls == [False, True]
+    assert metrics["peak_memory_kb"] >= 100000 * 8 / 1024
+
+
+def test_limit_headers(client):
+    body = {"regex": "(a|b)*a(a|b)(a|b)(a|b)(a|b)(a|b)"}
+    assert client.post("/dfa", json=body).status_code == 200
+    r = client.post("/dfa", json=body, headers={"X-Limit-Max-States": "10"})
+    assert r.status_code == 422
+    assert r.json()["detail"]["limit"] == "max_states"
+    assert client.post("/dfa", json=body, headers={"X-Limit-Max-States": "lots"}).status_code == 400
+    assert client.post("/dfa", json=body, headers={"X-Limit-Timeout": "-1"}).status_code == 400
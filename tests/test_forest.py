@@ -0,0 +1,55 @@
+from cfg.compiler import compile_grammar
+from cfg.forest import parse_forest
+from cfg.grammar import Grammar
+
+
+def grammar(start, rules):
+    return compile_grammar(Grammar.from_dict(start, rules))
+
+
+def show(node):
+    if not node.children:
+        return node.symbol
+    return f"{node.symbol}({','.join(show(child) for child in node.children)})"
+
+
+def test_catalan_counts():
+    g = grammar("S", {"S": [["S", "S"], ["a"]]})
+    assert [parse_forest(g, "a" * n).count() for n in range(1, 8)] == [1, 1, 2, 5, 14, 42, 132]
+
+
+def test_epsilon_positions_are_distinct_trees():
+    g = grammar("S", {"S": [["A", "A"]], "A": [["a"], ""]})
+    forest = parse_forest(g, "a")
+    assert forest.count() == 2
+    assert sorted(show(tree) for tree in forest.iter_trees()) == ["S(A(a),A(ε))", "S(A(ε),A(a))"]
+
+
+def test_unit_cycles_stay_finite():
+    g = grammar("S", {"S": [["A"], ["a"]], "A": [["S"], ["a"]]})
+    assert parse_forest(g, "a").count() == 2
+
+
+def test_forest_endpoint_pages(client):
+    body = {"grammar": {"S": [["S", "S"], ["a"]]}, "start": "S", "string": "aaaa"}
+    page = client.post("/cfg/forest", json=dict(body, offset=-3, limit=2)).json()
+    assert page["forest"]["count"] == 5 and len(page["trees"]) == 2
+    assert page["next_offset"] == 2
+    page = client.post("/cfg/forest", json=dict(body, offset=4, limit=10 ** 6)).json()
+    assert len(page["trees"]) == 1 and page["next_offset"] is None
+    ambiguous = client.post("/cfg/forest", json={"grammar": {"S": [["A", "A"]], "A": [["a"], ""]}, "start": "S", "string": "a"}).json()
+    assert ambiguous["ambiguous"] and ambiguous["forest"]["count"] == 2
+    assert client.post("/cfg/forest", json=dict(body, limit=0)).status_code == 400
+
+
+def test_unit_clique_stays_polynomial():
+    from cfg.cnf import CNFGrammar
+    for n in (4, 9):
+        rules = {f"A{i}": [[f"A{j}"] for j in range(n) if j != i] + [["a"]] for i in range(n)}
+        g = grammar("A0", rules)
+        assert len(CNFGrammar(g).rules) <= (n + 1) ** 2
+        # One shortest chain per reachable symbol: A0 -> a directly and via each other Ai.
+        forest = parse_forest(g, "a")
+        assert forest.count() == n
+        assert len({show(tree) for tree in forest.iter_trees()}) == n
+        assert forest.dag()[0] is not None
@@ -0,0 +1,63 @@
+from cfg.compiler import END_MARKER, compile_grammar
+from cfg.grammar import Grammar
+
+# E -> T E', E' -> + T E' | ε, T -> F T', T' -> * F T' | ε, F -> ( E ) | i
+EXPR = {
+    "E": [["T", "E'"]],
+    "E'": [["+", "T", "E'"], ""],
+    "T": [["F", "T'"]],
+    "T'": [["*", "F", "T'"], ""],
+    "F": [["(", "E", ")"], "i"]
+}
+
+
+def test_nullable_first_follow():
+    g = compile_grammar(Grammar.from_dict("E", EXPR))
+    assert g.nullable == {"E'", "T'"}
+    assert g.first["E"] == g.first["T"] == g.first["F"] == {"(", "i"}
+    assert g.first["E'"] == {"+"}
+    assert g.follow["E"] == g.follow["E'"] == {")", END_MARKER}
+    assert g.follow["T"] == g.follow["T'"] == {"+", ")", END_MARKER}
+    assert g.follow["F"] == {"+", "*", ")", END_MARKER}
+    assert g.left_recursive == set()
+    assert g.first_of(["T'", "E'"]) == ({"*", "+"}, True)
+
+
+def test_useless_rules_and_left_recursion():
+    g = compile_grammar(Grammar.from_dict("S", {"S": [["S", "a"], "b", ["B"]], "B": [["B", "c"]], "C": ["c"]}))
+    assert g.left_recursive == {"S"}
+    removed = {(lhs, rhs) for lhs, rhs in g.removed}
+    assert removed == {("S", ("B",)), ("B", ("B", "c")), ("C", ("c",))}
+
+
+def test_compiled_grammars_are_cached():
+    first = compile_grammar(Grammar.from_dict("E", EXPR))
+    assert compile_grammar(Grammar.from_dict("E", dict(EXPR))) is first
+    assert compile_grammar(first) is first
+
+
+def test_analyze_endpoint(client):
+    r = client.post("/cfg/analyze", json={"start": "E", "grammar": EXPR})
+    assert r.status_code == 200
+    summary = r.json()
+    assert summary["nullable"] == ["E'", "T'"]
+    assert summary["follow"]["F"] == sorted({"+", "*", ")", END_MARKER})
+
+
+def test_compiled_grammars_are_cached_lru():
+    from cfg import compiler
+    from core.cache import LRUCache
+
+    cache = LRUCache(2)
+    built = []
+    build = lambda key: lambda: built.append(key) or key
+    assert cache.get("a", build("a")) == "a"
+    cache.get("b", build("b"))
+    cache.get("a", build("a"))
+    cache.get("c", build("c"))
+    assert built == ["a", "b", "c"]
+    assert "a" in cache and "b" not in cache and len(cache) == 2
+
+    grammar = Grammar.from_dict("E", EXPR)
+    assert compile_grammar(grammar) is compile_grammar(Grammar.from_dict("E", EXPR))
+    assert compile_grammar(grammar).key in compiler._cache
@@ -0,0 +1,60 @@
+import re
+from itertools import product
+
+import pytest
+
+import automata.language as language_module
+from automata.language import Language, count_strings, enumerate_strings
+from automata.subset_construction import nfa_to_dfa
+from regex.compile import build_regex_nfa
+
+REGEXES = ["(a|b)*abb", "(ab|ba)*", "a*b*", "(a|b)(a|b)(a|b)", "b(a|b)*a|a"]
+
+
+def dfa(regex):
+    return nfa_to_dfa(build_regex_nfa(regex))
+
+
+def accepted(regex, length):
+    return ["".join(w) for w in product("ab", repeat=length) if re.fullmatch(regex, "".join(w))]
+
+
+@pytest.mark.parametrize("regex", REGEXES)
+def test_counts_against_brute_force(regex, monkeypatch):
+    language = Language(dfa(regex))
+    for length in range(9):
+        expected = len(accepted(regex, length))
+        assert language._count_dp(length) == expected
+        assert language._count_matrix(length) == expected
+        assert count_strings(dfa(regex), length)["count"] == str(expected)
+    monkeypatch.setattr(language_module, "numpy", None)
+    assert [language._count_matrix(n) for n in range(9)] == [len(accepted(regex, n)) for n in range(9)]
+
+
+@pytest.mark.parametrize("regex", REGEXES)
+def test_enumeration_is_shortlex(regex):
+    expected = [w for n in range(7) for w in accepted(regex, n)][:40]
+    strings = []
+    cursor = None
+    while len(strings) < len(expected):
+        page = enumerate_strings(dfa(regex), 7, cursor)
+        strings += page["strings"]
+        cursor = page["cursor"]
+        if cursor is None:
+            break
+    assert strings[:len(expected)] == expected
+
+
+def test_finite_and_empty_languages():
+    page = enumerate_strings(dfa("(a|b)(a|b)"), 10)
+    assert page["strings"] == ["aa", "ab", "ba", "bb"] and page["cursor"] is None
+    assert page["finite"] is True and page["shortest"] == "aa"
+    result = count_strings(dfa("(a|b)*abb"), 2000)
+    assert result["finite"] is False and len(result["count"]) > 500
+
+
+def test_class_edges_count_their_members(client):
+    assert client.post("/regex/count", json={"regex": "[a-z][0-9]", "length": 2}).json()["count"] == "260"
+    page = client.post("/regex/enumerate", json={"regex": "[a-c]x*", "limit": 4}).json()
+    assert page["strings"] == ["a", "b", "c", "ax"]
+    assert client.post("/regex/count", json={"regex": "a*", "length": -1}).status_code == 400
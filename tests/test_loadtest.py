@@ -0,0 +1,37 @@
+import json
+import os
+
+import pytest
+
+from benchmarks.loadtest import MIX, main, parse_mix, percentile, process_tree_rss
+
+
+def test_parse_mix():
+    assert parse_mix(None) == {name: weight for name, (weight, _, _) in MIX.items()}
+    assert parse_mix("simulate_dfa=5,compare") == {"simulate_dfa": 5.0, "compare": 1.0}
+    with pytest.raises(SystemExit):
+        parse_mix("teleport=1")
+
+
+def test_percentile():
+    values = list(range(1, 101))
+    assert percentile(values, 50) == 51
+    assert percentile(values, 99) == 99
+    assert percentile([], 50) is None
+
+
+@pytest.mark.skipif(not os.path.isdir("/proc"), reason="RSS sampling reads /proc")
+def test_rss_of_this_process():
+    assert process_tree_rss(os.getpid()) > 1
+
+
+def test_short_run_against_a_local_server(tmp_path, capsys):
+    output = tmp_path / "report.json"
+    argv = ["--requests", "24", "--concurrency", "3", "--duration", "60", "--seed", "1",
+            "--mix", "dfa=1,simulate_dfa=2,cfg_parse=1", "--env", "TOC_WORKERS=1", "--output", str(output)]
+    assert main(argv) == 0
+    report = json.loads(output.read_text())
+    assert report["total"]["requests"] == 24
+    assert report["total"]["error_rate"] == 0
+    assert set(report["endpoints"]) <= {"dfa", "simulate_dfa", "cfg_parse"}
+    assert "total" in capsys.readouterr().out
@@ -0,0 +1,40 @@
+from core.metrics import Registry, count, observe, recording, stage_breakdown, timed
+
+
+def test_recording_collects_instead_of_applying():
+    @timed("work")
+    def work():
+        count("jobs", outcome="ok")
+        return 1
+
+    with recording() as records:
+        assert work() == 1
+        observe("toc_stage_seconds", 0.002, stage="work")
+    assert [r[1] for r in records] == ["jobs", "toc_stage_seconds", "toc_stage_seconds"]
+    assert list(stage_breakdown(records)) == ["work"]
+    assert stage_breakdown(records)["work"] >= 2.0
+
+
+def test_render_prometheus():
+    registry = Registry()
+    registry.apply([
+        ("c", "toc_worker_jobs_total", (("outcome", "ok"),), 2),
+        ("h", "toc_stage_seconds", (("stage", 'a"b'),), 0.003),
+        ("h", "toc_stage_seconds", (("stage", 'a"b'),), 20.0)
+    ])
+    text = registry.render()
+    assert "# TYPE toc_worker_jobs_total counter" in text
+    assert 'toc_worker_jobs_total{outcome="ok"} 2' in text
+    assert 'toc_stage_seconds_bucket{stage="a\\"b",le="0.005"} 1' in text
+    assert 'toc_stage_seconds_bucket{stage="a\\"b",le="+Inf"} 2' in text
+    assert 'toc_stage_seconds_count{stage="a\\"b"} 2' in text
+
+
+def test_metrics_endpoint_and_timing_header(client):
+    r = client.post("/dfa", json={"regex": "(a|b)*abb"}, headers={"X-Timing": "1"})
+    stages = dict(part.split(";dur=") for part in r.headers["X-Timing"].split(", "))
+    assert "subset_construction" in stages
+    text = client.get("/metrics").text
+    assert 'toc_stage_seconds_count{stage="subset_construction"}' in text
+    assert "toc_worker_jobs_total" in text
+    assert "toc_request_seconds" in text
@@ -0,0 +1,57 @@
+import re
+from itertools import product
+
+import pytest
+
+from automata.operations import combine
+from regex.compile import build_regex_nfa
+from simulation.dfa_simulator import compile_dfa
+
+LEFT, RIGHT = "(a|b)*abb", "[ab]*b[ab]"
+EXPECTED = {
+    "intersection": lambda l, r: l and r,
+    "union": lambda l, r: l or r,
+    "difference": lambda l, r: l and not r,
+    "symmetric_difference": lambda l, r: l != r,
+    "complement": lambda l, r: not l
+}
+
+
+def words(alphabet, longest):
+    for n in range(longest + 1):
+        for chars in product(alphabet, repeat=n):
+            yield "".join(chars)
+
+
+@pytest.mark.parametrize("operation", sorted(EXPECTED))
+@pytest.mark.parametrize("minimize", [False, True])
+def test_operations_against_brute_force(operation, minimize):
+    result = combine(build_regex_nfa(LEFT), build_regex_nfa(RIGHT), operation, alphabet="abc", minimize=minimize)
+    dfa = compile_dfa(result["dfa"])
+    accepted = []
+    for w in words("abc", 6):
+        expected = EXPECTED[operation](re.fullmatch(LEFT, w) is not None, re.fullmatch(RIGHT, w) is not None)
+        assert dfa.run(w)[0] == expected, (operation, w)
+        if expected:
+            accepted.append(w)
+    assert result["empty"] == (not accepted)
+    if accepted:
+        assert result["example"] == accepted[0]
+    assert result["metrics"]["states"] <= result["metrics"]["product_states"]
+
+
+def test_empty_difference_and_example_only():
+    result = combine(build_regex_nfa("(a|b)*abb"), build_regex_nfa("(a|b)*b"), "difference", build=False)
+    assert result == {"dfa": None, "empty": True, "example": None}
+
+
+def test_minimized_intersection_is_minimal():
+    result = combine(build_regex_nfa("(a|b)*abb"), build_regex_nfa("(a|b)*"), "intersection", minimize=True)
+    assert result["metrics"]["states"] == 4
+
+
+def test_product_endpoint(client):
+    r = client.post("/regex/product", json={"left": "(a|b)*abb", "right": "b(a|b)*", "operation": "intersection"})
+    assert r.json()["example"] == "babb"
+    assert client.post("/regex/product", json={"left": "a", "operation": "union"}).status_code == 400
+    assert client.post("/regex/product", json={"left": "a", "right": "b", "operation": "xor"}).status_code == 400
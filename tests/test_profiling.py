@@ -0,0 +1,47 @@
+import pstats
+
+import pytest
+
+import api.main as main
+import core.profiling as profiling
+
+
+@pytest.fixture
+def profile_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_DIR", str(tmp_path))
+    monkeypatch.setattr(main, "PROFILING", True)
+    return tmp_path
+
+
+def test_profiled_request(client, profile_dir):
+    assert "X-Profile-Id" not in client.post("/dfa", json={"regex": "ab*"}).headers
+    r = client.post("/dfa?profile=1", json={"regex": "(a|b)*abb"})
+    profile_id = r.headers["X-Profile-Id"]
+    summary = client.get(f"/profiles/{profile_id}").json()
+    assert summary["route"] == "/dfa" and summary["status"] == 200
+    # The worker job's stats are merged in.
+    assert any("subset_construction" in f["function"] for f in summary["functions"])
+    download = client.get(f"/profiles/{profile_id}", params={"format": "pstats"})
+    path = profile_dir / "download.prof"
+    path.write_bytes(download.content)
+    assert pstats.Stats(str(path)).total_calls > 0
+    assert client.get(f"/profiles/{profile_id}", params={"format": "svg"}).status_code == 400
+    assert client.get("/profiles/0000").status_code == 404
+
+
+def test_disabled_by_default(client, monkeypatch):
+    monkeypatch.setattr(main, "PROFILING", False)
+    assert "X-Profile-Id" not in client.post("/dfa", json={"regex": "ab*"}, headers={"X-Profile": "1"}).headers
+
+
+def test_only_newest_profiles_are_kept(profile_dir, monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_KEEP", 2)
+    ids = []
+    for _ in range(3):
+        with profiling.profiling() as session:
+            with profiling.profiled_block():
+                sum(range(1000))
+        ids.append(profiling.save_profile(session, {"route": "test"}))
+    assert profiling.load_summary(ids[0]) is None
+    assert profiling.load_summary(ids[2])["route"] == "test"
+    assert len(list(profile_dir.glob("*.prof"))) == 2
@@ -0,0 +1,77 @@
+import os
+import threading
+
+from api.store import MachineStore
+
+
+def test_lru_and_reload(tmp_path):
+    store = MachineStore(size=2, ttl=3600, directory=str(tmp_path))
+    records = [store.put("regex", r)[0] for r in ("a", "b", "c")]
+    assert len(store._entries) == 2
+    assert store.get(records[0]["id"]) == records[0]
+    assert store.put("regex", "a") == (records[0], False)
+
+
+def test_sweep_removes_expired_files(tmp_path):
+    store = MachineStore(size=1, ttl=60, directory=str(tmp_path))
+    old, _ = store.put("regex", "a")
+    new, _ = store.put("regex", "b")
+    path = tmp_path / f"{old['id']}.json"
+    stale = os.path.getmtime(path) - 120
+    os.utime(path, (stale, stale))
+    os.utime(tmp_path / f"{new['id']}.json", (stale, stale))
+    assert store.sweep() == 1
+    assert not path.exists()
+    assert (tmp_path / f"{new['id']}.json").exists()
+    assert store.get(old["id"]) is None
+    assert store.get(new["id"]) == new
+
+
+def test_machine_cache_is_thread_safe():
+    import api.main as main
+    records = [main.machine_store.put("regex", f"a{i}b*")[0] for i in range(main.MACHINE_CACHE_SIZE + 16)]
+    errors = []
+
+    def work(offset):
+        try:
+            for k in range(200):
+                main.get_machine(records[(offset + k) % len(records)])
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=work, args=(n * 7,)) for n in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert not errors
+    assert len(main._machines) <= main.MACHINE_CACHE_SIZE
+
+
+def test_machine_endpoints(client):
+    r = client.post("/machines", json={"kind": "regex", "definition": "(a|b)*abb"})
+    assert r.status_code == 200
+    machine = r.json()
+    assert machine["default_model"] == "dfa"
+    again = client.post("/machines", json={"kind": "regex", "definition": "(a|b)*abb"}).json()
+    assert again["id"] == machine["id"] and again["created"] is False
+    assert client.get(f"/machines/{machine['id']}").json()["definition"] == "(a|b)*abb"
+
+    url = f"/machines/{machine['id']}/simulate"
+    for model in ("nfa", "dfa", "pda", "tm"):
+        assert client.post(url, json={"string": "aabb", "model": model}).json()["accepted"] is True, model
+    batch = client.post(url, json={"strings": ["abb", "ab", "babb"]}).json()
+    assert [x["accepted"] for x in batch["results"]] == [True, False, True]
+    assert client.post(url, json={"string": "a", "model": "parse"}).status_code == 400
+
+    assert client.delete(f"/machines/{machine['id']}").status_code == 200
+    assert client.post(url, json={"string": "abb"}).status_code == 404
+    assert client.post("/machines", json={"kind": "turtle", "definition": "x"}).status_code == 400
+
+
+def test_invalid_definition_is_not_stored(client):
+    r = client.post("/machines", json={"kind": "regex", "definition": "(ab"})
+    assert r.status_code == 400
+    from api.main import machine_store
+    from api.store import machine_id
+    assert machine_store.get(machine_id("regex", "(ab")) is None
@@ -0,0 +1,73 @@
+from itertools import product
+
+import pytest
+
+from cfg.compiler import EPSILON, compile_grammar
+from cfg.cyk import get_cyk_parser
+from cfg.grammar import Grammar
+from cfg.table_parser import GrammarConflictError, generate_parser
+
+LL1 = {
+    "E": [["T", "E'"]],
+    "E'": [["+", "T", "E'"], ""],
+    "T": [["F", "T'"]],
+    "T'": [["*", "F", "T'"], ""],
+    "F": [["(", "E", ")"], "i"]
+}
+LEFT_RECURSIVE = {"E": [["E", "+", "T"], ["T"]], "T": [["T", "*", "F"], ["F"]], "F": [["(", "E", ")"], "i"]}
+AMBIGUOUS = {"E": [["E", "+", "E"], "i"]}
+
+
+def leaves(node):
+    if not node.children:
+        return "" if node.symbol == EPSILON else node.symbol
+    return "".join(leaves(child) for child in node.children)
+
+
+def strings(alphabet, longest):
+    for n in range(longest + 1):
+        for chars in product(alphabet, repeat=n):
+            yield "".join(chars)
+
+
+def test_kinds():
+    assert generate_parser(Grammar.from_dict("E", LL1)).kind == "ll1"
+    assert generate_parser(Grammar.from_dict("E", LEFT_RECURSIVE)).kind == "lalr"
+    parser = generate_parser(Grammar.from_dict("E", AMBIGUOUS))
+    assert parser.kind is None
+    with pytest.raises(GrammarConflictError) as e:
+        parser.parse("i+i")
+    assert e.value.conflicts
+
+
+@pytest.mark.parametrize("rules, method", [(LL1, "ll1"), (LL1, "lalr"), (LEFT_RECURSIVE, "lalr")])
+def test_agrees_with_cyk(rules, method):
+    grammar = compile_grammar(Grammar.from_dict("E", rules))
+    parser, cyk = generate_parser(grammar), get_cyk_parser(grammar)
+    for s in strings("i+*()", 4):
+        accepted, tree = parser.parse(s, method)
+        assert accepted == cyk.accepts(s), s
+        if accepted:
+            assert tree.symbol == "E" and leaves(tree) == s
+
+
+def test_lalr_tree_shape():
+    _, tree = generate_parser(Grammar.from_dict("E", LEFT_RECURSIVE)).parse("i+i*i")
+    # + at the top: * binds tighter.
+    assert [c.symbol for c in tree.children] == ["E", "+", "T"]
+    assert [c.symbol for c in tree.children[2].children] == ["T", "*", "F"]
+
+
+def test_parsers_are_cached():
+    assert generate_parser(Grammar.from_dict("E", LL1)) is generate_parser(Grammar.from_dict("E", LL1))
+
+
+def test_endpoints(client):
+    r = client.post("/cfg/tables", json={"start": "E", "grammar": LL1})
+    assert r.json()["kind"] == "ll1"
+    assert r.json()["ll1"]["table"]["F, i"] == "F -> i"
+    r = client.post("/cfg/parse", json={"start": "E", "grammar": LEFT_RECURSIVE, "string": "i*(i+i)"})
+    assert (r.json()["engine"], r.json()["accepted"]) == ("lalr", True)
+    r = client.post("/cfg/parse", json={"start": "E", "grammar": AMBIGUOUS, "string": "i", "engine": "ll1"})
+    assert r.status_code == 400
+    assert r.json()["detail"]["conflicts"]
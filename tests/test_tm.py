@@ -0,0 +1,166 @@
+from core.limits import use_limits
+from simulation.tm_simulator import simulate_tm, simulate_multitape_tm
+from simulation.tm_accelerated import run_tm_accelerated
+
+# Walks right forever over fresh blanks.
+RUNAWAY = {"start": "q0", "transitions": [["q0", "_", "q0", "_", "R"], ["q0", "a", "q0", "a", "R"]]}
+# Accepts strings of a's of even length.
+EVEN = {"start": "e", "transitions": [
+    ["e", "a", "o", "a", "R"], ["o", "a", "e", "a", "R"],
+    ["e", "_", "q_accept", "_", "R"], ["o", "_", "q_reject", "_", "R"]
+]}
+
+
+def test_step_limit_verdict():
+    accepted, history = simulate_tm(RUNAWAY, "aa", max_steps=50)
+    assert accepted is False
+    assert history[-1]["step"] == 50
+    assert history[-1]["verdict"] == "step_limit"
+    assert simulate_multitape_tm(RUNAWAY, "aa", max_steps=50)[1][-1]["verdict"] == "step_limit"
+    assert run_tm_accelerated(EVEN, "a" * 100, max_steps=10)["verdict"] == "step_limit"
+
+
+def test_halting_runs_have_no_verdict():
+    for string, expected in (("aaaa", True), ("aaa", False)):
+        accepted, history = simulate_tm(EVEN, string)
+        assert accepted is expected
+        assert "verdict" not in history[-1]
+        assert run_tm_accelerated(EVEN, string)["accepted"] is expected
+
+
+def test_api_reports_step_limit(client):
+    r = client.post("/simulate/tm", json={"tm": RUNAWAY, "string": "a", "max_steps": 100})
+    assert r.status_code == 200
+    assert r.json()["verdict"] == "step_limit"
+    assert r.json()["accepted"] is False
+    assert r.json()["steps"][-1]["step"] == 100
+
+
+def test_max_steps_limit_stops_single_tape_runs(client):
+    with use_limits({"max_steps": 30}):
+        assert simulate_tm(RUNAWAY, "a")[1][-1]["step"] == 30
+        assert simulate_tm(RUNAWAY, "a", max_steps=10 ** 6)[1][-1]["step"] == 30
+    headers = {"X-Limit-Max-Steps": "40"}
+    for trace in (True, False):
+        r = client.post("/simulate/tm", json={"tm": RUNAWAY, "string": "a", "trace": trace}, headers=headers).json()
+        assert r["verdict"] == "step_limit"
+        assert r["metrics"]["execution_steps"] == 41  # history entries: the initial state plus 40 steps
+    # The DFA fast path does not skip the bound either.
+    r = client.post("/simulate/tm", json={"tm": EVEN, "string": "a" * 100, "trace": False}, headers=headers).json()
+    assert r["verdict"] == "step_limit"
+
+# Bounces between two cells forever.
+PING_PONG = {"start": "p", "transitions": [["p", "a", "q", "a", "R"], ["q", "*", "p", "*", "L"]]}
+
+
+def test_exact_cycle_is_detected():
+    accepted, history = simulate_tm(PING_PONG, "ab", detect_loops=True)
+    assert accepted is False
+    assert history[-1]["verdict"] == "loop_detected"
+    assert history[-1]["cycle_length"] == 2
+    assert len(history) < 10
+
+
+def test_runaway_sweep_is_detected():
+    accepted, history = simulate_tm(RUNAWAY, "aa", detect_loops=True)
+    assert history[-1]["verdict"] == "loop_detected"
+    assert history[-1]["step"] < 20
+
+
+# Halts (rejects) after a left move that is clamped at cell 0.
+CLAMPED = {"start": "q0", "transitions": [
+    ["q0", "_", "q1", "A", "L"], ["q1", "A", "q2", "A", "R"], ["q2", "_", "q0", "_", "R"]
+]}
+
+
+def test_clamped_left_move_is_not_a_loop():
+    accepted, history = simulate_tm(CLAMPED, "")
+    assert accepted is False and history[-1]["step"] == 5
+    assert simulate_tm(CLAMPED, "", detect_loops=True) == (accepted, history)
+
+
+def test_loop_detection_leaves_halting_runs_alone():
+    for string in ("", "a", "aaaaaa", "aaaaaaa"):
+        assert simulate_tm(EVEN, string, detect_loops=True) == simulate_tm(EVEN, string)
+
+
+def test_api_loop_detection(client):
+    r = client.post("/simulate/tm", json={"tm": PING_PONG, "string": "a", "detect_loops": True}).json()
+    assert (r["verdict"], r["cycle_length"]) == ("loop_detected", 2)
+
+# "$" then a's: sweep right to the blank, back left to "$", accept.
+SWEEPER = {"start": "s", "transitions": [
+    ["s", "$", "r", "$", "R"], ["r", "a", "r", "a", "R"], ["r", "_", "l", "_", "L"],
+    ["l", "a", "l", "a", "L"], ["l", "$", "q_accept", "$", "R"]
+]}
+
+
+def test_accelerated_agrees_with_single_steps():
+    for n in (0, 1, 7, 100):
+        string = "$" + "a" * n
+        accepted, history = simulate_tm(SWEEPER, string)
+        run = run_tm_accelerated(SWEEPER, string)
+        assert run["accepted"] == accepted is True
+        assert run["metrics"]["execution_steps"] == len(history) - 1 == 2 * n + 3
+
+
+def test_accelerated_long_run_uses_macro_steps():
+    run = run_tm_accelerated(SWEEPER, "$" + "a" * 10 ** 6, keyframes=50)
+    assert run["verdict"] == "accept"
+    assert run["metrics"]["execution_steps"] == 2 * 10 ** 6 + 3
+    assert run["metrics"]["macro_steps"] <= 5
+    assert len(run["steps"]) <= 52
+
+
+def test_api_accelerated_mode(client):
+    body = {"tm": SWEEPER, "string": "$" + "a" * 20000, "mode": "accelerated"}
+    r = client.post("/simulate/tm", json=body).json()
+    assert r["verdict"] == "accept"
+    assert r["metrics"]["execution_steps"] == 40003
+
+
+def test_dfa_shaped_machines_run_as_dfas():
+    from api.main import run_tm_untraced
+    from automata.dfa_to_tm import dfa_to_tm
+    from automata.subset_construction import nfa_to_dfa
+    from automata.tm import tm_as_dfa
+    from regex.compile import build_regex_nfa
+    tm = dfa_to_tm(nfa_to_dfa(build_regex_nfa("(a|b)*abb")))
+    assert tm_as_dfa(tm) is not None
+    assert tm_as_dfa(SWEEPER) is None and tm_as_dfa(PING_PONG) is None
+    for string in ("", "abb", "babb", "abab", "abc", "aabbb"):
+        accepted, history = simulate_tm(tm, string)
+        run = run_tm_untraced(tm, string)
+        assert run["engine"] == "dfa"
+        assert (run["accepted"], run["metrics"]["execution_steps"]) == (accepted, len(history))
+    assert run_tm_untraced(EVEN, "aaaa")["engine"] == "dfa"
+    assert run_tm_untraced(SWEEPER, "$a")["engine"] == "tm"
+
+# a^n b^n with a counter on a second tape ("$" marks its left end).
+ANBN = {"start": "m", "tapes": 2, "transitions": [
+    ["m", ["*", "_"], "c", ["*", "$"], ["S", "R"]],
+    ["c", "a_", "c", "aX", "RR"],
+    ["c", "b_", "d", "b_", "SL"],
+    ["c", "__", "q_accept", "__", "SS"],
+    ["d", "bX", "d", "bX", "RL"],
+    ["d", "_$", "q_accept", "_$", "SS"]
+]}
+
+
+def test_multitape():
+    for string in ("", "ab", "aabb", "aaabbb", "aab", "abb", "ba", "abab"):
+        n = len(string) // 2
+        expected = string == "a" * n + "b" * n
+        accepted, history = simulate_multitape_tm(ANBN, string)
+        assert accepted is expected, string
+        assert simulate_multitape_tm(ANBN, string, trace=False)[0] is expected
+    _, history = simulate_multitape_tm(ANBN, "aabb")
+    assert history[-1]["tapes"][1].startswith("$XX")
+    assert len(history[-1]["heads"]) == 2
+
+
+def test_multitape_api(client):
+    r = client.post("/simulate/tm", json={"tm": ANBN, "string": "aaabbb"}).json()
+    assert r["accepted"] is True and r["verdict"] == "accept"
+    r = client.post("/simulate/tm", json={"tm": ANBN, "string": "ab", "mode": "accelerated"})
+    assert r.status_code == 400
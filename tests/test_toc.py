@@ -0,0 +1,55 @@
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+import toc
+from toc.__main__ import main
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def run(code):
+    return subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True).stdout.split()
+
+
+def test_import_is_lazy_and_headless():
+    assert run("import sys, toc; print('automata.nfa' in sys.modules)") == ["False"]
+    code = "import sys; from toc.__main__ import main; main(['simulate', '--regex', 'ab*', 'abb']); print('fastapi' in sys.modules)"
+    assert run(code)[-1] == "False"
+
+
+@pytest.mark.parametrize("model", ["nfa", "dfa", "pda", "tm"])
+def test_regex_models_agree(model):
+    machine = toc.compile_regex("(a|b)*abb", model)
+    for string, expected in (("abb", True), ("babb", True), ("ab", False), ("abc", False)):
+        assert machine.accepts(string) is expected
+        assert machine.simulate(string, trace=True)["accepted"] is expected
+
+
+def test_grammar_and_scan():
+    grammar = toc.load_grammar({"S": [["a", "S", "b"], ""]}, "S")
+    assert [grammar.accepts(s) for s in ("", "aabb", "aab")] == [True, True, False]
+    matches = list(toc.compile_regex("ab(b)*").scan(["xxabbyab", "none"], search=True))
+    assert [m["match"] for m in matches] == ["abb", "ab"]
+
+
+def test_cli_round_trip_through_tdfa(tmp_path, capsys):
+    path = tmp_path / "abb.tdfa"
+    assert main(["compile", "--regex", "(a|b)*abb", "--output", str(path)]) == 0
+    assert main(["simulate", "--dfa", str(path), "abb", "ab"]) == 0
+    records = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert [(r["string"], r["accepted"]) for r in records] == [("abb", True), ("ab", False)]
+
+    lines = tmp_path / "lines.txt"
+    lines.write_text("abb\nbab\naabb\n")
+    assert main(["scan", "--regex", "(a|b)*abb", "--matches-only", "--format", "json", str(lines)]) == 0
+    assert [r["line"] for r in json.loads(capsys.readouterr().out)] == [1, 3]
+
+
+def test_cli_errors(tmp_path, capsys):
+    assert main(["simulate", "--regex", "(ab", "a"]) == 2
+    assert main(["compile", "--regex", "ab", "--model", "nfa", "--output", str(tmp_path / "x.tdfa")]) == 2
+    assert "error:" in capsys.readouterr().err
@@ -0,0 +1,27 @@
+# Headless library API. Names resolve on first access, so importing toc
+# (or running python -m toc --help) loads none of the automata modules.
+#
+#   import toc
+#   machine = toc.compile_regex("(a|b)*abb")
+#   machine.accepts("aabb"), machine.simulate("abb", trace=True)
+
+_EXPORTS = {
+    "Machine": "toc.machines",
+    "KINDS": "toc.machines",
+    "MODELS": "toc.machines",
+    "compile_regex": "toc.machines",
+    "load_grammar": "toc.machines",
+    "load_dfa": "toc.machines",
+    "load_tm": "toc.machines"
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module 'toc' has no attribute '{name}'")
+    import importlib
+    value = getattr(importlib.import_module(_EXPORTS[name]), name)
+    globals()[name] = value
+    return value
@@ -0,0 +1,134 @@
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+# Command line for batch jobs. Machines come from --regex or a JSON file
+# (--dfa, --tm, --grammar with {"start", "grammar"}) or, for --dfa, a
+# binary .tdfa file; results are written as NDJSON (one record per input)
+# or a single JSON document.
+#
+#   python -m toc compile --regex "(a|b)*abb" --model nfa
+#   python -m toc compile --regex "(a|b)*abb" --output abb.tdfa
+#   python -m toc simulate --regex "(a|b)*abb" abb aab --trace
+#   python -m toc scan --regex "ab+" --search logs/*.txt
+
+
+def machine_from_args(args):
+    from toc.machines import Machine, load_dfa
+    if args.regex is not None:
+        return Machine("regex", args.regex, args.model)
+    if args.dfa is not None and args.dfa.endswith(".tdfa"):
+        return load_dfa(args.dfa)
+    kind = next(k for k in ("dfa", "tm", "grammar") if getattr(args, k) is not None)
+    with open(getattr(args, kind), encoding="utf-8") as f:
+        definition = json.load(f)
+    return Machine(kind, definition, args.model)
+
+
+def write_output(machine, path):
+    if path.endswith(".tdfa"):
+        from automata.dfa_file import save_dfa
+        if machine.model != "dfa":
+            raise ValueError("Only the dfa model can be written as .tdfa")
+        save_dfa(machine.to_dict(), path)
+        return
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(machine.to_dict(), f, ensure_ascii=False)
+        f.write("\n")
+
+
+def read_lines(paths):
+    for path in paths or ["-"]:
+        if path == "-":
+            for line in sys.stdin:
+                yield path, line
+        else:
+            with open(path, encoding="utf-8", errors="replace") as f:
+                for line in f:
+                    yield path, line
+
+
+def emit(records, fmt, out):
+    if fmt == "json":
+        json.dump(list(records), out, ensure_ascii=False)
+        out.write("\n")
+        return
+    for record in records:
+        out.write(json.dumps(record, ensure_ascii=False))
+        out.write("\n")
+
+
+def run_simulate(machine, args):
+    if args.strings:
+        strings = args.strings
+    else:
+        strings = (line.rstrip("\r\n") for _, line in read_lines([args.input] if args.input else None))
+    return (dict(string=s, **machine.simulate(s, trace=args.trace)) for s in strings)
+
+
+def run_scan(machine, args):
+    for path in args.files or ["-"]:
+        lines = (line for _, line in read_lines([path]))
+        for record in machine.scan(lines, search=args.search):
+            if args.matches_only and not record.get("accepted", True):
+                continue
+            yield dict(file=path, **record)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m toc")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    def add_machine(command):
+        source = command.add_mutually_exclusive_group(required=True)
+        source.add_argument("--regex")
+        source.add_argument("--dfa", metavar="FILE")
+        source.add_argument("--tm", metavar="FILE")
+        source.add_argument("--grammar", metavar="FILE")
+        command.add_argument("--model", help="nfa, dfa, pda or tm for regexes; parse or pda for grammars")
+        command.add_argument("--format", choices=("ndjson", "json"), default="ndjson")
+
+    compile_ = commands.add_parser("compile", help="print the machine as JSON")
+    add_machine(compile_)
+    compile_.add_argument("--output", metavar="FILE", help="write to FILE instead; a .tdfa name writes the binary DFA format")
+
+    simulate = commands.add_parser("simulate", help="run strings through the machine")
+    add_machine(simulate)
+    simulate.add_argument("strings", nargs="*", help="inputs (default: one per line from --input or stdin)")
+    simulate.add_argument("--input", metavar="FILE")
+    simulate.add_argument("--trace", action="store_true", help="include the step trace")
+
+    scan = commands.add_parser("scan", help="match every line of files")
+    add_machine(scan)
+    scan.add_argument("files", nargs="*", help="files to scan ('-' or none: stdin)")
+    scan.add_argument("--search", action="store_true", help="report matches inside lines instead of whole-line acceptance")
+    scan.add_argument("--matches-only", action="store_true", help="only report accepted lines")
+
+    args = parser.parse_args(argv)
+    out = sys.stdout
+    try:
+        machine = machine_from_args(args)
+        if args.command == "compile" and args.output:
+            write_output(machine, args.output)
+        elif args.command == "compile":
+            json.dump(machine.to_dict(), out, ensure_ascii=False)
+            out.write("\n")
+        elif args.command == "simulate":
+            emit(run_simulate(machine, args), args.format, out)
+        else:
+            emit(run_scan(machine, args), args.format, out)
+    except BrokenPipeError:
+        # The reader went away (e.g. | head); silence the flush at exit.
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return 0
+    except (ValueError, KeyError, OSError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 2
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
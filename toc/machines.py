@@ -0,0 +1,166 @@
+from regex.compile import build_regex_nfa
+from automata.nfa import serialize_nfa
+from automata.pda import serialize_pda
+from automata.subset_construction import nfa_to_dfa
+from automata.dfa_file import MappedDFA, cached_regex_dfa, dfa_dict
+from automata.dfa_to_tm import dfa_to_tm
+from automata.tm import compile_tm
+from conversions.nfa_to_pda import nfa_to_pda
+from conversions.cfg_to_pda import cfg_to_pda
+from cfg.grammar import Grammar
+from cfg.compiler import compile_grammar
+from cfg.cyk import get_cyk_parser
+from cfg.engines import parse
+from simulation.nfa_simulator import simulate_nfa
+from simulation.bitparallel_nfa import compile_nfa
+from simulation.dfa_simulator import compile_dfa, simulate_dfa, find_matches
+from simulation.pda_simulator import simulate_pda, simulate_general_pda
+from simulation.tm_simulator import simulate_tm, simulate_multitape_tm
+
+KINDS = ("regex", "dfa", "tm", "grammar")
+MODELS = {
+    "regex": ("dfa", "nfa", "pda", "tm"),
+    "dfa": ("dfa",),
+    "tm": ("tm",),
+    "grammar": ("parse", "pda")
+}
+
+
+class Machine:
+    # One machine run as one model: the first model listed for its kind by
+    # default. Artifacts (NFA, DFA, compiled tables, ...) are built on first
+    # use and kept, so a Machine is meant to be reused across inputs.
+    def __init__(self, kind, definition, model=None):
+        if kind not in KINDS:
+            raise ValueError(f"Unknown machine kind '{kind}'")
+        model = model or MODELS[kind][0]
+        if model not in MODELS[kind]:
+            raise ValueError(f"A {kind} machine cannot run as '{model}'")
+        self.kind = kind
+        self.model = model
+        self.definition = definition
+        self._artifacts = {}
+        if kind == "dfa":
+            self._artifacts["dfa"] = definition
+        elif kind == "tm":
+            self._artifacts["tm"] = compile_tm(definition)
+        self.artifact({"parse": "grammar", "dfa": "compiled_dfa"}.get(model, model))
+
+    def artifact(self, name):
+        if name not in self._artifacts:
+            if name == "nfa":
+                value = build_regex_nfa(self.definition)
+            elif name == "dfa":
+                # A MappedDFA when loaded from a file or the DFA cache is on.
+                value = cached_regex_dfa(self.definition, lambda: nfa_to_dfa(self.artifact("nfa")))
+            elif name == "compiled_dfa":
+                value = compile_dfa(self.artifact("dfa"))
+            elif name == "tm":
+                value = compile_tm(dfa_to_tm(dfa_dict(self.artifact("dfa"))))
+            elif name == "bit_nfa":
+                value = compile_nfa(self.artifact("nfa"))
+            elif name == "grammar":
+                value = compile_grammar(Grammar.from_dict(self.definition["start"], self.definition["grammar"]))
+            elif name == "pda":
+                if self.kind == "grammar":
+                    value = cfg_to_pda(self.artifact("grammar"))
+                else:
+                    value = nfa_to_pda(self.artifact("nfa"))
+            else:
+                raise ValueError(f"Unknown artifact '{name}'")
+            self._artifacts[name] = value
+        return self._artifacts[name]
+
+    def to_dict(self):
+        if self.model == "nfa":
+            return serialize_nfa(self.artifact("nfa"))
+        if self.model == "pda":
+            return serialize_pda(self.artifact("pda"))
+        if self.model == "parse":
+            return self.artifact("grammar").summary()
+        if self.model == "tm" and self.kind == "regex":
+            return dfa_to_tm(dfa_dict(self.artifact("dfa")))
+        if self.model == "tm":
+            return self.definition
+        return dfa_dict(self.artifact("dfa"))
+
+    def accepts(self, string):
+        if self.model == "dfa":
+            return self.artifact("compiled_dfa").run(string)[0]
+        if self.model == "parse":
+            return get_cyk_parser(self.artifact("grammar")).accepts(string)
+        return self.simulate(string)["accepted"]
+
+    def simulate(self, string, trace=False):
+        result = {"accepted": None}
+        if self.model == "parse":
+            engine, accepted, tree = parse(self.artifact("grammar"), string)
+            result.update(accepted=accepted, engine=engine)
+            if trace:
+                result["tree"] = _tree(tree)
+            return result
+        if self.model == "dfa" and not trace:
+            result["accepted"] = self.artifact("compiled_dfa").run(string)[0]
+            return result
+        if self.model == "nfa" and not trace:
+            result["accepted"] = self.artifact("bit_nfa").accepts(string)
+            return result
+        if self.model == "nfa":
+            accepted, history = simulate_nfa(self.artifact("nfa"), string)
+        elif self.model == "dfa":
+            accepted, history = simulate_dfa(self.artifact("dfa"), string, self.artifact("compiled_dfa"))
+        elif self.model == "pda" and self.kind == "grammar":
+            accepted, history = simulate_general_pda(self.artifact("pda"), string, accept_by_empty_stack=True)
+        elif self.model == "pda":
+            accepted, history = simulate_pda(self.artifact("pda"), string)
+        else:
+            tm = self.artifact("tm")
+            string = tm.translate(string)
+            if tm.tapes == 1:
+                accepted, history = simulate_tm(tm, string)
+            else:
+                accepted, history = simulate_multitape_tm(tm, string, trace=trace)
+            result["verdict"] = history[-1].get("verdict") or ("accept" if accepted else "reject")
+        result["accepted"] = accepted
+        if trace:
+            result["steps"] = history
+        return result
+
+    def scan(self, lines, search=False):
+        # Yields one record per line (whole-line acceptance), or with search
+        # one record per leftmost-longest match inside each line (DFA only).
+        if search and self.model != "dfa":
+            raise ValueError("Searching needs the dfa model")
+        compiled = self.artifact("compiled_dfa") if search else None
+        for number, line in enumerate(lines, 1):
+            line = line.rstrip("\r\n")
+            if not search:
+                yield {"line": number, "text": line, "accepted": self.accepts(line)}
+                continue
+            for start, end in find_matches(compiled, line):
+                yield {"line": number, "start": start, "end": end, "match": line[start:end]}
+
+
+def _tree(node):
+    if node is None:
+        return None
+    return {"symbol": node.symbol, "children": [_tree(child) for child in node.children]}
+
+
+def compile_regex(regex, model="dfa"):
+    return Machine("regex", regex, model)
+
+
+def load_grammar(rules, start, model="parse"):
+    return Machine("grammar", {"start": start, "grammar": rules}, model)
+
+
+def load_dfa(definition):
+    # A DFA dict, or the path of a binary DFA file (mapped, not parsed).
+    if isinstance(definition, str):
+        definition = MappedDFA(definition)
+    return Machine("dfa", definition)
+
+
+def load_tm(definition):
+    return Machine("tm", definition)
@@ -9,6 +9,46 @@
 // Global State
 let simulator;
 const API_BASE = "http://127.0.0.1:8000";
+const COLUMNAR_FORMAT = "application/vnd.toc.columnar+json";
+
+// Columnar traces (see api/encoding.py): rebuild step objects from the
+// per-key columns and the response's shared string/edge table.
+function decodeTrace(trace, table) {
+  const edge = (id) => {
+    const [shape, ...values] = table.edges[id];
+    const obj = {};
+    table.shapes[shape].forEach((key, i) => { obj[key] = table.strings[values[i]]; });
+    return obj;
+  };
+  const decoders = {
+    str: (v) => table.strings[v],
+    strs: (v) => v.map(x => table.strings[x]),
+    edges: (v) => v.map(edge),
+    raw: (v) => v
+  };
+  const steps = Array.from({ length: trace.length }, () => ({}));
+  for (const [key, column] of Object.entries(trace.columns)) {
+    const decode = decoders[trace.kinds[key]];
+    const missing = new Set((trace.missing || {})[key] || []);
+    column.forEach((v, i) => {
+      if (!missing.has(i)) steps[i][key] = v === null ? null : decode(v);
+    });
+  }
+  return steps;
+}
+
+function decodeResponse(data, table = data.trace_table) {
+  if (!table) return data;
+  for (const [key, value] of Object.entries(data)) {
+    if (key === "steps" && value && value.columns) {
+      data[key] = decodeTrace(value, table);
+    } else if (value && typeof value === "object" && !Array.isArray(value) && key !== "trace_table") {
+      decodeResponse(value, table);
+    }
+  }
+  delete data.trace_table;
+  return data;
+}
 
 
 // 1. Layout Engine
@@ -271,6 +311,9 @@ class Renderer {
       pairCounts[pairKey] = (pairCounts[pairKey] || 0) + 1;
     });
 
+    // Edges over symbol classes read a class representative; show the class.
+    const label = symbol => (nfa.classes && nfa.classes[symbol]) || symbol;
+
     Object.values(groups).forEach(group => {
       const { from, to } = group[0];
 
@@ -322,20 +365,25 @@ class Renderer {
 
         if (t.read !== undefined) {
           // TM Label
-          txt.textContent = `${t.read} → ${t.write}, ${t.move}`;
+          txt.textContent = `${label(t.read)} → ${label(t.write)}, ${t.move}`;
           // Resize rect approx
           const w = txt.textContent.length * 6 + 10;
           rect.setAttribute("width", w);
           rect.setAttribute("x", labelX - w / 2);
         } else if (t.pop !== undefined && t.push !== undefined) {
 
-          const sym = t.symbol || "ε";
+          const sym = label(t.symbol || "ε");
           txt.textContent = `${sym}, ${t.pop} → ${t.push}`;
           const w = txt.textContent.length * 6 + 10;
           rect.setAttribute("width", w);
           rect.setAttribute("x", labelX - w / 2);
         } else {
-          txt.textContent = t.symbol;
+          txt.textContent = label(t.symbol);
+          if (txt.textContent.length > 2) {
+            const w = txt.textContent.length * 6 + 10;
+            rect.setAttribute("width", w);
+            rect.setAttribute("x", labelX - w / 2);
+          }
         }
 
         labelGroup.appendChild(txt);
@@ -599,7 +647,7 @@ class Renderer {
         const txt = edge.labelGroup.querySelector("text");
 
         if (rect) {
-          rect.setAttribute("x", labelX - 10);
+          rect.setAttribute("x", labelX - rect.getAttribute("width") / 2);
           rect.setAttribute("y", labelY - 10);
         }
         if (txt) {
@@ -718,10 +766,10 @@ class Simulator {
 
       const res = await fetch(`${API_BASE}${endpoint}`, {
         method: "POST",
-        headers: { "Content-Type": "application/json" },
+        headers: { "Content-Type": "application/json", "Accept": COLUMNAR_FORMAT },
         body: JSON.stringify(payload)
       });
-      const data = await res.json();
+      const data = decodeResponse(await res.json());
 
       this.history = data.steps;
       this.currentInputString = string;
@@ -788,10 +836,11 @@ class Simulator {
     if (this.mode === 'TM') {
       document.getElementById("tape-container").style.display = "block";
       const tapeArr = step.tape ? step.tape.split('') : ["_"];
-      this.renderTape(tapeArr, step.head);
+      // Accelerated runs send a window of the tape starting at tape_offset
+      this.renderTape(tapeArr, step.head - (step.tape_offset || 0));
 
 
-      document.getElementById("tm-time").innerText = `Time: ${this.currentStep}`;
+      document.getElementById("tm-time").innerText = `Time: ${step.tape_offset !== undefined ? step.step : this.currentStep}`;
       document.getElementById("tm-state").innerText = `State: ${step.state}`;
 
       const t = step.transitions && step.transitions[0];
@@ -1155,6 +1204,18 @@ function parseGrammarInput() {
   return { grammar, start };
 }
 
+// Rebuild sentential forms from the server's leftmost-derivation diffs
+function expandDerivation(start, steps) {
+  if (!steps.length) return [];
+  const form = [start];
+  const lines = [start];
+  steps.forEach(step => {
+    form.splice(step.index, 1, ...step.with);
+    lines.push(form.length ? form.join(" ") : "ε");
+  });
+  return lines;
+}
+
 window.parseCFG = async () => {
   try {
     const { grammar, start } = parseGrammarInput();
@@ -1162,9 +1223,12 @@ window.parseCFG = async () => {
     const res = await fetch(`${API_BASE}/cfg/parse`, {
       method: "POST",
       headers: { "Content-Type": "application/json" },
-      body: JSON.stringify({ grammar, start, string })
+      body: JSON.stringify({ grammar, start, string, derivation: "steps" })
     });
     const data = await res.json();
+    if (data.derivation_steps) {
+      data.derivations = expandDerivation(start, data.derivation_steps);
+    }
 
     const resultDiv = document.getElementById("cfg-result-text");
     const derivDiv = document.getElementById("cfg-derivation-steps");
@@ -1385,6 +1449,8 @@ function displayMetrics(metrics) {
 window.runComparison = async () => {
   const regex = document.getElementById("compareRegex").value;
   const string = document.getElementById("compareString").value;
+  const other = document.getElementById("compareOther").value.trim();
+  const operation = document.getElementById("compareOperation").value;
   const metricsPanel = document.getElementById("compare-metrics");
   const metricsBody = document.getElementById("compare-metrics-body");
   const statusStep = document.getElementById("compareStepCounter");
@@ -1396,48 +1462,51 @@ window.runComparison = async () => {
 
     const res = await fetch(`${API_BASE}/compare`, {
       method: "POST",
-      headers: { "Content-Type": "application/json" },
-      body: JSON.stringify({ regex, string })
+      headers: { "Content-Type": "application/json", "Accept": COLUMNAR_FORMAT },
+      body: JSON.stringify(other || operation === "complement" ? { regex, string, other: other || regex, operation } : { regex, string })
     });
 
     if (!res.ok) throw new Error((await res.json()).detail);
-    const data = await res.json();
+    const data = decodeResponse(await res.json());
 
     // Show metrics table
     metricsPanel.style.display = "block";
-    metricsBody.innerHTML = `
-      <tr>
-        <td style="padding:6px; color:#9cdcfe; font-weight:600;">NFA</td>
-        <td style="text-align:center;">${data.nfa.metrics.states}</td>
-        <td style="text-align:center;">${data.nfa.metrics.transitions}</td>
-        <td style="text-align:center;">${data.nfa.metrics.execution_steps}</td>
-        <td style="text-align:center;">${data.nfa.accepted ? '✅' : '❌'}</td>
-      </tr>
+    const rows = [["NFA", "nfa", "#9cdcfe"], ["DFA", "dfa", "#ce9178"], ["TM", "tm", "#4ec9b0"]];
+    if (data.product) rows.push(["Product", "product", "#c586c0"]);
+    metricsBody.innerHTML = rows.map(([label, key, color]) => {
+      const m = data[key].metrics;
+      const time = m.timed_out ? '⏱' : `${m.wall_time_ms} ms`;
+      const memory = m.peak_memory_kb == null ? '—' : `${m.peak_memory_kb} KB`;
+      const result = m.timed_out ? '⏱' : (data[key].accepted ? '✅' : '❌');
+      return `
       <tr>
-        <td style="padding:6px; color:#ce9178; font-weight:600;">DFA</td>
-        <td style="text-align:center;">${data.dfa.metrics.states}</td>
-        <td style="text-align:center;">${data.dfa.metrics.transitions}</td>
-        <td style="text-align:center;">${data.dfa.metrics.execution_steps}</td>
-        <td style="text-align:center;">${data.dfa.accepted ? '✅' : '❌'}</td>
-      </tr>
-      <tr>
-        <td style="padding:6px; color:#4ec9b0; font-weight:600;">TM</td>
-        <td style="text-align:center;">${data.tm.metrics.states}</td>
-        <td style="text-align:center;">${data.tm.metrics.transitions}</td>
-        <td style="text-align:center;">${data.tm.metrics.execution_steps}</td>
-        <td style="text-align:center;">${data.tm.accepted ? '✅' : '❌'}</td>
-      </tr>
-    `;
+        <td style="padding:6px; color:${color}; font-weight:600;">${label}</td>
+        <td style="text-align:center;">${m.states}</td>
+        <td style="text-align:center;">${m.transitions}</td>
+        <td style="text-align:center;">${m.execution_steps ?? '—'}</td>
+        <td style="text-align:center;">${time}</td>
+        <td style="text-align:center;">${memory}</td>
+        <td style="text-align:center;">${result}</td>
+      </tr>`;
+    }).join("");
 
     // Visualizing the comparison results
     // We'll show the DFA as it's usually the most readable for comparison
+    // (or the product automaton when a second regex was given).
+    const shown = data.product ? data.product.graph : data.dfa.graph;
     simulator.mode = 'DFA';
-    simulator.nfaData = data.dfa.graph;
-    const layout = simulator.layoutEngine.compute(data.dfa.graph, { xSpacing: 300, ySpacing: 200 });
-    simulator.renderer.draw(data.dfa.graph, layout);
+    simulator.nfaData = shown;
+    const layout = simulator.layoutEngine.compute(shown, { xSpacing: 300, ySpacing: 200 });
+    simulator.renderer.draw(shown, layout);
 
     statusStep.innerText = "Comparison Complete";
     statusText.innerText = `All models ${data.dfa.accepted ? 'accepted' : 'rejected'} the input. Observe metrics above.`;
+    if (data.product) {
+      const example = data.product.example;
+      statusText.innerText += example === null
+        ? " The product language is empty."
+        : ` Shortest string in the product language: "${example}"${example === "" ? " (ε)" : ""}.`;
+    }
 
   } catch (e) {
     console.error(e);